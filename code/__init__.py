@@ -1,2 +0,0 @@
-from .etl import *
-from .gui import *
\ No newline at end of file
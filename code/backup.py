@@ -0,0 +1,93 @@
+from subprocess import PIPE, Popen
+import os
+import sys
+import json
+import shutil
+import pathlib
+
+if getattr(sys, 'frozen', False):
+    APP_HOME = os.path.dirname(sys.executable)
+else:
+    APP_HOME = os.path.dirname(os.path.abspath(__file__))
+    APP_HOME = pathlib.Path(APP_HOME).parent
+
+# O backup guarda apenas o que a sessão vai substituir: as tabelas e views migradas que já existem no schema
+# (pg_dump em formato diretório com jobs paralelos) e as funções/procedimentos substituídos (pg_get_functiondef)
+# O manifesto só é gravado quando o backup termina, sem ele não há o que restaurar. Ele leva o id da sessão
+# que o criou, apenas essa sessão pode restaurá-lo, e o backup é descartado quando a sessão conclui
+def backup_dir(schema):
+    return os.path.join(APP_HOME, f'backups/{schema}_backup')
+
+def manifest_file(schema):
+    return os.path.join(backup_dir(schema), 'manifest.json')
+
+def connection_args(pg_conf):
+    return ['--no-password', '-h', str(pg_conf['host']), '-p', str(pg_conf['port']), '-U', pg_conf['user'], '-d', pg_conf['database']]
+
+def run(command, pg_conf):
+    p = Popen(command, shell=False, stdin=PIPE, stdout=PIPE, stderr=PIPE, env={**os.environ, 'PGPASSWORD': pg_conf['password']})
+    _, err = p.communicate()
+    if p.returncode != 0:
+        raise Exception(f'{command[0]} falhou: {err.decode(errors="replace").strip()}')
+
+# Views e tabelas (de qualquer schema) que dependem das relações substituídas, direta ou indiretamente:
+# o DROP TABLE ... CASCADE da carga remove essas views e as chaves estrangeiras dessas tabelas
+def dependents_query(schema, relations):
+    names = ', '.join(f"'{name}'" for name in relations)
+    return f'''WITH RECURSIVE edges(referenced, dependent) AS (
+    SELECT d.refobjid, r.ev_class FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid WHERE d.classid = 'pg_rewrite'::regclass
+    UNION SELECT confrelid, conrelid FROM pg_constraint WHERE contype = 'f'),
+deps(oid) AS (
+    SELECT c.oid FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = '{schema}' AND c.relname IN ({names})
+    UNION SELECT e.dependent FROM edges e JOIN deps ON deps.oid = e.referenced)
+SELECT DISTINCT n.nspname AS schema, c.relname AS name FROM deps JOIN pg_class c ON c.oid = deps.oid JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE NOT (n.nspname = '{schema}' AND c.relname IN ({names}))'''
+
+# tables: relações migradas que já existem no schema (serão substituídas)
+# dependents: [(schema, nome)] das relações que dependem delas (dependents_query), salvas junto com os dados
+# created: tabelas que a sessão vai criar, removidas na restauração
+# functions: definições (CREATE OR REPLACE) das funções e procedimentos substituídos
+# session: id da sessão, exigido na restauração
+def create_backup(pg_conf, schema, tables, created = None, functions = None, jobs = 4, dependents = None, session = None):
+    directory = backup_dir(schema)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    dependents = dependents or []
+    if tables or dependents:
+        command = ['pg_dump', *connection_args(pg_conf), '-Fd', '-j', str(jobs), '-f', os.path.join(directory, 'dump')]
+        for table in tables:
+            command += ['-t', f'{schema}."{table}"']
+        for dependent_schema, name in dependents:
+            command += ['-t', f'"{dependent_schema}"."{name}"']
+        run(command, pg_conf)
+    with open(os.path.join(directory, 'functions.sql'), 'w', encoding='utf-8') as file:
+        for definition in functions or []:
+            file.write(definition.rstrip() + ';\n\n')
+    with open(manifest_file(schema), 'w', encoding='utf-8') as file:
+        json.dump({'session': session, 'tables': tables, 'dependents': dependents, 'created': created or [], 'functions': len(functions or [])}, file)
+    return 0
+
+# Sessão concluída, o backup não pode mais ser restaurado
+def discard_backup(schema):
+    shutil.rmtree(backup_dir(schema), ignore_errors=True)
+
+# Restaura ao estado antes do ETL: remove as tabelas criadas pela sessão, restaura as tabelas substituídas
+# em paralelo (--clean recria cada objeto) e reaplica as definições das funções
+# Retorna False se não há backup concluído para o schema por esta sessão (um backup de outra sessão nunca
+# é restaurado: ele desfaria uma migração que já foi concluída)
+def restore_from_backup(pg_conf, schema, jobs = 4, session = None):
+    if not session or not os.path.exists(manifest_file(schema)):
+        return False
+    directory = backup_dir(schema)
+    with open(manifest_file(schema), encoding='utf-8') as file:
+        manifest = json.load(file)
+    if manifest.get('session') != session:
+        return False
+    if manifest['created']:
+        tables = ', '.join(f'{schema}."{table}"' for table in manifest['created'])
+        run(['psql', *connection_args(pg_conf), '-v', 'ON_ERROR_STOP=1', '-c', f'DROP TABLE IF EXISTS {tables} CASCADE'], pg_conf)
+    if manifest['tables'] or manifest['dependents']:
+        run(['pg_restore', *connection_args(pg_conf), '--clean', '--if-exists', '-j', str(jobs), os.path.join(directory, 'dump')], pg_conf)
+    if manifest['functions']:
+        run(['psql', *connection_args(pg_conf), '-v', 'ON_ERROR_STOP=1', '-f', os.path.join(directory, 'functions.sql')], pg_conf)
+    return True
@@ -0,0 +1,158 @@
+from itertools import groupby
+
+# Catálogo de metadados do Oracle carregado uma única vez por sessão
+# Substitui as várias consultas pequenas por tabela por algumas consultas em massa sobre o owner
+class OracleCatalog:
+
+    def __init__(self, query, owner):
+        # query: função que recebe uma consulta SQL e retorna uma lista de linhas (acesso por nome de coluna)
+        self.query = query
+        self.owner = owner
+        self.tables = {}
+        self.columns = {}
+        self.constraints = {}
+        self.table_constraints = {}
+        self.dependencies = {}
+        self.dependents = {}
+        self.triggers = {}
+        self.segments = {}
+        # Erro da consulta ao dba_segments, os tamanhos passam a ser estimados pelas estatísticas do all_tables
+        self.segments_error = None
+        self.indexes = {}
+        # Texto dos sources do owner {(nome, tipo): texto} e das views {nome: consulta}, ver load_sources
+        self.sources = {}
+        self.views = {}
+
+    def load(self):
+        owner = self.owner
+        for row in self.query(f"SELECT table_name, num_rows, avg_row_len FROM all_tables WHERE owner = '{owner}'"):
+            self.tables[row['TABLE_NAME']] = self.as_dict(row)
+        query = f"SELECT table_name, column_name, data_type, data_precision, data_scale, char_length, nullable, data_default, column_id \
+                FROM all_tab_columns WHERE owner = '{owner}' ORDER BY table_name, column_id"
+        for row in self.query(query):
+            self.columns.setdefault(row['TABLE_NAME'], []).append(self.as_dict(row))
+        # Constraints do owner e os constraints referenciados por suas chaves estrangeiras (podem estar em outros owners)
+        query = f"SELECT owner, constraint_name, constraint_type, table_name, r_owner, r_constraint_name, delete_rule, index_name \
+                FROM all_constraints WHERE (owner = '{owner}' AND constraint_type IN ('P', 'R', 'U')) \
+                OR (owner, constraint_name) IN (SELECT r_owner, r_constraint_name FROM all_constraints WHERE owner = '{owner}' AND constraint_type = 'R')"
+        for row in self.query(query):
+            constraint = self.as_dict(row)
+            constraint['COLUMNS'] = []
+            self.constraints[(row['OWNER'], row['CONSTRAINT_NAME'])] = constraint
+            if row['OWNER'] == owner:
+                self.table_constraints.setdefault(row['TABLE_NAME'], []).append(row['CONSTRAINT_NAME'])
+        query = f"SELECT owner, constraint_name, column_name, position FROM all_cons_columns \
+                WHERE owner = '{owner}' \
+                OR (owner, constraint_name) IN (SELECT r_owner, r_constraint_name FROM all_constraints WHERE owner = '{owner}' AND constraint_type = 'R') \
+                ORDER BY owner, constraint_name, position"
+        for row in self.query(query):
+            constraint = self.constraints.get((row['OWNER'], row['CONSTRAINT_NAME']))
+            if constraint:
+                constraint['COLUMNS'].append(row['COLUMN_NAME'])
+        query = f"SELECT name, type, referenced_owner, referenced_name, referenced_type FROM all_dependencies WHERE owner = '{owner}'"
+        for row in self.query(query):
+            dependency = self.as_dict(row)
+            self.dependencies.setdefault(row['NAME'], []).append(dependency)
+            self.dependents.setdefault(row['REFERENCED_NAME'], []).append(dependency)
+        for row in self.query(f"SELECT trigger_name, table_name, column_name FROM all_triggers WHERE owner = '{owner}'"):
+            self.triggers[row['TRIGGER_NAME']] = self.as_dict(row)
+        # Índices do owner com suas colunas e expressões (índices baseados em função)
+        query = f"SELECT index_name, table_name, index_type, uniqueness, leaf_blocks FROM all_indexes WHERE owner = '{owner}' AND table_owner = '{owner}'"
+        for row in self.query(query):
+            index = self.as_dict(row)
+            index['COLUMNS'] = {}
+            self.indexes[row['INDEX_NAME']] = index
+        query = f"SELECT index_name, column_name, column_position, descend FROM all_ind_columns WHERE index_owner = '{owner}' ORDER BY index_name, column_position"
+        for row in self.query(query):
+            index = self.indexes.get(row['INDEX_NAME'])
+            if index:
+                index['COLUMNS'][int(row['COLUMN_POSITION'])] = {'name': row['COLUMN_NAME'], 'descend': row['DESCEND'], 'expression': None}
+        query = f"SELECT index_name, column_expression, column_position FROM all_ind_expressions WHERE index_owner = '{owner}'"
+        for row in self.query(query):
+            index = self.indexes.get(row['INDEX_NAME'])
+            if index and int(row['COLUMN_POSITION']) in index['COLUMNS']:
+                index['COLUMNS'][int(row['COLUMN_POSITION'])]['expression'] = row['COLUMN_EXPRESSION']
+        # Tamanho real dos segmentos, apenas se o usuário tiver acesso ao dba_segments
+        try:
+            query = f"SELECT segment_name, SUM(bytes) AS bytes FROM dba_segments WHERE owner = '{owner}' AND segment_type LIKE 'TABLE%' GROUP BY segment_name"
+            for row in self.query(query):
+                self.segments[row['SEGMENT_NAME']] = int(row['BYTES'])
+        except Exception as e:
+            self.segments_error = e
+        return self
+
+    # Carrega o texto de todos os sources do owner com uma única consulta ordenada, lida aos poucos e agrupada
+    # por (nome, tipo), e a consulta de todas as views. A tradução e a adaptação de procedimentos chamados por
+    # triggers leem daqui em vez de consultar o all_source por objeto
+    # stream: função que recebe uma consulta SQL e itera sobre as linhas
+    def load_sources(self, stream, types = ('FUNCTION', 'PROCEDURE', 'TRIGGER')):
+        owner = self.owner
+        type_list = ', '.join(f"'{type}'" for type in types)
+        query = f"SELECT name, type, line, text FROM all_source WHERE owner = '{owner}' AND type IN ({type_list}) ORDER BY name, type, line"
+        for key, rows in groupby(stream(query), key=lambda row: (row['NAME'], row['TYPE'])):
+            self.sources[key] = ''.join(row['TEXT'] or '' for row in rows)
+        for row in stream(f"SELECT view_name, text FROM all_views WHERE owner = '{owner}'"):
+            self.views[row['VIEW_NAME']] = row['TEXT']
+        return self
+
+    # Texto de um source (consulta, no caso de views), None se não existir no owner
+    def source_text(self, name, type):
+        if type == 'VIEW':
+            return self.views.get(name)
+        return self.sources.get((name, type))
+
+    def as_dict(self, row):
+        return row.asDict() if hasattr(row, 'asDict') else dict(row)
+
+    def num_rows(self, table):
+        table = self.tables.get(table)
+        return table['NUM_ROWS'] if table else None
+
+    # Tamanho estimado da tabela em bytes (dba_segments ou estatísticas do all_tables)
+    def table_bytes(self, table):
+        if table in self.segments:
+            return self.segments[table]
+        stats = self.tables.get(table)
+        if stats and stats['NUM_ROWS'] and stats['AVG_ROW_LEN']:
+            return int(stats['NUM_ROWS']) * int(stats['AVG_ROW_LEN'])
+        return 0
+
+    def table_columns(self, table):
+        return self.columns.get(table, [])
+
+    def table_constraints_of_type(self, table, constraint_type):
+        constraints = [self.constraints[(self.owner, name)] for name in self.table_constraints.get(table, [])]
+        return [constraint for constraint in constraints if constraint['CONSTRAINT_TYPE'] == constraint_type]
+
+    # Colunas da chave primária de uma tabela
+    def primary_key(self, table):
+        pk = self.table_constraints_of_type(table, 'P')
+        return list(pk[0]['COLUMNS']) if pk else []
+
+    # Chaves estrangeiras de uma tabela no formato usado pelo ETL_session
+    def foreign_keys(self, table):
+        fk = {}
+        for constraint in self.table_constraints_of_type(table, 'R'):
+            ref = self.constraints.get((constraint['R_OWNER'], constraint['R_CONSTRAINT_NAME']))
+            if not ref:
+                continue
+            fk[constraint['CONSTRAINT_NAME']] = {'src_table': table, 'src_column': list(constraint['COLUMNS']), 'ref_owner': ref['OWNER'],
+                                                 'ref_table': ref['TABLE_NAME'], 'ref_column': list(ref['COLUMNS']), 'on_delete': constraint['DELETE_RULE']}
+        return fk
+
+    # Índices de uma tabela, exceto o índice da chave primária (criado junto com a constraint)
+    def table_indexes(self, table):
+        pk = self.table_constraints_of_type(table, 'P')
+        pk_index = pk[0]['INDEX_NAME'] if pk else None
+        indexes = [index for index in self.indexes.values() if index['TABLE_NAME'] == table and index['INDEX_NAME'] != pk_index]
+        for index in indexes:
+            index['COLUMN_LIST'] = [index['COLUMNS'][position] for position in sorted(index['COLUMNS'])]
+        return indexes
+
+    # Dependencias de um objeto (o que ele referencia)
+    def references(self, name, types = None):
+        return [dep for dep in self.dependencies.get(name, []) if not types or dep['REFERENCED_TYPE'] in types]
+
+    # Objetos que referenciam um objeto
+    def referenced_by(self, name):
+        return self.dependents.get(name, [])
@@ -0,0 +1,114 @@
+import json
+import os
+import re
+import threading
+from pyspark.accumulators import AccumulatorParam
+
+# Manifesto de progresso de uma sessão de ETL, permite retomar uma migração que falhou ou foi cancelada
+# Registra por tabela as fases concluídas ('data', 'sequence', 'pk', 'index', 'fk'), o plano de partições (chunks)
+# com as linhas já copiadas de cada chunk, e os sources já implantados
+#
+# {'owner': ..., 'schema': ...,
+#  'tables': {tabela: {'phases': [...], 'chunks': [{'oracle': predicado, 'pg': predicado ou None}], 'chunk_rows': {indice: linhas}, 'auto_max': ...}},
+#  'sources': [nome, ...]}
+class Checkpoint:
+
+    PHASES = ['data', 'sequence', 'pk', 'index', 'fk']
+
+    def __init__(self, path, owner, schema, resume = False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.manifest = {'owner': owner, 'schema': schema, 'tables': {}, 'sources': []}
+        # O manifesto só é gravado com resume: sem ele uma sessão que falha restaura o backup e o progresso
+        # registrado não vale mais. O manifesto de uma sessão anterior é descartado pelo mesmo motivo
+        self.persist = resume
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        if resume and os.path.exists(path):
+            with open(path) as file:
+                manifest = json.load(file)
+            if manifest.get('owner') == owner and manifest.get('schema') == schema:
+                self.manifest = manifest
+        self.resumed = bool(self.manifest['tables'] or self.manifest['sources'])
+
+    def save(self):
+        if not self.persist:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self.manifest, file, indent=2, default=str)
+        os.replace(temp_path, self.path)
+
+    def table(self, name):
+        with self.lock:
+            return self.manifest['tables'].setdefault(name, {'phases': [], 'chunk_rows': {}, 'auto_max': None})
+
+    def done(self, name, phase):
+        return phase in self.table(name)['phases']
+
+    # Carga de dados iniciada em uma sessão anterior
+    def started(self, name):
+        return 'chunks' in self.table(name)
+
+    # Registra o plano de partições antes da cópia, a retomada usa o mesmo plano para que os índices coincidam
+    def start_data(self, name, chunks):
+        entry = self.table(name)
+        with self.lock:
+            entry['chunks'] = chunks
+            entry['chunk_rows'] = {}
+            self.save()
+
+    # Linhas confirmadas por chunk ({indice: linhas})
+    def chunks_done(self, name, chunk_rows):
+        entry = self.table(name)
+        with self.lock:
+            entry['chunk_rows'].update({str(index): rows for index, rows in chunk_rows.items()})
+            self.save()
+
+    def phase_done(self, name, phase, **info):
+        entry = self.table(name)
+        with self.lock:
+            if phase not in entry['phases']:
+                entry['phases'].append(phase)
+            entry.update(info)
+            self.save()
+
+    def sources_done(self, names):
+        with self.lock:
+            self.manifest['sources'] += [name for name in names if name not in self.manifest['sources']]
+            self.save()
+
+    def source_is_done(self, name):
+        return name in self.manifest['sources']
+
+    # Sessão concluída, o manifesto não é mais necessário
+    def finish(self):
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+# Acumulador Spark que junta as linhas copiadas por partição {partição: linhas}
+# Atualizações de tasks concluídas chegam ao driver mesmo se o job falhar depois
+class ChunkRowsParam(AccumulatorParam):
+
+    def zero(self, value):
+        return {}
+
+    def addInPlace(self, value1, value2):
+        value1.update(value2)
+        return value1
+
+RANGE_PREDICATE = re.compile(r'^"(\w+)" >= (-?\d+) AND "\1" < (-?\d+)$')
+
+# Plano de chunks com o predicado equivalente no Postgresql, usado para verificar e limpar chunks na retomada
+# Apenas faixas da chave primária podem ser avaliadas no Postgresql, buckets de ORA_HASH não
+def chunk_plan(predicates):
+    if not predicates:
+        return None
+    plan = []
+    for predicate in predicates:
+        match = RANGE_PREDICATE.match(predicate)
+        pg_predicate = f'"{match.group(1).lower()}" >= {match.group(2)} AND "{match.group(1).lower()}" < {match.group(3)}' if match else None
+        plan.append({'oracle': predicate, 'pg': pg_predicate})
+    return plan
@@ -0,0 +1,22 @@
+# Comandos da fase de constraints, executada depois que todas as tabelas foram carregadas
+# As tabelas são carregadas sem constraints em qualquer ordem, as chaves primárias são criadas em paralelo
+# e as chaves estrangeiras são adicionadas NOT VALID (sem varrer os dados) e validadas em paralelo depois
+
+def column_list(columns):
+    return ', '.join(f'"{column.lower()}"' for column in columns)
+
+def primary_key_statement(table, columns):
+    return f"ALTER TABLE {table} ADD PRIMARY KEY ({column_list(columns)})"
+
+# fk no formato de OracleCatalog.foreign_keys
+def foreign_key_statement(table, name, fk, ref_table):
+    return f"ALTER TABLE {table} ADD CONSTRAINT {name.lower()} FOREIGN KEY ({column_list(fk['src_column'])}) \
+REFERENCES {ref_table} ({column_list(fk['ref_column'])}) ON DELETE {fk['on_delete']} NOT VALID"
+
+def validate_statement(table, name):
+    return f"ALTER TABLE {table} VALIDATE CONSTRAINT {name.lower()}"
+
+# Chaves estrangeiras já existentes no schema alvo {nome: validada}, usado para não repetir trabalho ao retomar
+def existing_foreign_keys_query(schema):
+    return f"SELECT c.conname, c.convalidated FROM pg_constraint c JOIN pg_namespace n ON n.oid = c.connamespace \
+WHERE n.nspname = '{schema}' AND c.contype = 'f'"
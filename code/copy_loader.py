@@ -0,0 +1,166 @@
+import jaydebeapi
+import datetime
+import struct
+from code.load_stats import track
+
+# Carregamento em massa no Postgresql via COPY FROM STDIN
+# As funções deste módulo são executadas dentro dos workers do Spark,
+# cada partição abre sua própria conexão e envia as linhas pelo CopyManager do pgJDBC
+
+BUFFER_SIZE = 1 << 20
+PG_EPOCH_DATE = datetime.date(2000, 1, 1)
+PG_EPOCH = datetime.datetime(2000, 1, 1)
+BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+BINARY_TRAILER = struct.pack('>h', -1)
+
+# Escapes do formato texto do COPY
+TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def encode_text(row):
+    fields = []
+    for value in row:
+        if value is None:
+            fields.append('\\N')
+        elif isinstance(value, bool):
+            fields.append('t' if value else 'f')
+        elif isinstance(value, (bytes, bytearray)):
+            fields.append('\\\\x' + bytes(value).hex())
+        elif isinstance(value, str):
+            fields.append(value.translate(TEXT_ESCAPES))
+        else:
+            fields.append(str(value))
+    return ('\t'.join(fields) + '\n').encode('utf-8')
+
+# Converte um Decimal para o formato binário do tipo numeric (dígitos em base 10000)
+def encode_numeric(value):
+    if value.is_nan():
+        return struct.pack('>hhHH', 0, 0, 0xC000, 0)
+    sign, digits, exp = value.as_tuple()
+    digits = ''.join(map(str, digits))
+    if exp >= 0:
+        int_part, frac_part = digits + '0' * exp, ''
+    else:
+        digits = digits.rjust(-exp, '0')
+        int_part, frac_part = digits[:exp], digits[exp:]
+    int_part = int_part.lstrip('0')
+    int_part = int_part.rjust(-(-len(int_part) // 4) * 4, '0')
+    frac_part = frac_part.ljust(-(-len(frac_part) // 4) * 4, '0')
+    groups = [int(int_part[i:i+4]) for i in range(0, len(int_part), 4)]
+    weight = len(groups) - 1
+    groups += [int(frac_part[i:i+4]) for i in range(0, len(frac_part), 4)]
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+    header = struct.pack('>hhHH', len(groups), weight, 0x4000 if sign else 0, max(-exp, 0))
+    return header + struct.pack(f'>{len(groups)}H', *groups)
+
+# Codificadores binários de acordo com o tipo Spark da coluna, escolhidos junto com o tipo de destino em binary_types
+# Colunas timestamp gravadas em timestamp with time zone usam o tipo 'timestamptz'
+BINARY_ENCODERS = {
+    'boolean': lambda v: b'\x01' if v else b'\x00',
+    'short': lambda v: struct.pack('>h', v),
+    'integer': lambda v: struct.pack('>i', v),
+    'long': lambda v: struct.pack('>q', v),
+    'float': lambda v: struct.pack('>f', v),
+    'double': lambda v: struct.pack('>d', v),
+    'string': lambda v: v.encode('utf-8'),
+    'binary': lambda v: bytes(v),
+    'decimal': encode_numeric,
+    'date': lambda v: struct.pack('>i', (v - PG_EPOCH_DATE).days),
+    'timestamp': lambda v: struct.pack('>q', (v.replace(tzinfo=None) - PG_EPOCH) // datetime.timedelta(microseconds=1)),
+    # timestamptz guarda o instante em UTC, o Spark entrega o datetime sem fuso no horário local do worker
+    'timestamptz': lambda v: struct.pack('>q', (v.astimezone(datetime.timezone.utc).replace(tzinfo=None) - PG_EPOCH) // datetime.timedelta(microseconds=1)),
+}
+
+# Tipos do Postgresql cujo formato binário é o próprio texto em UTF-8, os únicos que recebem colunas string do Spark
+# Os demais (ex: interval, lido do Oracle como texto) precisam do COPY em formato texto
+TEXT_TYPES = ['text', 'character varying', 'character', 'xml', 'json']
+
+# Tipos do Postgresql (pg_attribute.atttypid::regtype) cujo formato binário é gerado pelo codificador de cada tipo Spark
+# Um override pode criar a coluna com outro tipo (ex: text em uma coluna NUMBER), o Spark continua lendo o tipo original
+BINARY_TYPES = {
+    'boolean': ['boolean'],
+    'short': ['smallint'],
+    'integer': ['integer'],
+    'long': ['bigint'],
+    'float': ['real'],
+    'double': ['double precision'],
+    'string': TEXT_TYPES,
+    'binary': ['bytea'],
+    'decimal': ['numeric'],
+    'date': ['date'],
+    'timestamp': ['timestamp without time zone', 'timestamp with time zone'],
+}
+
+# Codificador de cada coluna a partir do tipo Spark e do tipo da coluna no Postgresql
+# Retorna os nomes dos codificadores e as posições das colunas sem codificador para o par, que exigem o COPY texto
+def binary_types(type_names, pg_types):
+    names = []
+    mismatched = []
+    for i, (spark_type, pg_type) in enumerate(zip(type_names, pg_types)):
+        if pg_type not in BINARY_TYPES.get(spark_type, []):
+            mismatched.append(i)
+        elif pg_type == 'timestamp with time zone':
+            # timestamp with time zone precisa do instante em UTC no formato binário
+            names.append('timestamptz')
+        else:
+            names.append(spark_type)
+    return names, mismatched
+
+def binary_encoders(type_names):
+    unsupported = [name for name in type_names if name not in BINARY_ENCODERS]
+    if unsupported:
+        raise ValueError(f'Tipos sem suporte no COPY binário: {unsupported}')
+    return [BINARY_ENCODERS[name] for name in type_names]
+
+def encode_binary(row, encoders):
+    data = [struct.pack('>h', len(row))]
+    for value, encoder in zip(row, encoders):
+        if value is None:
+            data.append(struct.pack('>i', -1))
+        else:
+            field = encoder(value)
+            data.append(struct.pack('>i', len(field)))
+            data.append(field)
+    return b''.join(data)
+
+# Envia todas as linhas de uma partição em um único COPY
+# chunk_rows recebe {partição: linhas copiadas} para o checkpoint da sessão
+# stats recebe as métricas da partição (load_stats.track), ordered indica as colunas com mínimo e máximo
+def copy_partition(rows, conf, table, columns, type_names, binary=False, chunk_rows=None, stats=None, ordered=None):
+    import jpype
+    conn = jaydebeapi.connect(conf['driver'], conf['url'], [conf['user'], conf['password']], conf['jar'])
+    copy_in = None
+    try:
+        copy_api = conn.jconn.unwrap(jpype.JClass('org.postgresql.PGConnection')).getCopyAPI()
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        sql = f"COPY {table} ({column_list}) FROM STDIN"
+        if binary:
+            sql += " WITH (FORMAT binary)"
+            encoders = binary_encoders(type_names)
+        copy_in = copy_api.copyIn(sql)
+        if stats is not None:
+            rows = track(rows, stats, ordered)
+        buffer = bytearray(BINARY_HEADER if binary else b'')
+        for row in rows:
+            buffer += encode_binary(row, encoders) if binary else encode_text(row)
+            if len(buffer) >= BUFFER_SIZE:
+                copy_in.writeToCopy(jpype.JArray(jpype.JByte)(bytes(buffer)), 0, len(buffer))
+                buffer.clear()
+        if binary:
+            buffer += BINARY_TRAILER
+        if buffer:
+            copy_in.writeToCopy(jpype.JArray(jpype.JByte)(bytes(buffer)), 0, len(buffer))
+        copied = copy_in.endCopy()
+        copy_in = None
+        if chunk_rows is not None:
+            from pyspark import TaskContext
+            chunk_rows.add({TaskContext.get().partitionId(): int(copied)})
+    finally:
+        if copy_in is not None and copy_in.isActive():
+            copy_in.cancelCopy()
+        conn.close()
@@ -0,0 +1,201 @@
+import jaydebeapi
+import threading
+import queue
+from contextlib import contextmanager
+from time import monotonic
+
+# Consultas diretas nas conexões JDBC (jaydebeapi), sem passar pelo planejamento de jobs do Spark
+# Usado para metadados e leituras pequenas, o Spark fica reservado para a movimentação de dados em massa
+
+# Executa uma consulta e retorna as linhas como dicionários (chaves com os nomes das colunas retornados pelo driver)
+def fetch_all(conn, query):
+    cur = conn.cursor()
+    try:
+        cur.execute(query)
+        columns = [description[0] for description in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+# Executa uma consulta e entrega as linhas aos poucos, em lotes de size linhas por round-trip
+# Para consultas grandes (ex: todo o all_source de um owner) sem montar a lista inteira de uma vez
+def stream(conn, query, size = 1000):
+    cur = conn.cursor()
+    try:
+        cur.execute(query)
+        try:
+            # O driver do Oracle busca 10 linhas por round-trip por padrão
+            cur._rs.setFetchSize(size)
+        except Exception:
+            pass
+        columns = [description[0] for description in cur.description]
+        while True:
+            rows = cur.fetchmany(size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
+    finally:
+        cur.close()
+
+# Executa uma consulta e retorna apenas o primeiro valor da primeira linha
+def fetch_value(conn, query):
+    rows = fetch_all(conn, query)
+    if not rows:
+        return None
+    return next(iter(rows[0].values()))
+
+# Executa um comando DDL/DML (auto-commit) em uma conexão
+def execute(conn, statement):
+    cur = conn.cursor()
+    try:
+        cur.execute(statement)
+    finally:
+        cur.close()
+
+# Pool limitado de conexões JDBC seguro para threads
+# Cada thread retira sua própria conexão, chamadas aninhadas na mesma thread reutilizam a conexão já retirada
+class ConnectionPool:
+
+    # Conexões paradas por mais tempo que isso são validadas antes de serem entregues
+    VALIDATE_AFTER = 30
+
+    def __init__(self, driver, url, user, password, jar, size = 5, init_sql = None):
+        self.driver = driver
+        self.url = url
+        self.user = user
+        self.password = password
+        self.jar = jar
+        self.size = size
+        # Comandos executados em cada nova conexão (ex: search_path)
+        self.init_sql = init_sql or []
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = queue.LifoQueue()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+        self.active = 0
+        self.closed = False
+
+    def connect(self):
+        conn = jaydebeapi.connect(self.driver, self.url, [self.user, self.password], self.jar)
+        for statement in self.init_sql:
+            execute(conn, statement)
+        with self.lock:
+            self.connections.append(conn)
+        return conn
+
+    def discard(self, conn):
+        with self.lock:
+            if conn in self.connections:
+                self.connections.remove(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # Checa se a conexão ainda está viva
+    def is_healthy(self, conn):
+        try:
+            return bool(conn.jconn.isValid(5)) and not conn.jconn.isClosed()
+        except Exception:
+            return False
+
+    def acquire(self):
+        if self.closed:
+            raise RuntimeError('Pool de conexões fechado')
+        self.slots.acquire()
+        try:
+            conn = None
+            while conn is None:
+                try:
+                    conn, released_at = self.idle.get_nowait()
+                except queue.Empty:
+                    conn = self.connect()
+                    break
+                if monotonic() - released_at > self.VALIDATE_AFTER and not self.is_healthy(conn):
+                    self.discard(conn)
+                    conn = None
+            with self.lock:
+                self.active += 1
+            return conn
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, conn, broken = False):
+        with self.lock:
+            self.active -= 1
+        try:
+            # Desfaz transações deixadas abertas e volta para auto-commit
+            if not broken and not conn.jconn.getAutoCommit():
+                conn.rollback()
+                conn.jconn.setAutoCommit(True)
+        except Exception:
+            broken = True
+        if broken or self.closed:
+            self.discard(conn)
+        else:
+            self.idle.put((conn, monotonic()))
+        self.slots.release()
+
+    @contextmanager
+    def connection(self):
+        held = getattr(self.local, 'conn', None)
+        if held is not None:
+            yield held
+            return
+        conn = self.acquire()
+        self.local.conn = conn
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = not self.is_healthy(conn)
+            raise
+        finally:
+            self.local.conn = None
+            self.release(conn, broken)
+
+    def fetch_all(self, query):
+        with self.connection() as conn:
+            return fetch_all(conn, query)
+
+    def fetch_value(self, query):
+        with self.connection() as conn:
+            return fetch_value(conn, query)
+
+    # A conexão fica retirada até o fim da iteração
+    def stream(self, query, size = 1000):
+        with self.connection() as conn:
+            yield from stream(conn, query, size)
+
+    def execute(self, statement):
+        with self.connection() as conn:
+            execute(conn, statement)
+
+    # Aplica parâmetros de sessão (SET) na conexão da thread durante o bloco e os desfaz ao final
+    @contextmanager
+    def settings(self, **params):
+        with self.connection() as conn:
+            for name, value in params.items():
+                execute(conn, f"SET {name} = '{value}'")
+            try:
+                yield conn
+            finally:
+                try:
+                    for name in params:
+                        execute(conn, f"RESET {name}")
+                except Exception:
+                    pass
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            connections = list(self.connections)
+            self.connections.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
@@ -0,0 +1,55 @@
+from contextlib import nullcontext
+from code.db import execute
+
+# Implantação dos sources traduzidos no Postgresql, por nível de dependência
+# Cada nível é aplicado em uma única transação em uma conexão do pool, cada objeto dentro de um savepoint:
+# um objeto que falha é desfeito sozinho e o restante do nível é confirmado. Os comandos de um objeto
+# (savepoint, DROP, CREATE) vão ao servidor em um único execute, sem um round-trip por comando
+# Nunca é usado DROP ... CASCADE, objetos já implantados que dependem de um source substituído são mantidos
+
+# Tipo do objeto no Postgresql para a consulta de objetos existentes
+KINDS = {'FUNCTION': 'routine', 'PROCEDURE': 'routine', 'VIEW': 'view', 'TRIGGER': 'trigger'}
+
+# Funções, procedimentos, views e triggers existentes em um schema
+def existing_objects_query(schema):
+    return f"""SELECT 'routine' AS kind, proname AS name FROM pg_proc p join pg_namespace n on n.oid = p.pronamespace WHERE nspname = '{schema}'
+        UNION ALL SELECT 'view', viewname FROM pg_views WHERE schemaname = '{schema}'
+        UNION ALL SELECT 'trigger', tgname FROM pg_trigger t join pg_class c on c.oid = t.tgrelid join pg_namespace n on n.oid = c.relnamespace
+        WHERE nspname = '{schema}' AND NOT t.tgisinternal"""
+
+def exists(translation, existing):
+    return (KINDS.get(translation['type']), translation['name'].strip('"')) in existing
+
+# Scripts tentados em ordem para implantar um objeto, o primeiro que executar sem erro é mantido
+# Rotinas existentes são removidas antes (CREATE OR REPLACE com outra assinatura criaria uma sobrecarga),
+# se algo depender delas o DROP falha e a segunda tentativa usa apenas CREATE OR REPLACE
+# Views existentes só são removidas se CREATE OR REPLACE falhar (colunas alteradas) e nada depender delas
+def attempts(translation, existing):
+    body = '\n'.join(translation['statements'])
+    if not existing:
+        return [body]
+    drop = f"DROP {translation['type']} {translation['name']};\n{body}"
+    if translation['type'] in ['FUNCTION', 'PROCEDURE']:
+        return [drop, body]
+    if translation['type'] == 'VIEW':
+        return [body, drop]
+    return [body]
+
+# Implanta um nível em uma transação, objects: [(nome, scripts)]
+# Retorna {nome: erro da última tentativa ou None}, phase(nome) mede o tempo de cada objeto
+def deploy_level(pool, objects, phase = None):
+    errors = {}
+    with pool.connection() as conn:
+        conn.jconn.setAutoCommit(False)
+        for name, scripts in objects:
+            with (phase(name) if phase else nullcontext()):
+                for script in scripts:
+                    try:
+                        execute(conn, f'SAVEPOINT source;\n{script}\nRELEASE SAVEPOINT source;')
+                        errors[name] = None
+                        break
+                    except Exception as e:
+                        errors[name] = e
+                        execute(conn, 'ROLLBACK TO SAVEPOINT source')
+        conn.commit()
+    return errors
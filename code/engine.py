@@ -0,0 +1,971 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
+from pyspark.sql.functions import col
+import os
+import sys
+import math
+from decimal import Decimal
+import pathlib
+from time import time
+import datetime
+import uuid
+import multiprocessing
+from code.copy_loader import copy_partition, binary_types
+from code.catalog import OracleCatalog
+from code.db import ConnectionPool
+from code.scheduler import DependencyScheduler, AdaptiveConcurrency
+from code import typemap, load_stats, incremental, constraints, indexes, shadow, backup, plsql, deploy
+from code.checkpoint import Checkpoint, ChunkRowsParam, chunk_plan
+from code.metrics import SessionMetrics, MetricsExporter
+from code.profiler import Profiler
+from code.translation_cache import TranslationCache, target_name
+
+if getattr(sys, 'frozen', False):
+    APP_HOME = os.path.dirname(sys.executable)
+else:
+    APP_HOME = os.path.dirname(os.path.abspath(__file__))
+    APP_HOME = pathlib.Path(APP_HOME).parent
+LOG_FILE_PATH = os.path.join(APP_HOME, 'logs.txt')
+
+# Escreve log no logs.txt
+def write2log(data):
+    with open(LOG_FILE_PATH, "a") as log_file:
+        data = datetime.datetime.strftime(datetime.datetime.now(), "%d/%m/%Y %H:%M:%S") + ': ' + data + '\n'
+        log_file.write(data)
+        log_file.close()
+
+def make_txt_file(name, body):
+    FILE_PATH = os.path.join(APP_HOME, f'manual_migrations/{name}.txt')
+    with open(FILE_PATH, "w") as file:
+        file.write(body)
+        file.close()
+
+# Motor do ETL Oracle -> Postgresql, sem dependência de interface gráfica
+# As mensagens de progresso são enviadas para a função reporter (print por padrão)
+class ETL_engine:
+
+    # Quantidade aproximada de linhas lidas por cada partição do Oracle
+    ROWS_PER_PARTITION = 1000000
+    MAX_PARTITIONS = 64
+
+    def __init__(self, pg_conf, ora_conf, user, tables, sources, etl, pg_jar, ora_jar, schema = None, loader = 'jdbc', ora_connection_budget = 16, pg_connection_budget = 16, fetch_size = 10000, batch_size = 10000, type_overrides = None, sync_mode = 'full', watermark_columns = None, detect_deletes = False, watermark_file = None, resume = False, checkpoint_file = None, maintenance_work_mem = '1GB', max_parallel_maintenance_workers = 2, fast_load = False, shadow_schema = False, backup = False, backup_jobs = 4, metrics_file = None, metrics_interval = 5, metrics_port = None, profile_translation = False, translation_cache = True, translation_cache_file = None, translation_workers = None, probe_dates = False, reporter = print):
+        self.state = 'idle'
+        self.error_message = None
+        self.reporter = reporter
+        # Strings de conexão de acordo com o padrão jdbc
+        # pg_url = f"jdbc:postgresql://{pg_host}:{pg_port}/{pg_database}?user={pg_user}&password={pg_password}"
+        self.pg_url = f"jdbc:postgresql://{pg_conf['host']}:{pg_conf['port']}/{pg_conf['database']}"
+        # ora_url = f"jdbc:oracle:thin:{ora_user}/{ora_password}@//{ora_host}:{ora_port}/{ora_database}"
+        self.ora_url = f"jdbc:oracle:thin:@//{ora_conf['host']}:{ora_conf['port']}/{ora_conf['service']}"
+        self.pg_driver = "org.postgresql.Driver"
+        self.ora_driver = "oracle.jdbc.driver.OracleDriver"
+        self.ora_user = ora_conf['user']
+        self.ora_password = ora_conf['password']
+        self.pg_conf = pg_conf
+        self.pg_user = pg_conf['user']
+        self.pg_password = pg_conf['password']
+        self.user = user
+        self.tables = tables
+        self.sources = sources
+        self.etl = etl
+        self.schema = schema
+        # Com shadow_schema a sessão carrega tudo em um schema sombra, que só substitui o schema alvo no final
+        # (troca atômica), em caso de falha o schema sombra é descartado e o schema alvo continua intacto
+        self.target_schema = schema
+        self.shadow_schema = shadow_schema
+        # Schema sombra criado por esta sessão, o único que ela pode descartar em caso de falha
+        self.shadow_created = False
+        if shadow_schema:
+            if sync_mode == 'incremental' or resume:
+                raise ValueError('O schema sombra não pode ser combinado com sincronização incremental ou retomada')
+            self.schema = shadow.shadow_name(schema)
+        # Backup do que a sessão vai substituir, dispensado com schema sombra
+        self.backup = backup and not shadow_schema
+        self.backup_jobs = backup_jobs
+        # Identifica o backup desta sessão, apenas ele pode ser restaurado quando a sessão falha
+        self.session_id = uuid.uuid4().hex
+        self.pg_jar = pg_jar
+        # Dicionário para organizar migração paralela
+        self.dependency_futures = {}
+        self.scheduler = None
+        # Estatísticas coletadas durante a carga de cada tabela (linhas, nulos, mínimo e máximo por coluna)
+        self.table_stats = {}
+        # Tabelas recriadas por completo na sessão (DROP ... CASCADE remove as chaves estrangeiras que as referenciam)
+        self.reloaded = set()
+        # Modo de carga no Postgresql: 'jdbc' (INSERT em lote), 'copy' (COPY texto) ou 'copy_binary'
+        self.loader = loader
+        # Linhas por round-trip na leitura do Oracle e por lote na escrita JDBC
+        self.fetch_size = fetch_size
+        self.batch_size = batch_size
+        # Tipos definidos pelo usuário que substituem o mapeamento automático {tabela: {coluna: tipo}}
+        self.type_overrides = {table.upper(): columns for table, columns in (type_overrides or {}).items()}
+        # Sonda as colunas DATE para criar date quando nenhum valor tem hora (uma leitura completa a mais por tabela)
+        self.probe_dates = probe_dates
+        # Modo de sincronização: 'full' recarrega todas as tabelas, 'incremental' aplica apenas as linhas alteradas
+        # desde a última execução nas tabelas que já existem no Postgresql (marca d'água por SCN ou por coluna)
+        self.sync_mode = sync_mode
+        self.watermarks = incremental.WatermarkStore(watermark_file or os.path.join(APP_HOME, 'watermarks.json')) if sync_mode == 'incremental' else None
+        self.watermark_columns = {table.upper(): column.upper() for table, column in (watermark_columns or {}).items()}
+        self.detect_deletes = detect_deletes
+        self.resume = resume
+        self.sync_scn = None
+        # Configuração de sessão do Postgresql na criação de chaves primárias e índices
+        # (memória por construção, vezes a quantidade de construções simultâneas)
+        self.maintenance_settings = {'maintenance_work_mem': maintenance_work_mem, 'max_parallel_maintenance_workers': max_parallel_maintenance_workers}
+        # Carga rápida: tabelas UNLOGGED e sem autovacuum durante a carga, SET LOGGED antes das constraints,
+        # autovacuum reativado e ANALYZE em paralelo no final
+        self.fast_load = fast_load
+        # Manifesto de progresso da sessão, com resume uma sessão anterior que falhou continua de onde parou
+        self.checkpoint = Checkpoint(checkpoint_file or os.path.join(APP_HOME, 'checkpoints', f'{user}_{schema}.json'), user, schema, resume)
+        # Orçamento de conexões de cada base, dividido entre o pool (um worker por objeto migrado simultaneamente,
+        # mais a thread que orquestra a sessão) e as tasks do Spark: cada task abre sua própria conexão JDBC no
+        # Oracle para ler a partição e uma no Postgresql para escrevê-la (JDBC ou COPY)
+        # A quantidade de workers começa na metade e é ajustada de acordo com a vazão observada
+        self.ora_connection_budget = ora_connection_budget
+        self.pg_connection_budget = pg_connection_budget
+        budget = min(ora_connection_budget, pg_connection_budget)
+        self.max_workers = max(min(os.cpu_count() or 1, budget // 2), 1)
+        self.workers = max(self.max_workers // 2, 1)
+        # Conexões restantes para as tasks do Spark, no máximo uma por núcleo executa ao mesmo tempo
+        # Com mais núcleos do que conexões as partições de cada tabela são limitadas para que as tabelas
+        # carregadas ao mesmo tempo não ultrapassem o orçamento
+        task_connections = max(budget - self.max_workers - 1, 1)
+        cores = etl.sparkContext.defaultParallelism
+        self.max_partitions = self.MAX_PARTITIONS if cores <= task_connections else max(task_connections // self.max_workers, 1)
+        # Pools de conexões genéricas para execução de DML/DDL (PySpark apenas executa queries para coleta de dados)
+        # Cada worker retira sua própria conexão, mais uma para a thread que orquestra a sessão
+        # (auto-commit ON, operações DML/DDL executadas seram aplicadas na base de dados automaticamente!)
+        # Objetos criados sem schema (sources) vão para o schema da sessão
+        # Com schema sombra o schema alvo vem logo depois: views e triggers podem referenciar tabelas não migradas na sessão
+        search_path = f'{self.schema}, {self.target_schema}, public' if shadow_schema else f'{self.schema}, public'
+        self.pg_pool = ConnectionPool(self.pg_driver, self.pg_url, pg_conf['user'], pg_conf['password'], pg_jar, self.max_workers + 1, [f'SET search_path TO {search_path}'])
+        self.ora_pool = ConnectionPool(self.ora_driver, self.ora_url, ora_conf['user'], ora_conf['password'], ora_jar, self.max_workers + 1)
+        # Métricas de vazão e tempo por fase, exportadas em metrics/<owner>_<schema>.jsonl durante a execução
+        self.metrics = SessionMetrics({'postgres': self.pg_pool, 'oracle': self.ora_pool})
+        self.metrics_exporter = MetricsExporter(self.metrics, metrics_file or os.path.join(APP_HOME, 'metrics', f'{user}_{schema}.jsonl'), metrics_interval, metrics_port)
+        # Tempo por fase e por objeto da sessão, gravado em runs/<data>_<owner> ao final
+        self.profiler = Profiler(profile_translation)
+        # Cache das traduções por hash do source e registro do que já foi implantado em cada destino,
+        # sources inalterados desde a última execução não são traduzidos nem recriados
+        self.translation_cache = TranslationCache((translation_cache_file or os.path.join(APP_HOME, 'translation_cache.sqlite')) if translation_cache else None)
+        self.deploy_target = target_name(pg_conf, self.target_schema)
+        # Processos que traduzem os sources (a tradução é Python puro e limitada pelo GIL em threads)
+        # Com profile_translation a tradução roda no processo principal para ser capturada pelo cProfile
+        self.translation_workers = 1 if profile_translation else max(translation_workers or os.cpu_count() or 1, 1)
+        self.translations = {}
+        # Valida as credenciais abrindo a primeira conexão de cada pool
+        with self.pg_pool.connection(), self.ora_pool.connection():
+            pass
+
+    def report(self, msg):
+        if msg:
+            self.reporter(msg)
+
+    # Interrompe a migração, objetos ainda não iniciados são cancelados
+    def stop(self):
+        if self.state == 'executing':
+            self.state = 'failed'
+        if self.scheduler:
+            self.scheduler.cancel()
+        self.pg_pool.close()
+        self.ora_pool.close()
+
+    # Executa a migração completa e retorna o estado final ('success' ou 'failed')
+    def run(self):
+        try:
+            self.state = 'executing'
+            self.profiler.start()
+            self.metrics.attach(self.etl.sparkContext)
+            try:
+                self.metrics_exporter.start()
+            except OSError as e:
+                self.report(f'Endpoint de métricas não iniciado: {e}')
+            if self.checkpoint.resumed:
+                self.report('Retomando sessão anterior a partir do checkpoint...')
+            with self.profiler.span('setup'):
+                query = "SELECT nspname FROM pg_catalog.pg_namespace"
+                pg_schemas = self.pg_pool.fetch_all(query)
+                pg_schemas = [pg_schemas[i]['nspname'] for i in range(len(pg_schemas))]
+                self.target_exists = self.target_schema in pg_schemas
+                if self.shadow_schema:
+                    if self.target_exists:
+                        self.check_shadow_dependents()
+                    # Schema sombra sempre começa vazio, sobras de uma sessão que falhou são descartadas
+                    # Um schema com o mesmo nome que não foi criado por uma sessão anterior nunca é removido
+                    if self.schema in pg_schemas:
+                        if not shadow.created_by_session(self.pg_pool, self.schema):
+                            raise Exception(f'Schema {self.schema} já existe e não foi criado como schema sombra por uma sessão anterior, remova-o ou renomeie-o')
+                        self.pg_pool.execute(f"DROP SCHEMA {self.schema} CASCADE")
+                    shadow.create(self.pg_pool, self.schema)
+                    self.shadow_created = True
+                    if self.target_exists:
+                        shadow.copy_privileges(self.pg_pool, self.target_schema, self.schema)
+                    self.report(f'Carregando no schema sombra {self.schema}, {self.target_schema} será substituído ao final')
+                elif self.schema not in pg_schemas:
+                    self.pg_pool.execute(f"CREATE SCHEMA {self.schema}")
+                    self.report(f'Schema {self.schema} criado no Postgres!')
+                query = f'''SELECT table_name FROM information_schema.tables WHERE table_schema = '{self.schema}' '''
+                self.pg_tables = self.pg_pool.fetch_all(query)
+                # Tabelas existentes no schema alvo, podem ser referenciadas pelas chaves estrangeiras das tabelas migradas
+                query = f'''SELECT table_name FROM information_schema.tables WHERE table_schema = '{self.target_schema}' '''
+                self.live_tables = [table['table_name'] for table in self.pg_pool.fetch_all(query)]
+            with self.profiler.span('catalog'):
+                # O backup roda em paralelo com a leitura do catálogo, nenhuma tabela é substituída antes dele terminar
+                with ThreadPoolExecutor(1) as backup_executor:
+                    backup_future = None
+                    if self.backup:
+                        self.report(f'Criando backup do schema {self.schema}...')
+                        backup_future = backup_executor.submit(self.create_backup)
+                    # Carrega os metadados do owner no Oracle uma única vez para toda a sessão
+                    self.report(f'Carregando catálogo do schema {self.user}...')
+                    self.catalog = OracleCatalog(self.ora_query, self.user).load()
+                    if self.catalog.segments_error:
+                        self.report(f'Sem acesso ao dba_segments ({self.catalog.segments_error}), tamanho das tabelas estimado pelas estatísticas do all_tables')
+                    if self.sources:
+                        with self.profiler.span('source_read'):
+                            self.catalog.load_sources(self.ora_pool.stream)
+                        self.report(f'{len(self.catalog.sources) + len(self.catalog.views)} sources do schema {self.user} lidos')
+                    if self.watermarks:
+                        self.sync_scn = incremental.current_scn(self.ora_pool)
+                    if backup_future:
+                        backup_future.result()
+                        self.report(f'Backup do schema {self.schema} concluído!')
+            # Executa extração de cada tabela em threads assincronas
+            # As tabelas são carregadas sem constraints, então não dependem umas das outras e as maiores começam primeiro
+            # No modo incremental as tabelas sincronizadas mantêm suas chaves estrangeiras, as tabelas referenciadas
+            # são sincronizadas antes para que uma linha nova nunca chegue antes da linha que ela referencia
+            with ThreadPoolExecutor(self.max_workers) as executor:
+                # A concorrência segue a vazão em linhas escritas por segundo, medida pelas métricas da sessão
+                controller = AdaptiveConcurrency(self.workers, maximum=self.max_workers, progress=self.metrics.total_rows_written)
+                self.scheduler = DependencyScheduler(executor, self.workers, controller)
+                for table in self.tables:
+                    refs = self.referenced_tables(table) if self.watermarks else []
+                    self.scheduler.add(table, self.extract_table, table, depends_on=refs, weight=self.catalog.table_bytes(table))
+                with self.profiler.span('tables'):
+                    self.run_scheduler('Tabela')
+                self.workers = self.scheduler.concurrency
+                with self.profiler.span('constraints'):
+                    self.build_constraints(executor)
+                if self.fast_load:
+                    with self.profiler.span('analyze'):
+                        self.analyze_tables(executor)
+                # Todos os sources são traduzidos antes da implantação, em processos separados
+                with self.profiler.span('translate'):
+                    self.translate_sources()
+                # Sources só são carregados depois dos sources dos quais dependem, um nível de dependência por transação
+                with self.profiler.span('sources'):
+                    self.deploy_sources()
+                if self.sources:
+                    stats = self.translation_cache.summary()
+                    self.report(f"Cache de tradução: {stats['hits']} acertos, {stats['misses']} faltas, {stats['skipped']} sources inalterados não recriados")
+            for table in self.tables:
+                self.metrics.table_done(table)
+            if self.shadow_schema:
+                self.report(f'Substituindo o schema {self.target_schema} pelo schema sombra...')
+                with self.profiler.span('swap'):
+                    kept = shadow.swap(self.pg_pool, self.target_schema, self.schema, self.target_exists)
+                self.report(f'Schema {self.target_schema} substituído, {kept} objetos não migrados nesta sessão foram preservados')
+            if self.watermarks:
+                self.watermarks.commit()
+            self.checkpoint.finish()
+            if self.backup:
+                backup.discard_backup(self.schema)
+            self.report('Concluído!')
+            self.state = 'success'
+        except Exception as e:
+            self.report('Migração falhou!')
+            self.state = 'failed'
+            self.error_message = e
+            # Com resume os dados sincronizados ficam no Postgresql, então as marcas d'água também
+            if self.watermarks and self.resume:
+                self.watermarks.commit()
+            if self.shadow_created:
+                self.drop_shadow()
+        finally:
+            self.metrics_exporter.stop()
+            self.metrics.detach(self.etl.sparkContext)
+            self.write_profile()
+            self.translation_cache.close()
+        return self.state
+
+    # Mede uma fase no relatório de perfil da sessão e, para tabelas, também nas métricas ao vivo
+    @contextmanager
+    def phase(self, name, obj = None):
+        with self.profiler.span(name, obj):
+            if obj in self.tables:
+                with self.metrics.phase(obj, name):
+                    yield
+            else:
+                yield
+
+    # Grava o relatório de perfil (report.json e summary.txt) em runs/, ao lado do logs.txt
+    def write_profile(self):
+        run_dir = os.path.join(APP_HOME, 'runs', f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.user}")
+        try:
+            self.profiler.write(run_dir)
+            self.report(f'Relatório de tempo por fase gravado em {run_dir}')
+        except OSError as e:
+            self.report(f'Relatório de tempo por fase não gravado: {e}')
+
+    # Backup apenas das tabelas, views e funções que a sessão vai substituir
+    def create_backup(self):
+        with self.profiler.span('backup'):
+            self.write_backup()
+
+    def write_backup(self):
+        existing = [table['table_name'] for table in self.pg_tables]
+        relations = [table.lower() for table in self.tables] + [self.normalize_name(source[0]).lower() for source in self.sources if source[1] == 'VIEW']
+        routines = [self.normalize_name(source[0]).lower() for source in self.sources if source[1] != 'VIEW']
+        functions = []
+        if routines:
+            names = ', '.join(f"'{name}'" for name in routines)
+            query = f'''SELECT pg_get_functiondef(p.oid) AS definition FROM pg_proc p JOIN pg_namespace n ON n.oid = p.pronamespace
+WHERE n.nspname = '{self.schema}' AND p.prokind IN ('f', 'p') AND p.proname IN ({names})'''
+            functions = [row['definition'] for row in self.pg_pool.fetch_all(query)]
+        created = [table.lower() for table in self.tables if table.lower() not in existing]
+        replaced = [name for name in relations if name in existing]
+        dependents = [(row['schema'], row['name']) for row in self.pg_pool.fetch_all(backup.dependents_query(self.schema, replaced))] if replaced else []
+        backup.create_backup(self.pg_conf, self.schema, replaced, created, functions, self.backup_jobs, dependents, self.session_id)
+
+    # Views e chaves estrangeiras que dependem das relações que o schema sombra vai substituir seriam removidas
+    # na troca, a sessão não começa enquanto existirem (a troca também confere antes de remover o schema antigo)
+    def check_shadow_dependents(self):
+        relations = [table.lower() for table in self.tables] + [self.normalize_name(source[0]).lower() for source in self.sources if source[1] == 'VIEW']
+        with self.pg_pool.connection() as conn:
+            blocking = shadow.dependents(conn, self.target_schema, relations)
+        if blocking:
+            raise Exception(f"{', '.join(blocking)} depende de relações que o schema sombra vai substituir e seria removido na troca, remova ou recrie esses objetos depois da migração")
+
+    # Descarta o schema sombra de uma sessão que falhou, se a conexão já foi fechada a próxima sessão o remove
+    def drop_shadow(self):
+        try:
+            self.pg_pool.execute(f"DROP SCHEMA IF EXISTS {self.schema} CASCADE")
+            self.report(f'Schema sombra {self.schema} descartado, {self.target_schema} não foi alterado')
+        except Exception:
+            pass
+
+
+    # Executa o grafo de dependencias do agendador atual e reporta ciclos e falhas
+    def run_scheduler(self, kind):
+        self.dependency_futures = self.scheduler.futures
+        report_cycle = lambda cycle: self.report(f"Dependência cíclica entre {' -> '.join(cycle)}, a ordem de carga será quebrada em {cycle[-2]}")
+        failed = self.scheduler.run(on_cycle=report_cycle)
+        for node, error in failed.items():
+            self.report(f'{kind} {node} falhou: {error}')
+        for node in self.scheduler.skipped:
+            self.report(f'{kind} {node} não migrado, depende de um objeto que falhou')
+        if self.scheduler.cancelled.is_set():
+            raise Exception('Migração cancelada')
+        if failed:
+            raise Exception(f'{len(failed)} objetos falharam')
+
+    # Executa uma consulta de metadados diretamente na conexão Oracle e retorna as linhas
+    def ora_query(self, query):
+        return self.ora_pool.fetch_all(query)
+
+    # Coleta informações sobre uma tabela do cluster
+    def extract_table(self, table_name):
+        self.report(f'Coletando {table_name}...')
+        table_data = {'pk': [], 'fk': {}, 'auto': None, 'seq': None}
+        # Chaves primarias e estrangeiras a partir do catálogo da sessão
+        pk = self.catalog.primary_key(table_name)
+        table_data['pk'] = pk
+        fk = self.catalog.foreign_keys(table_name)
+        table_data['fk'] = fk
+        # Coleta as informações especificas às colunas
+        cdata = self.catalog.table_columns(table_name)
+        num_rows = self.catalog.num_rows(table_name)
+        if num_rows:
+            self.metrics.set_row_bytes(table_name, self.catalog.table_bytes(table_name) // int(num_rows))
+        # Identifica e classifica as dependencias dos objetos que referenciam a tabela
+        for referer in self.catalog.referenced_by(table_name):
+            for dep in self.catalog.references(referer['NAME']):
+                # Chaves primarias com auto incremento definida com trigger
+                if dep['TYPE'] == 'TRIGGER' and dep['REFERENCED_TYPE'] == 'SEQUENCE':
+                    if len(pk) == 1:
+                        table_data['auto'] = pk[0]
+                    else:
+                        trigger = self.catalog.triggers.get(dep['NAME'])
+                        if trigger and trigger['COLUMN_NAME']:
+                            table_data['auto'] = trigger['COLUMN_NAME']
+                    table_data['seq'] = dep['REFERENCED_NAME']
+        for column in cdata:
+            # Chave primaria com auto incremento definida com IDENTITY
+            if column['DATA_DEFAULT'] and 'nextval' in column['DATA_DEFAULT'].lower() and column['COLUMN_NAME'] in pk:
+                table_data['auto'] = column['COLUMN_NAME']
+                table_data['seq'] = column['DATA_DEFAULT'].split('.')[1]
+        if self.checkpoint.done(table_name, 'data'):
+            self.report(f'Dados da tabela {table_name} já carregados em uma sessão anterior')
+            table_data['auto_max'] = self.checkpoint.table(table_name)['auto_max']
+        else:
+            with self.phase('extract', table_name):
+                # Define o tipo Postgresql de cada coluna, sondando os dados apenas quando o catálogo não é suficiente
+                table_data['columns'] = typemap.map_table(cdata, self.probe_columns(table_name, cdata), self.type_overrides.get(table_name))
+                # No modo incremental lê apenas as linhas alteradas desde a última marca d'água
+                mark = self.table_watermark(table_name, pk)
+                # Carga interrompida em uma sessão anterior, lê apenas os chunks que não foram confirmados
+                pending = None if mark else self.pending_chunks(table_name)
+                if pending is None:
+                    # Lê os dados da tabela em partições paralelas
+                    table_data['chunks'] = self.plan_partitions(table_name, pk, cdata)
+                    predicates = incremental.changed_predicates(mark, table_data['chunks']) if mark else table_data['chunks']
+                else:
+                    plan = self.checkpoint.table(table_name)['chunks']
+                    predicates = [plan[i]['oracle'] for i in pending]
+                table_data['pending'] = pending
+                if pending != []:
+                    data = self.read_table(table_name, predicates, typemap.spark_schema(table_data['columns']))
+                    # Muda os nomes das tabelas para letras minusculas
+                    data = data.select([col(x).alias(x.lower()) for x in data.columns])
+                    table_data['data'] = data
+            self.report(f"Extração concluída na tabela {table_name}")
+            if mark:
+                self.sync_table(table_data, table_name)
+                # Tabela já existente no alvo, as constraints foram criadas na carga completa
+                # Se uma tabela referenciada foi recriada, as chaves estrangeiras foram removidas e precisam ser refeitas
+                self.checkpoint.phase_done(table_name, 'pk')
+                if not self.references_reloaded(table_name):
+                    self.checkpoint.phase_done(table_name, 'fk')
+            elif pending is not None:
+                self.resume_table(table_data, table_name)
+            else:
+                self.load_table(table_data, table_name)
+            if self.fast_load and not mark:
+                # Dados gravados sem WAL, a tabela passa a ser registrada uma única vez antes de receber índices e chaves
+                self.pg_pool.execute(f"ALTER TABLE {self.schema}.{table_name.lower()} SET LOGGED")
+            self.save_watermark(table_name)
+            self.checkpoint.phase_done(table_name, 'data', auto_max=table_data['auto_max'])
+        self.create_sequence(table_data, table_name)
+        return
+
+    # Marca d'água da última carga de uma tabela, None quando a tabela deve ser carregada por completo
+    def table_watermark(self, table_name, pk):
+        if not self.watermarks:
+            return None
+        mark = self.watermarks.get(self.user, table_name)
+        if not mark or table_name.lower() not in [table['table_name'] for table in self.pg_tables]:
+            return None
+        if not pk:
+            self.report(f'Tabela {table_name} sem chave primária, será recarregada por completo')
+            return None
+        column = self.watermark_columns.get(table_name)
+        if mark['mode'] != ('column' if column else 'scn') or mark['column'] != column:
+            self.report(f"Marca d'água de {table_name} mudou de modo, a tabela será recarregada por completo")
+            return None
+        return mark
+
+    # Guarda a marca d'água depois que a tabela foi carregada com sucesso, gravada quando a sessão conclui
+    def save_watermark(self, table_name):
+        if not self.watermarks:
+            return
+        column = self.watermark_columns.get(table_name)
+        if not column:
+            self.watermarks.set(self.user, table_name, 'scn', self.sync_scn)
+            return
+        stats = self.table_stats.get(table_name.lower())
+        value = stats['columns'][column.lower()]['max'] if stats else None
+        # Nenhuma linha nova, mantém a marca anterior
+        if value is not None:
+            self.watermarks.set(self.user, table_name, 'column', value, column)
+
+    # Analisa em uma única consulta as colunas NUMBER sem precisão (maior valor, parte fracionária) e,
+    # com probe_dates, as colunas DATE (possui hora)
+    def probe_columns(self, table_name, cdata):
+        columns = [column for column in cdata if typemap.needs_probe(column, self.probe_dates)]
+        overrides = self.type_overrides.get(table_name) or {}
+        columns = [column for column in columns if column['COLUMN_NAME'] not in [name.upper() for name in overrides]]
+        query, aliases = typemap.probe_query(self.user, table_name, columns)
+        if not query:
+            return {}
+        return typemap.probe_results(self.ora_pool.fetch_all(query)[0], aliases)
+
+    # Define os predicados que dividem a leitura de uma tabela em partições paralelas
+    # Usa faixas da chave primária numérica quando existir, senão buckets de ORA_HASH(ROWID)
+    def plan_partitions(self, table_name, pk, cdata):
+        num_rows = self.catalog.num_rows(table_name)
+        if num_rows is None:
+            # Tabela sem estatísticas, conta as linhas diretamente
+            query = f'SELECT COUNT(*) AS num_rows FROM {self.user}."{table_name}"'
+            num_rows = self.ora_pool.fetch_value(query)
+        n = min(max(math.ceil(int(num_rows) / self.ROWS_PER_PARTITION), 1), self.max_partitions)
+        if n == 1:
+            return None
+        numeric = [column['COLUMN_NAME'] for column in cdata if column['DATA_TYPE'] in ['NUMBER', 'INTEGER', 'FLOAT'] and not column['DATA_SCALE']]
+        if pk and len(pk) == 1 and pk[0] in numeric:
+            query = f'SELECT TO_CHAR(MIN("{pk[0]}")) AS lo, TO_CHAR(MAX("{pk[0]}")) AS hi FROM {self.user}."{table_name}"'
+            bounds = self.ora_pool.fetch_all(query)[0]
+            if bounds['LO'] is not None:
+                lo = math.floor(Decimal(bounds['LO']))
+                hi = math.floor(Decimal(bounds['HI'])) + 1
+                stride = max(math.ceil((hi - lo) / n), 1)
+                predicates = []
+                for start in range(lo, hi, stride):
+                    predicates.append(f'"{pk[0]}" >= {start} AND "{pk[0]}" < {min(start + stride, hi)}')
+                self.report(f'Lendo {table_name} em {len(predicates)} faixas da chave {pk[0]}...')
+                return predicates
+        self.report(f'Lendo {table_name} em {n} buckets de ORA_HASH...')
+        return [f'ORA_HASH(ROWID, {n - 1}) = {i}' for i in range(n)]
+
+    # Lê uma tabela do Oracle, uma partição Spark por predicado
+    # custom_schema força o tipo Spark das colunas mapeadas para inteiros, ponto flutuante e date
+    # columns limita a leitura a algumas colunas (ex: apenas a chave primária)
+    def read_table(self, table_name, predicates=None, custom_schema=None, columns=None):
+        properties = {'driver': self.ora_driver, 'user': self.ora_user, 'password': self.ora_password, 'fetchsize': str(self.fetch_size)}
+        if custom_schema:
+            properties['customSchema'] = custom_schema
+        source = f'{self.user}.{table_name}'
+        if columns:
+            source = f'''(SELECT {', '.join(f'"{column}"' for column in columns)} FROM {self.user}."{table_name}") k'''
+        if not predicates:
+            return self.etl.read.format('jdbc').options(url=self.ora_url, dbtable=source, **properties).load()
+        return self.etl.read.jdbc(url=self.ora_url, table=source, predicates=predicates, properties=properties)
+
+    # Escreve um DataFrame em uma tabela já existente no Postgresql com o modo de carga da sessão
+    # stats recebe as métricas da carga calculadas pelo COPY (veja load_stats)
+    def write_data(self, data, table, chunk_rows = None, stats = None):
+        if self.loader in ['copy', 'copy_binary']:
+            self.copy_table(data, table, chunk_rows, stats)
+        else:
+            data.write.mode('append').format('jdbc').options(url=self.pg_url, user=self.pg_user, password=self.pg_password, driver=self.pg_driver, dbtable=table, batchsize=self.batch_size).save()
+
+    # Escreve os dados lidos e registra no checkpoint as linhas confirmadas de cada chunk
+    # indices liga cada partição do DataFrame ao seu chunk no plano da tabela
+    # where seleciona na tabela apenas as linhas desta escrita (ex: chunks pendentes de uma retomada)
+    def write_chunks(self, data, table_name, table, indices, where = None):
+        copy = self.loader in ['copy', 'copy_binary']
+        stats = load_stats.accumulator(self.etl.sparkContext) if copy else None
+        chunk_rows = self.etl.sparkContext.accumulator({}, ChunkRowsParam()) if copy else None
+        # Os jobs do Spark desta thread ficam associados à tabela nas métricas
+        self.etl.sparkContext.setJobGroup(table_name, f'Carga de {table_name}')
+        # Cada tabela tem o seu pool no escalonador do Spark, com scheduler_mode FAIR os núcleos são divididos
+        # entre as tabelas carregadas ao mesmo tempo (pools criados sob demanda, peso 1)
+        self.etl.sparkContext.setLocalProperty('spark.scheduler.pool', table_name)
+        try:
+            with self.phase('load', table_name):
+                self.write_data(data, table, chunk_rows, stats)
+        finally:
+            # Partições confirmadas antes de uma falha também são registradas
+            if chunk_rows is not None and chunk_rows.value:
+                self.checkpoint.chunks_done(table_name, {indices[partition]: rows for partition, rows in chunk_rows.value.items()})
+        if copy:
+            summary = load_stats.summarize(stats, data.columns)
+        else:
+            # A escrita JDBC não passa pelo Python, as métricas são calculadas no Postgresql sobre as linhas escritas
+            with self.phase('stats', table_name):
+                type_names = [field.dataType.typeName() for field in data.schema.fields]
+                pg_types = self.column_types(table)
+                pg_types = [pg_types.get(column) for column in data.columns]
+                query = load_stats.summary_query(table, data.columns, type_names, pg_types, where)
+                summary = load_stats.summary_from_row(self.pg_pool.fetch_all(query)[0], data.columns, type_names)
+        self.table_stats[table_name.lower()] = summary
+        self.metrics.rows_written(table_name, summary['rows'])
+        return summary
+
+    # Carrega dados de uma tabela para a base de dados alvo
+    def load_table(self, df, table_name):
+        tbl = table_name.lower()
+        if tbl in [self.pg_tables[i]['table_name'] for i in range(len(self.pg_tables))] or self.checkpoint.started(table_name):
+            self.report(f"Tabela {tbl} já existe no schema {self.schema}, substituindo...")
+            self.pg_pool.execute(f"DROP TABLE IF EXISTS {self.schema}.{tbl} CASCADE")
+        self.reloaded.add(table_name)
+        # Cria a tabela com os tipos mapeados antes da carga, o Spark apenas insere os dados
+        self.pg_pool.execute(typemap.create_table_ddl(f'{self.schema}.{tbl}', df['columns'], self.fast_load))
+        plan = chunk_plan(df['chunks'])
+        self.checkpoint.start_data(table_name, plan)
+        self.report(f"Carregando tabela {self.schema}.{tbl}...")
+        # Carrega a informação extraida sem dependencias ou constraints
+        # As estatísticas são calculadas durante a escrita, sem ler a tabela do Oracle novamente
+        start = time()
+        stats = self.write_chunks(df['data'], table_name, f'{self.schema}.{tbl}', list(range(len(plan))) if plan else [0])
+        elapsed = max(time() - start, 1e-3)
+        rows = stats['rows']
+        nulls = {name: column['nulls'] for name, column in stats['columns'].items() if column['nulls']}
+        write2log(f'Estatísticas de {self.schema}.{tbl}: {rows} linhas, nulos por coluna {nulls}')
+        self.report(f'{rows} linhas carregadas em {self.schema}.{tbl} em {elapsed:.1f}s ({rows / elapsed:.0f} linhas/s)')
+        # Continua a sequência a partir do maior valor carregado
+        df['auto_max'] = self.column_max(stats, df['auto'])
+
+    # Chunks de uma carga interrompida que ainda precisam ser copiados, None quando a tabela deve ser recarregada por completo
+    # Cada chunk registrado é verificado contando suas linhas no Postgresql, chunks incompletos são limpos
+    def pending_chunks(self, table_name):
+        tbl = table_name.lower()
+        if not self.checkpoint.started(table_name) or tbl not in [table['table_name'] for table in self.pg_tables]:
+            return None
+        entry = self.checkpoint.table(table_name)
+        # Apenas faixas da chave primária podem ser conferidas no Postgresql
+        if not entry['chunks'] or any(chunk['pg'] is None for chunk in entry['chunks']):
+            return None
+        pending = []
+        for i, chunk in enumerate(entry['chunks']):
+            loaded = int(self.pg_pool.fetch_value(f"SELECT COUNT(*) FROM {self.schema}.{tbl} WHERE {chunk['pg']}"))
+            expected = entry['chunk_rows'].get(str(i))
+            if expected is None:
+                expected = self.ora_pool.fetch_value(f'SELECT COUNT(*) FROM {self.user}."{table_name}" WHERE {chunk["oracle"]}')
+            if loaded != int(expected):
+                if loaded:
+                    self.pg_pool.execute(f"DELETE FROM {self.schema}.{tbl} WHERE {chunk['pg']}")
+                pending.append(i)
+        self.report(f"Retomando {table_name}: {len(entry['chunks']) - len(pending)} chunks verificados, {len(pending)} pendentes")
+        return pending
+
+    # Copia apenas os chunks pendentes de uma carga interrompida
+    def resume_table(self, df, table_name):
+        tbl = table_name.lower()
+        if df['pending']:
+            start = time()
+            plan = self.checkpoint.table(table_name)['chunks']
+            where = ' OR '.join(f"({plan[i]['pg']})" for i in df['pending'])
+            stats = self.write_chunks(df['data'], table_name, f'{self.schema}.{tbl}', df['pending'], where)
+            elapsed = max(time() - start, 1e-3)
+            self.report(f"{stats['rows']} linhas de {len(df['pending'])} chunks carregadas em {self.schema}.{tbl} em {elapsed:.1f}s")
+        # Parte dos dados veio da sessão anterior, o maior valor é lido da tabela carregada
+        df['auto_max'] = None
+        if df['auto']:
+            with self.phase('sequence_max', table_name):
+                last_val = self.pg_pool.fetch_value(f'SELECT MAX("{df["auto"].lower()}") FROM {self.schema}.{tbl}')
+            df['auto_max'] = None if last_val is None else int(last_val)
+
+    # Maior valor de uma coluna nas estatísticas da carga
+    def column_max(self, stats, column):
+        if not column or stats['columns'][column.lower()]['max'] is None:
+            return None
+        return int(stats['columns'][column.lower()]['max'])
+
+    # Cria a sequência da coluna de auto incremento a partir do maior valor carregado
+    def create_sequence(self, df, table_name):
+        tbl = table_name.lower()
+        if df['auto'] and not self.checkpoint.done(table_name, 'sequence'):
+            seq = f"{self.schema}.{tbl}_{df['auto'].lower()}_seq"
+            next_val = int(df['auto_max'] or 0) + 1
+            with self.phase('sequence', table_name):
+                self.pg_pool.execute(f"CREATE SEQUENCE IF NOT EXISTS {seq} START WITH {next_val}")
+                # Sequência já existente (sincronização ou retomada) avança apenas se os dados passaram do seu valor
+                self.pg_pool.fetch_value(f"SELECT setval('{seq}', GREATEST(CASE WHEN is_called THEN last_value + 1 ELSE last_value END, {next_val}), false) FROM {seq}")
+                self.pg_pool.execute(f'''ALTER TABLE {self.schema}.{tbl} ALTER COLUMN "{df['auto'].lower()}" SET DEFAULT nextval('{seq}')''')
+                self.pg_pool.execute(f"ALTER SEQUENCE {seq} OWNER TO postgres")
+            self.checkpoint.phase_done(table_name, 'sequence')
+        self.report(f"Tabela {tbl} importada para postgres!")
+
+    # Fase de constraints, executada depois que todas as tabelas foram carregadas
+    # Chaves primárias são criadas em paralelo, maiores tabelas primeiro. Chaves estrangeiras são adicionadas
+    # NOT VALID (apenas metadados) e depois validadas em paralelo, cada validação varre apenas a sua tabela
+    def build_constraints(self, executor):
+        self.report('Criando chaves primárias...')
+        self.scheduler = DependencyScheduler(executor, self.max_workers)
+        for table in self.tables:
+            if self.catalog.primary_key(table) and not self.checkpoint.done(table, 'pk'):
+                self.scheduler.add(table, self.add_primary_key, table, weight=self.catalog.table_bytes(table))
+        self.run_scheduler('Chave primária da tabela')
+        self.build_indexes(executor)
+        self.report('Criando chaves estrangeiras...')
+        pending, failed_tables = self.add_foreign_keys()
+        self.scheduler = DependencyScheduler(executor, self.max_workers)
+        for name, table in pending.items():
+            self.scheduler.add(name, self.validate_foreign_key, table, name, weight=self.catalog.table_bytes(table))
+        failed = self.scheduler.run()
+        if self.scheduler.cancelled.is_set():
+            raise Exception('Migração cancelada')
+        # Chaves que não validaram continuam NOT VALID (valem para novas linhas), os dados precisam ser corrigidos
+        for name, error in failed.items():
+            self.report(f'Chave estrangeira {name} da tabela {pending[name]} não validada, permanece NOT VALID: {error}')
+            write2log(f'Chave estrangeira {name} da tabela {self.schema}.{pending[name].lower()} não validada: {error}')
+        failed_tables.update(pending[name] for name in failed)
+        for table in self.tables:
+            if table not in failed_tables:
+                self.checkpoint.phase_done(table, 'fk')
+
+    # Reativa o autovacuum e atualiza as estatísticas do planejador de todas as tabelas em paralelo
+    def analyze_tables(self, executor):
+        self.report('Atualizando estatísticas das tabelas...')
+        self.scheduler = DependencyScheduler(executor, self.max_workers)
+        for table in self.tables:
+            self.scheduler.add(table, self.analyze_table, table, weight=self.catalog.table_bytes(table))
+        self.run_scheduler('Análise da tabela')
+
+    def analyze_table(self, table_name):
+        table = f'{self.schema}.{table_name.lower()}'
+        with self.phase('analyze', table_name):
+            self.pg_pool.execute(f"ALTER TABLE {table} RESET (autovacuum_enabled)")
+            self.pg_pool.execute(f"ANALYZE {table}")
+
+    def add_primary_key(self, table_name):
+        with self.phase('pk', table_name), self.pg_pool.settings(**self.maintenance_settings):
+            self.pg_pool.execute(constraints.primary_key_statement(f'{self.schema}.{table_name.lower()}', self.catalog.primary_key(table_name)))
+        self.checkpoint.phase_done(table_name, 'pk')
+
+    # Cria os índices secundários do Oracle depois da carga, os maiores primeiro (leaf_blocks)
+    # Falhas (ex: expressão sem tradução) são reportadas sem interromper a migração
+    def build_indexes(self, executor):
+        self.report('Criando índices...')
+        self.scheduler = DependencyScheduler(executor, self.max_workers)
+        existing = {row['name']: row['table_name'] for row in self.pg_pool.fetch_all(indexes.existing_query(self.schema))}
+        for table in self.tables:
+            if self.checkpoint.done(table, 'index'):
+                continue
+            for index in self.catalog.table_indexes(table):
+                if not indexes.supported(index):
+                    self.report(f"Índice {index['INDEX_NAME']} do tipo {index['INDEX_TYPE']} não suportado, ignorado")
+                    continue
+                name, exists = indexes.index_name(index, table, existing)
+                if name is None:
+                    self.report(f"Índice {index['INDEX_NAME']} não criado, o nome já é usado por outra relação do schema {self.schema}")
+                    write2log(f"Índice {index['INDEX_NAME']} da tabela {table} não criado: nome ocupado no schema {self.schema}")
+                    continue
+                if exists:
+                    continue
+                if name != index['INDEX_NAME'].lower():
+                    self.report(f"Índice {index['INDEX_NAME']} será criado como {name}, o nome original já é usado por outra relação do schema {self.schema}")
+                statement = indexes.index_statement(self.schema, table, index, name)
+                self.scheduler.add(index['INDEX_NAME'], self.create_index, table, statement, weight=int(index['LEAF_BLOCKS'] or 0))
+        failed = self.scheduler.run()
+        if self.scheduler.cancelled.is_set():
+            raise Exception('Migração cancelada')
+        for name, error in failed.items():
+            self.report(f'Índice {name} não criado: {error}')
+            write2log(f'Índice {name} não criado no schema {self.schema}: {error}')
+        failed_tables = [self.catalog.indexes[name]['TABLE_NAME'] for name in failed]
+        for table in self.tables:
+            if table not in failed_tables:
+                self.checkpoint.phase_done(table, 'index')
+
+    def create_index(self, table_name, statement):
+        with self.phase('index', table_name), self.pg_pool.settings(**self.maintenance_settings):
+            self.pg_pool.execute(statement)
+
+    # Adiciona todas as chaves estrangeiras NOT VALID em uma única conexão (cada comando trava as duas tabelas
+    # por um instante, em paralelo poderiam travar uma à outra)
+    # Retorna {constraint: tabela} a validar e as tabelas com chaves que não puderam ser criadas
+    def add_foreign_keys(self):
+        existing = {row['conname']: row['convalidated'] for row in self.pg_pool.fetch_all(constraints.existing_foreign_keys_query(self.schema))}
+        pending = {}
+        failed_tables = set()
+        for table in self.tables:
+            if self.checkpoint.done(table, 'fk') and not self.references_reloaded(table):
+                continue
+            for name, fk in self.catalog.foreign_keys(table).items():
+                if existing.get(name.lower()):
+                    continue
+                if name.lower() not in existing:
+                    # Tabela referenciada migrada nesta sessão ou já existente no schema alvo
+                    if fk['ref_owner'] == self.user and fk['ref_table'] in self.tables:
+                        ref_table = f"{self.schema}.{fk['ref_table'].lower()}"
+                    elif fk['ref_owner'] == self.user and fk['ref_table'].lower() in self.live_tables:
+                        ref_table = f"{self.target_schema}.{fk['ref_table'].lower()}"
+                    else:
+                        self.report(f"Chave estrangeira {name} ignorada, referencia {fk['ref_owner']}.{fk['ref_table']} que não está no schema {self.target_schema}")
+                        continue
+                    try:
+                        self.pg_pool.execute(constraints.foreign_key_statement(f'{self.schema}.{table.lower()}', name, fk, ref_table))
+                    except Exception as e:
+                        self.report(f'Chave estrangeira {name} da tabela {table} não criada: {e}')
+                        write2log(f'Chave estrangeira {name} da tabela {self.schema}.{table.lower()} não criada: {e}')
+                        failed_tables.add(table)
+                        continue
+                pending[name] = table
+        return pending, failed_tables
+
+    # Tabelas do owner referenciadas pelas chaves estrangeiras de uma tabela
+    def referenced_tables(self, table_name):
+        return [fk['ref_table'] for fk in self.catalog.foreign_keys(table_name).values() if fk['ref_owner'] == self.user]
+
+    def references_reloaded(self, table_name):
+        return any(table in self.reloaded for table in self.referenced_tables(table_name))
+
+    def validate_foreign_key(self, table_name, name):
+        with self.phase('fk', table_name):
+            self.pg_pool.execute(constraints.validate_statement(f'{self.schema}.{table_name.lower()}', name))
+
+    # Aplica as linhas alteradas de uma tabela que já existe no Postgresql
+    # As linhas são carregadas em uma tabela de staging e aplicadas com INSERT ... ON CONFLICT na chave primária
+    def sync_table(self, df, table_name):
+        tbl = table_name.lower()
+        table = f'{self.schema}.{tbl}'
+        stage = f'{self.schema}.{tbl}_stage'
+        self.pg_pool.execute(f"DROP TABLE IF EXISTS {stage}")
+        self.pg_pool.execute(f"CREATE UNLOGGED TABLE {stage} (LIKE {table})")
+        self.report(f"Sincronizando linhas alteradas da tabela {table}...")
+        start = time()
+        stats = self.write_chunks(df['data'], table_name, stage, list(range(len(df['chunks']))) if df['chunks'] else [0])
+        pk = [column.lower() for column in df['pk']]
+        self.pg_pool.execute(incremental.upsert_statement(table, stage, df['data'].columns, pk))
+        self.pg_pool.execute(f"DROP TABLE {stage}")
+        elapsed = max(time() - start, 1e-3)
+        self.report(f"{stats['rows']} linhas alteradas aplicadas em {table} em {elapsed:.1f}s")
+        if self.detect_deletes:
+            self.delete_missing(df, table_name)
+        df['auto_max'] = self.column_max(stats, df['auto'])
+
+    # Remove do Postgresql as linhas cuja chave primária não existe mais no Oracle (diferença entre os conjuntos de chaves)
+    def delete_missing(self, df, table_name):
+        tbl = table_name.lower()
+        table = f'{self.schema}.{tbl}'
+        keys = f'{self.schema}.{tbl}_keys'
+        key_list = ', '.join(f'"{column.lower()}"' for column in df['pk'])
+        self.pg_pool.execute(f"DROP TABLE IF EXISTS {keys}")
+        self.pg_pool.execute(f"CREATE UNLOGGED TABLE {keys} AS SELECT {key_list} FROM {table} WITH NO DATA")
+        key_columns = [column for column in df['columns'] if column['name'] in df['pk']]
+        data = self.read_table(table_name, custom_schema=typemap.spark_schema(key_columns), columns=df['pk'])
+        data = data.select([col(x).alias(x.lower()) for x in data.columns])
+        self.write_data(data, keys)
+        self.pg_pool.execute(incremental.delete_statement(table, keys, [column.lower() for column in df['pk']]))
+        self.pg_pool.execute(f"DROP TABLE {keys}")
+        self.report(f"Linhas removidas no Oracle excluídas de {table}")
+
+    # Tipo de cada coluna de uma tabela do Postgresql {coluna: tipo}
+    def column_types(self, table):
+        query = f"SELECT attname, atttypid::regtype::text AS type FROM pg_attribute WHERE attrelid = '{table}'::regclass AND attnum > 0 AND NOT attisdropped"
+        return {row['attname']: row['type'] for row in self.pg_pool.fetch_all(query)}
+
+    # Envia cada partição do DataFrame para a tabela já criada com COPY FROM STDIN
+    def copy_table(self, data, table, chunk_rows = None, stats = None):
+        conf = {'driver': self.pg_driver, 'url': self.pg_url, 'user': self.pg_user, 'password': self.pg_password, 'jar': self.pg_jar}
+        columns = data.columns
+        type_names = [field.dataType.typeName() for field in data.schema.fields]
+        binary = self.loader == 'copy_binary'
+        if binary:
+            pg_types = self.column_types(table)
+            pg_types = [pg_types.get(column) for column in columns]
+            # O formato binário depende do tipo de destino, colunas em que o tipo Spark e o tipo Postgresql
+            # não combinam (ex: interval lido como texto, override para outro tipo) vão no COPY texto
+            encoders, mismatched = binary_types(type_names, pg_types)
+            if mismatched:
+                binary = False
+                detail = ', '.join(f'{columns[i]} ({type_names[i]} -> {pg_types[i]})' for i in mismatched)
+                self.report(f"{table}: colunas {detail} sem formato binário para o tipo de destino, usando COPY texto")
+            else:
+                type_names = encoders
+        ordered = load_stats.ordered_columns(data.schema)
+        data.foreachPartition(lambda rows: copy_partition(rows, conf, table, columns, type_names, binary, chunk_rows=chunk_rows, stats=stats, ordered=ordered))
+
+    # Implanta os sources traduzidos por nível de dependência (veja code/deploy.py)
+    # Sources inalterados desde a última implantação e as migrações manuais ficam fora das transações
+    def deploy_sources(self):
+        existing = {(row['kind'], row['name']) for row in self.pg_pool.fetch_all(deploy.existing_objects_query(self.schema))}
+        self.scheduler = DependencyScheduler(None, 1)
+        for name, type in self.sources:
+            if self.checkpoint.source_is_done(name):
+                self.report(f'{type} {name} já migrado em uma sessão anterior')
+            elif name not in self.translations:
+                self.report(f'{type} {name} não encontrado no all_source do owner {self.user}')
+            else:
+                refs = [dep['REFERENCED_NAME'] for dep in self.catalog.references(name, ['PROCEDURE', 'FUNCTION', 'VIEW'])]
+                self.scheduler.add(name, None, depends_on=refs)
+        levels = self.scheduler.levels(lambda cycle: self.report(f"Dependência cíclica entre {' -> '.join(cycle)}, a ordem de carga será quebrada em {cycle[-2]}"))
+        failed = 0
+        for number, level in enumerate(levels, 1):
+            if self.scheduler.cancelled.is_set():
+                raise Exception('Migração cancelada')
+            objects = []
+            done = []
+            for name in level:
+                translation = self.translations[name]
+                found = deploy.exists(translation, existing)
+                if self.translation_cache.deployed(self.deploy_target, translation) and found:
+                    self.translation_cache.skipped()
+                    self.report(f"{translation['type']} {translation['name']} inalterado desde a última implantação")
+                    done.append(name)
+                elif self.manual_migration(translation):
+                    done.append(name)
+                else:
+                    objects.append((name, deploy.attempts(translation, found)))
+            if objects:
+                self.report(f'Carregando nível {number} de {len(levels)} no Postgresql: {len(objects)} sources...')
+                errors = deploy.deploy_level(self.pg_pool, objects, lambda name: self.phase('ddl', name))
+                for name, error in errors.items():
+                    translation = self.translations[name]
+                    if error:
+                        failed += 1
+                        self.report(f"{translation['type']} {translation['name']} falhou: {error}")
+                    else:
+                        self.translation_cache.mark_deployed(self.deploy_target, translation)
+                        self.report(f"{translation['type']} {translation['name']} carregado no Postgresql!")
+                        done.append(name)
+            self.checkpoint.sources_done(done)
+        if failed:
+            self.report(f'{failed} sources não foram carregados, os demais foram mantidos')
+
+    # Remove schema e aspas do nome de um objeto
+    def normalize_name(self, name, schema = None):
+        if '.' in name:
+            name = name.split('.')
+        if type(name) == list:
+            for i in range(len(name)):
+                if '"' in name[i]:
+                    name[i] = name[i].removeprefix('"')
+                    name[i] = name[i].removesuffix('"')
+            if schema:
+                return f"{schema}.{name[1]}"
+            return name[1]
+        elif '"' in name:
+            name = name.removeprefix('"')
+            name = name.removesuffix('"')
+        if schema:
+            return f"{schema}.{name}"
+        return name
+
+    # Traduz os sources da sessão a partir do snapshot do catálogo, veja plsql.translate
+    # Procedimentos chamados por triggers (CALL) são traduzidos junto e criados antes da trigger
+    def translate_sources(self):
+        sources = {}
+        for name, type in self.sources:
+            text = self.catalog.source_text(name, type)
+            if text is not None and not self.checkpoint.source_is_done(name):
+                sources[name] = (self.translation_cache.key(type, name, text, self.user), (type, name, text))
+        translated = self.translate_all(dict(sources.values()))
+        self.translations = {name: translated[key] for name, (key, _) in sources.items()}
+        calls = {}
+        for translation in self.translations.values():
+            for proc in translation['requires']:
+                text = self.catalog.source_text(proc, 'PROCEDURE')
+                if text is None:
+                    translation['unsupported'] = f'Procedimento {proc} chamado pela trigger não encontrado no owner {self.user}'
+                elif proc not in calls:
+                    calls[proc] = (self.translation_cache.key('PROCEDURE', proc, text, self.user), ('PROCEDURE', proc, text))
+        procedures = self.translate_all(dict(calls.values()))
+        for translation in self.translations.values():
+            called = [procedures[calls[proc][0]] for proc in translation['requires'] if proc in calls]
+            for procedure in called:
+                translation['unsupported'] = translation['unsupported'] or procedure['unsupported']
+                if procedure['factory']:
+                    translation['unsupported'] = translation['unsupported'] or f"Procedimento {procedure['name']} chamado pela trigger possui subprogramas locais"
+            translation['statements'] = [statement for procedure in called for statement in procedure['statements']] + translation['statements']
+
+    # Traduz {chave do cache: (tipo, nome, texto)}, as traduções que não estão no cache são feitas em
+    # translation_workers processos (spawn, o processo não herda a JVM nem as conexões) e guardadas no cache
+    def translate_all(self, items):
+        results = {}
+        misses = []
+        for key, item in items.items():
+            translation = self.translation_cache.get(key)
+            if translation is None:
+                misses.append((key, item + (self.user,)))
+            else:
+                results[key] = translation
+        if not misses:
+            return results
+        self.report(f'Traduzindo {len(misses)} sources ({len(results)} no cache)...')
+        args = [item for _, item in misses]
+        workers = min(self.translation_workers, len(misses))
+        if workers > 1:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                translated = list(pool.map(plsql.translate_args, args, chunksize=max(len(args) // (workers * 4), 1)))
+        else:
+            with self.profiler.cprofile():
+                translated = [plsql.translate_args(item) for item in args]
+        for (key, _), translation in zip(misses, translated):
+            self.translation_cache.put(key, translation)
+            results[key] = translation
+        return results
+
+    # Factories e construções sem tradução vão para manual_migrations em vez de serem implantadas
+    def manual_migration(self, translation):
+        norm_name = translation['name']
+        if translation['factory']:
+            self.report(f"Função {norm_name} detectada como factory, não é possível garantir o funcionamento da migração\nFunção {norm_name} sera adicionada na pasta manual_migrations para migração manual!")
+            make_txt_file(norm_name, translation['source'])
+            return True
+        if translation['unsupported']:
+            self.report(f"Construção não suportada em {norm_name}: {translation['unsupported']}\n{norm_name} será adicionado em manual_migrations para migração manual!")
+            make_txt_file(norm_name, '\n'.join(translation['statements']) or translation['source'])
+            return True
+        return False
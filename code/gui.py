@@ -5,19 +5,20 @@ from pyspark.sql.functions import *
 from copy import deepcopy
 import jaydebeapi
 from code.etl import ETL_session, tk, ttk
-from subprocess import PIPE, Popen
+from code.engine import write2log
+from code import backup
+from code.db import fetch_all, fetch_value
+from code.spark_profile import load_profile, session_options
 import os
 import sys
 import pathlib
 import datetime
-import shlex
 
 if getattr(sys, 'frozen', False):
     APP_HOME = os.path.dirname(sys.executable)
 else:
     APP_HOME = os.path.dirname(os.path.abspath(__file__))
     APP_HOME = pathlib.Path(APP_HOME).parent
-LOG_FILE_PATH = os.path.join(APP_HOME, 'logs.txt')
 
 # Decorator para invocar função como thread
 def threaded(func):
@@ -32,12 +33,13 @@ class etl_UI(tk.Frame):
     no_backup = False
     active_sessions = []
 
-    def __init__(self, master, conf, pg_jar, ora_jar):
+    def __init__(self, master, conf, pg_jar, ora_jar, profile = None):
         self.master = master
         self.master.title('ETL APP PROTOTYPE')
         super().__init__(master)
         self.pack()
         self.conf = conf
+        self.profile = profile or load_profile()
         self.pg_jar = pg_jar
         self.ora_jar = ora_jar
         self.pg_conn = None
@@ -168,15 +170,14 @@ class etl_UI(tk.Frame):
             self.ora_dba = False
             if not self.ora_system_user:
                 query = f"SELECT granted_role FROM dba_role_privs WHERE grantee = '{self.ora_user.upper()}'"
-                priv = self.etl.read.format('jdbc').options(driver=self.ora_driver, user=self.ora_user, password=self.ora_password, url=self.ora_url, query=query).load().collect()
+                priv = fetch_all(self.ora_conn, query)
                 priv = [priv[i]['GRANTED_ROLE'] for i in range(len(priv))]
                 if 'DBA' in priv:
                     self.ora_dba = True
                     self.ora_system_user = True
             # Checa se é superuser no Postgresql
             query = f"SELECT usesuper FROM pg_user WHERE usename = '{self.pg_user}'"
-            superuser = self.etl.read.format('jdbc').options(driver=self.pg_driver, user=self.pg_user, password=self.pg_password, url=self.pg_url, query=query).load().collect()
-            superuser = superuser[0]['usesuper']
+            superuser = fetch_value(self.pg_conn, query)
             if superuser:
                 self.pg_superuser = True
             else:
@@ -217,29 +218,16 @@ class etl_UI(tk.Frame):
             print('Error: ' + str(e))
             return False
 
-    # Cria um backup de um schema antes de realizar o ETL.
-    # Considere modificar essa função para fazer backup apenas das tabelas migradas
-    # caso esteja demorando muito para criar o backup de todo o schema
-    def create_backup(self, schema):
-        BACKUP_FILE = os.path.join(APP_HOME, f'backups/{schema}_backup.dmp')
-        command = f"pg_dump --no-password -h {self.pg_host} -p {self.pg_port} -d {self.pg_database} -U {self.pg_user} -n {schema} -Fc -f {BACKUP_FILE}"
-        p = Popen(command, shell=True, stdin=PIPE, stdout=PIPE, stderr=PIPE, env={'PGPASSWORD': self.pg_password})
-        p.wait()
-    
-    # Restora ao estado antes do ETL
-    def restore_from_backup(self, schema):
-        BACKUP_FILE = os.path.join(APP_HOME, f'backups/{schema}_backup.dmp')
-        command = f"pg_restore --no-password -h {self.pg_host} -p {self.pg_port} -d {self.pg_database} -U {self.pg_user} {BACKUP_FILE}"
-        command = shlex.split(command)
-        p = Popen(command, shell=False, stdin=PIPE, stdout=PIPE, stderr=PIPE, env={'PG_PASSWORD': self.pg_password})
-        p.wait()
+    def pg_conf(self):
+        return {'host': self.pg_host, 'port': self.pg_port,'user': self.pg_user, 'password': self.pg_password, 'database': self.pg_database}
+
+    # Restora ao estado antes do ETL, o backup é criado pela sessão junto com a leitura do catálogo
+    def restore_from_backup(self, schema, session):
+        return backup.restore_from_backup(self.pg_conf(), schema, self.profile['backup_jobs'], session)
 
     # Escreve log no logs.txt
     def write2log(self, data):
-        with open(LOG_FILE_PATH, "a") as log_file:
-            data = datetime.datetime.strftime(datetime.datetime.now(), "%d/%m/%Y %H:%M:%S") + ': ' + data + '\n'
-            log_file.write(data)
-            log_file.close()
+        write2log(data)
 
     # Ferramenta para mensagem de erros
     def message_window(self, message):
@@ -256,7 +244,7 @@ class etl_UI(tk.Frame):
 
         # Coleta usuários (schemas em Oracle) que não são padrões do Oracle
         query = "SELECT username FROM all_users WHERE oracle_maintained = 'N'"
-        users = self.etl.read.format('jdbc').options(driver=self.ora_driver, user=self.ora_user, password=self.ora_password, url=self.ora_url, query=query).load().collect()
+        users = fetch_all(self.ora_conn, query)
         users = [users[i]['USERNAME'] for i in range(len(users))]
 
         ttk.Label(self, text='Conectado como usuário do sistema\nSelecione o usuário/schema que deseja migrar').pack(padx=20, pady=10)
@@ -286,7 +274,7 @@ class etl_UI(tk.Frame):
     def pass_schema_selection(self, listbox):
         try:
             schema = listbox.get(listbox.curselection()[0])
-            self.pg_users = self.etl.read.format('jdbc').options(driver=self.pg_driver, user=self.pg_user, password=self.pg_password, url=self.pg_url, query='SELECT usename FROM pg_user').load().collect()
+            self.pg_users = fetch_all(self.pg_conn, 'SELECT usename FROM pg_user')
             self.pg_users = [self.pg_users[i]['usename'] for i in range(len(self.pg_users))]
             if self.user_migration.get() and schema:
                 if not self.pg_superuser:
@@ -350,7 +338,7 @@ class etl_UI(tk.Frame):
                 and nsp.nspname not like 'pg_toast%' \
                 and rol.rolname = '{user}' \
             order by nsp.nspname, cls.relname"
-        objects = self.etl.read.format('jdbc').options(driver=self.pg_driver, user=self.pg_user, password=self.pg_password, url=self.pg_url, query=query).load().collect()
+        objects = fetch_all(self.pg_conn, query)
         if len(objects) == 0:
             self.migrate_user_window(user, delete=True)
         else:
@@ -394,10 +382,10 @@ class etl_UI(tk.Frame):
         
         # Migra todas as tabelas e procedures relacionadas ao usuário
         query = f"SELECT table_name FROM all_tables WHERE owner = '{user}'"
-        tables = self.etl.read.format('jdbc').options(driver=self.ora_driver, user=self.ora_user, password=self.ora_password, url=self.ora_url, query=query).load().collect()
+        tables = fetch_all(self.ora_conn, query)
         tables = [tables[i]['TABLE_NAME'] for i in range(len(tables))]
         query = f"SELECT name, type FROM all_source where owner = '{self.user}' AND line = 1 UNION SELECT view_name, 'VIEW' FROM all_views where owner = '{self.user}'"
-        sources = self.etl.read.format('jdbc').options(driver=self.ora_driver, user=self.ora_user, password=self.ora_password, url=self.ora_url, query=query).load().collect()
+        sources = fetch_all(self.ora_conn, query)
         sources = [[sources[i]['NAME'], sources[i]['TYPE']] for i in range(len(sources))]
 
         # Cria nova base de dados com o nome do usuário
@@ -418,7 +406,7 @@ class etl_UI(tk.Frame):
             self.pg_schema = 'public'
         # Cria apenas o schema com o nome do usuário e insere no DB atual
         else:
-            pg_schemas = self.etl.read.format('jdbc').options(driver=self.pg_driver, user=self.pg_user, password=self.pg_password, url=self.pg_url, query='SELECT nspname FROM pg_namespace').load().collect()
+            pg_schemas = fetch_all(self.pg_conn, 'SELECT nspname FROM pg_namespace')
             pg_schemas = [pg_schemas[i]['nspname'] for i in range(len(pg_schemas))]
             if user not in pg_schemas:
                 cur.execute(f'CREATE SCHEMA {user}')
@@ -444,7 +432,7 @@ class etl_UI(tk.Frame):
             query = f"SELECT table_name FROM all_tables WHERE owner = '{user}'"
         else:
             query = f"SELECT table_name FROM user_tables"
-        tables = self.etl.read.format('jdbc').options(driver=self.ora_driver, user=self.ora_user, password=self.ora_password, url=self.ora_url, query=query).load().collect()
+        tables = fetch_all(self.ora_conn, query)
         tables = [tables[i]['TABLE_NAME'] for i in range(len(tables))]
 
         # Seleção de tabelas
@@ -496,7 +484,7 @@ class etl_UI(tk.Frame):
             self.pg_schema = 'public'
         existing_tables = []
         tables = []
-        pg_schemas = self.etl.read.format('jdbc').options(driver=self.pg_driver, user=self.pg_user, password=self.pg_password, url=self.pg_url, query='SELECT nspname FROM pg_namespace').load().collect()
+        pg_schemas = fetch_all(self.pg_conn, 'SELECT nspname FROM pg_namespace')
         pg_schemas = [pg_schemas[i]['nspname'] for i in range(len(pg_schemas))]
         # Checa se o schema existe no postgres
         if self.pg_schema not in pg_schemas:
@@ -507,7 +495,7 @@ class etl_UI(tk.Frame):
                         JOIN pg_user e \
                         ON a.grantee = e.usesysid \
                         WHERE e.usename = '{self.pg_user}' and datname = '{self.pg_database}'"
-                perm = self.etl.read.format('jdbc').options(driver=self.pg_driver, user=self.pg_user, password=self.pg_password, url=self.pg_url, query=query).load().collect()
+                perm = fetch_all(self.pg_conn, query)
                 perm = [perm[i]['privilege_type'] for i in range(len(perm))]
                 if 'CREATE' not in perm:
                     message = f"Usuário {self.pg_user} não tem permissão para criar o schema {self.pg_schema}\nLogue com um usuário com as devidas permissões!"
@@ -526,7 +514,7 @@ class etl_UI(tk.Frame):
                         JOIN pg_user e \
                         ON a.grantee = e.usesysid \
                         WHERE e.usename = '{self.pg_user}' and nspname = '{self.pg_schema}'"
-            perm = self.etl.read.format('jdbc').options(driver=self.pg_driver, user=self.pg_user, password=self.pg_password, url=self.pg_url, query=query).load().collect()
+            perm = fetch_all(self.pg_conn, query)
             perm = [perm[i]['privilege_type'] for i in range(len(perm))]
             if 'CREATE' not in perm:
                 message = f'Usuário {self.pg_user} não tem permissão para criar tabelas no schema {self.pg_schema}!\nLogue com um usuário com as devidas permissôes!'
@@ -535,7 +523,7 @@ class etl_UI(tk.Frame):
                 self.draw_start_menu()
                 return
         query = f'''SELECT table_name FROM information_schema.tables WHERE table_schema = '{self.pg_schema}' '''
-        pg_tables = self.etl.read.format('jdbc').options(driver=self.pg_driver, user=self.pg_user, password=self.pg_password, url=self.pg_url, query=query).load().collect()
+        pg_tables = fetch_all(self.pg_conn, query)
         pg_tables = [pg_tables[i]['table_name'] for i in range(len(pg_tables))]
         for i in table_listbox.curselection():
             tables.append(table_listbox.get(i))
@@ -598,7 +586,7 @@ class etl_UI(tk.Frame):
             if s_mode.get() == '1':
                 for table in tables:
                     query = f"SELECT DISTINCT name, type FROM all_dependencies WHERE referenced_name = '{table}' AND owner = '{self.user}'"
-                    sources = self.etl.read.format('jdbc').options(driver=self.ora_driver, user=self.ora_user, password=self.ora_password, url=self.ora_url, query=query).load().collect()
+                    sources = fetch_all(self.ora_conn, query)
                     sources = [[sources[i]['NAME'], sources[i]['TYPE']] for i in range(len(sources))]
                 for source in sources:
                     textbox.insert(tk.END, f'{source[0]}    {source[1]}\n')
@@ -606,7 +594,7 @@ class etl_UI(tk.Frame):
             # Migra todos os procedimentos
             elif s_mode.get() == '2':
                 query = f"SELECT DISTINCT name, type FROM all_dependencies WHERE owner = '{self.user}'"
-                sources = self.etl.read.format('jdbc').options(driver=self.ora_driver, user=self.ora_user, password=self.ora_password, url=self.ora_url, query=query).load().collect()
+                sources = fetch_all(self.ora_conn, query)
                 sources = [[sources[i]['NAME'], sources[i]['TYPE']] for i in range(len(sources))]
                 for source in sources:
                     textbox.insert(tk.END, str(source) + '\n')
@@ -624,7 +612,7 @@ class etl_UI(tk.Frame):
             window = tk.Toplevel(self)
             window.geometry('600x400')
             query = f"SELECT name, type FROM all_source where owner = '{self.user}' AND line = 1 UNION SELECT view_name, 'VIEW' FROM all_views where owner = '{self.user}'"
-            sources = self.etl.read.format('jdbc').options(driver=self.ora_driver, user=self.ora_user, password=self.ora_password, url=self.ora_url, query=query).load().collect()
+            sources = fetch_all(self.ora_conn, query)
             sources = [[sources[i]['NAME'], sources[i]['TYPE']] for i in range(len(sources))]
 
             ttk.Label(window, text='Procedimentos disponiveis para migração\nSelecione quais deseja migrar:').pack(padx=20, pady=10)
@@ -669,7 +657,7 @@ class etl_UI(tk.Frame):
         for table in tables:
             query = f"SELECT DISTINCT table_name, owner FROM all_cons_columns WHERE constraint_name in \
             (select r_constraint_name from all_constraints where constraint_type = 'R' and table_name = '{table}')"
-            r_tables = self.etl.read.format('jdbc').options(driver=self.ora_driver, user=self.ora_user, password=self.ora_password, url=self.ora_url, query=query).load().collect()
+            r_tables = fetch_all(self.ora_conn, query)
             for i in range(len(r_tables)):
                 r_owner = r_tables[i]['OWNER']
                 r_name = r_tables[i]['TABLE_NAME']
@@ -687,7 +675,7 @@ class etl_UI(tk.Frame):
             for src in selected_sources:
                 query = f"SELECT DISTINCT referenced_name, referenced_type, referenced_owner FROM all_dependencies WHERE name = '{src[0]}' \
                     AND referenced_owner != 'PUBLIC' AND referenced_owner not like 'SYS%'"
-                dependencies = self.etl.read.format('jdbc').options(driver=self.ora_driver, user=self.ora_user, password=self.ora_password, url=self.ora_url, query=query).load().collect()
+                dependencies = fetch_all(self.ora_conn, query)
                 # Checa se objeto o qual depende pertence a um schema que não é o usuário
                 for i in range(len(dependencies)):
                     r_owner = dependencies[i]['REFERENCED_OWNER']
@@ -751,13 +739,10 @@ class etl_UI(tk.Frame):
     # Inicializa a sessão de etl e começa a migrar
     @threaded
     def begin_etl_session(self, tables, sources, outer_refs=[]):
-        pg_conf = {'host': self.pg_host, 'port': self.pg_port,'user': self.pg_user, 'password': self.pg_password, 'database': self.pg_database}
+        pg_conf = self.pg_conf()
         ora_conf = {'host': self.ora_host, 'port': self.ora_port, 'user': self.ora_user, 'password': self.ora_password, 'service': self.ora_service}
-        if not self.no_backup:
-            self.write2log(f'Criando backup do schema {self.pg_schema}')
-            self.create_backup(self.pg_schema)
         self.write2log(f"migrando tabelas {tables} e sources {sources} do Oracle schema '{self.user}' para Postgres database {self.pg_database} schema '{self.pg_schema}'!")
-        etl_session = ETL_session(self.master, pg_conf, ora_conf, self.user, tables, sources, self.etl, self.pg_jar, self.ora_jar, self.pg_schema)
+        etl_session = ETL_session(self.master, pg_conf, ora_conf, self.user, tables, sources, self.etl, self.pg_jar, self.ora_jar, self.pg_schema, backup=not self.no_backup, **session_options(self.profile))
         self.active_sessions.append(etl_session)
         # Começa a migração
         etl_session.start_etl()
@@ -779,10 +764,17 @@ class etl_UI(tk.Frame):
             if len(outer_refs) > 0:
                 self.write_outer_refs(outer_refs)
         elif session._state == 'failed':
-            if not self.no_backup:
+            if self.profile['resume']:
+                # O progresso fica no checkpoint para a próxima sessão continuar de onde parou
+                self.write2log('Migração falhou! Progresso mantido no checkpoint para retomada')
+            elif self.profile['shadow_schema']:
+                self.write2log(f'Migração falhou! Schema {self.pg_schema} não foi alterado')
+            elif not self.no_backup:
                 self.write2log('Migração falhou!\nRetornando base de dados para estado anterior...')
-                self.restore_from_backup(self.pg_schema)
-                self.write2log('Base de dados retornada ao último estado estável')
+                if session.engine and self.restore_from_backup(self.pg_schema, session.engine.session_id):
+                    self.write2log('Base de dados retornada ao último estado estável')
+                else:
+                    self.write2log('Backup não concluído, nenhuma tabela foi substituída')
         self.active_sessions.remove(session)
         del session
         self.etl.stop()
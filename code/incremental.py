@@ -0,0 +1,96 @@
+import datetime
+import json
+import os
+import threading
+
+# Sincronização incremental: cada tabela guarda uma marca d'água (watermark) da última carga
+# Modos:
+#   scn: linhas com ORA_ROWSCN maior que o SCN capturado antes da última leitura
+#        (ORA_ROWSCN é por bloco quando a tabela não tem ROWDEPENDENCIES, então podem vir linhas a mais, nunca a menos)
+#   column: linhas com a coluna escolhida pelo usuário (data ou número crescente) maior ou igual ao último valor carregado
+# As linhas alteradas são reaplicadas com INSERT ... ON CONFLICT, então reler uma linha não causa problema
+
+# Arquivo local com as marcas d'água {owner.tabela: {'mode', 'column', 'value'}}
+class WatermarkStore:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.marks = {}
+        # Marcas das tabelas sincronizadas na sessão, gravadas apenas por commit
+        self.staged = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                self.marks = json.load(file)
+
+    def key(self, owner, table):
+        return f'{owner}.{table}'
+
+    def get(self, owner, table):
+        with self.lock:
+            return self.marks.get(self.key(owner, table))
+
+    # Guarda em memória a marca d'água de uma tabela, o arquivo só muda no commit
+    def set(self, owner, table, mode, value, column = None):
+        with self.lock:
+            self.staged[self.key(owner, table)] = {'mode': mode, 'column': column, 'value': encode_value(value)}
+
+    # Grava as marcas guardadas na sessão, o arquivo é substituído de forma atômica
+    # Chamado quando os dados sincronizados ficam no Postgresql (sessão concluída ou mantida para retomada),
+    # nunca quando o backup é restaurado: as marcas avançariam sem os dados e as alterações seriam perdidas
+    def commit(self):
+        with self.lock:
+            if not self.staged:
+                return
+            self.marks.update(self.staged)
+            self.staged = {}
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as file:
+                json.dump(self.marks, file, indent=2)
+            os.replace(temp_path, self.path)
+
+# Valores guardados como texto para não perder precisão (números grandes e microssegundos)
+def encode_value(value):
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if isinstance(value, datetime.datetime):
+        return {'timestamp': value.strftime('%Y-%m-%d %H:%M:%S.%f')}
+    return {'number': str(value)}
+
+def literal(value):
+    if 'timestamp' in value:
+        return f"TO_TIMESTAMP('{value['timestamp']}', 'YYYY-MM-DD HH24:MI:SS.FF')"
+    return value['number']
+
+# Predicado Oracle que seleciona apenas as linhas alteradas desde a marca d'água
+def change_predicate(mark):
+    if mark['mode'] == 'scn':
+        return f"ORA_ROWSCN > {literal(mark['value'])}"
+    return f'''"{mark['column']}" >= {literal(mark['value'])}'''
+
+# Aplica o predicado de alteração sobre os predicados de partição da leitura
+def changed_predicates(mark, chunks):
+    predicate = change_predicate(mark)
+    if not chunks:
+        return [predicate]
+    return [f'({chunk}) AND {predicate}' for chunk in chunks]
+
+# SCN atual do Oracle, capturado antes das leituras para que alterações feitas durante a carga sejam relidas na próxima
+def current_scn(pool):
+    try:
+        return int(pool.fetch_value("SELECT TO_CHAR(current_scn) AS scn FROM v$database"))
+    except Exception:
+        return int(pool.fetch_value("SELECT TO_CHAR(DBMS_FLASHBACK.GET_SYSTEM_CHANGE_NUMBER) AS scn FROM dual"))
+
+# Comando que aplica as linhas da tabela de staging na tabela alvo pela chave primária
+def upsert_statement(table, stage, columns, pk):
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    key_list = ', '.join(f'"{column}"' for column in pk)
+    updates = [f'"{column}" = EXCLUDED."{column}"' for column in columns if column not in pk]
+    action = f"DO UPDATE SET {', '.join(updates)}" if updates else 'DO NOTHING'
+    return f'INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage} ON CONFLICT ({key_list}) {action}'
+
+# Comando que remove da tabela alvo as chaves que não existem mais no Oracle (carregadas na tabela keys)
+def delete_statement(table, keys, pk):
+    condition = ' AND '.join(f'k."{column}" = t."{column}"' for column in pk)
+    return f'DELETE FROM {table} t WHERE NOT EXISTS (SELECT 1 FROM {keys} k WHERE {condition})'
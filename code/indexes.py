@@ -0,0 +1,56 @@
+import re
+
+# Tradução dos índices do Oracle (all_indexes, all_ind_columns, all_ind_expressions) para o Postgresql
+# Índices únicos, compostos, descendentes e baseados em função viram btree, índices BITMAP e de chave reversa
+# também viram btree (o Postgresql monta bitmaps em tempo de execução)
+
+# Tipos sem equivalente, índices de LOB e de domínio (Oracle Text), índices de cluster e de tabelas organizadas por índice
+UNSUPPORTED_TYPES = ['LOB', 'DOMAIN', 'FUNCTION-BASED DOMAIN', 'CLUSTER', 'IOT - TOP']
+
+QUOTED_IDENTIFIER = re.compile(r'"([^"]+)"')
+
+# Funções do Oracle com nome diferente no Postgresql
+FUNCTIONS = {'NVL': 'COALESCE'}
+
+def supported(index):
+    return index['INDEX_TYPE'] not in UNSUPPORTED_TYPES
+
+# Converte a expressão de um índice baseado em função (nomes de colunas em minúsculo como na carga)
+def translate_expression(expression):
+    expression = QUOTED_IDENTIFIER.sub(lambda match: f'"{match.group(1).lower()}"', expression.strip())
+    for oracle, postgres in FUNCTIONS.items():
+        expression = re.sub(rf'\b{oracle}\s*\(', f'{postgres}(', expression, flags=re.IGNORECASE)
+    return expression
+
+def index_column(column):
+    expression = column['expression']
+    descend = ' DESC' if column['descend'] == 'DESC' else ''
+    if expression is None:
+        return f'"{column["name"].lower()}"{descend}'
+    # Colunas descendentes são guardadas pelo Oracle como expressão com apenas o nome da coluna
+    if QUOTED_IDENTIFIER.fullmatch(expression.strip()):
+        return translate_expression(expression) + descend
+    return f'({translate_expression(expression)}){descend}'
+
+# Relações de um schema e, para índices, a tabela indexada {nome: tabela ou None}
+def existing_query(schema):
+    return f"""SELECT c.relname AS name, t.relname AS table_name FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_index i ON i.indexrelid = c.oid LEFT JOIN pg_class t ON t.oid = i.indrelid WHERE n.nspname = '{schema}'"""
+
+# Nome do índice no Postgresql, onde índices dividem o espaço de nomes com as tabelas: um índice do Oracle com o nome
+# de outra relação (ex: o nome da própria tabela, permitido no Oracle) recebe o sufixo _idx
+# existing: {nome: tabela indexada ou None} (existing_query), atualizado com o nome escolhido
+# Retorna (nome, já existe na tabela, ex: criado por uma sessão retomada) ou (None, False) se não houver nome livre
+def index_name(index, table, existing):
+    for name in [index['INDEX_NAME'].lower(), f"{index['INDEX_NAME'].lower()}_idx"]:
+        if name not in existing:
+            existing[name] = table.lower()
+            return name, False
+        if existing[name] == table.lower():
+            return name, True
+    return None, False
+
+def index_statement(schema, table, index, name = None):
+    unique = 'UNIQUE ' if index['UNIQUENESS'] == 'UNIQUE' else ''
+    columns = ', '.join(index_column(column) for column in index['COLUMN_LIST'])
+    return f"CREATE {unique}INDEX {name or index['INDEX_NAME'].lower()} ON {schema}.{table.lower()} ({columns})"
@@ -0,0 +1,105 @@
+import datetime
+from decimal import Decimal
+
+# Tipos do Spark sem ordenação útil, apenas os nulos são contados
+UNORDERED_TYPES = ['binary', 'array', 'map', 'struct']
+
+# Métricas de cada carga (linhas, nulos, mínimo e máximo por coluna), no formato
+# {'rows': n, 'columns': {coluna: {'nulls', 'min', 'max'}}}
+# No COPY as linhas já passam pelo Python, cada partição calcula as suas durante a escrita e as envia em um
+# acumulador indexado pela partição: uma task repetida substitui o resultado da anterior em vez de somar em dobro
+# Na escrita JDBC as linhas ficam na JVM, as métricas são calculadas depois da carga com uma única agregação
+# no Postgresql sobre as linhas escritas, sem reler o Oracle e sem trazer as linhas para o Python
+
+# O acumulador só precisa de zero e addInPlace, o Spark não exige a classe base AccumulatorParam
+class StatsParam:
+
+    def zero(self, value):
+        return {}
+
+    def addInPlace(self, value1, value2):
+        value1.update(value2)
+        return value1
+
+def accumulator(spark_context):
+    return spark_context.accumulator({}, StatsParam())
+
+def partition_id():
+    from pyspark import TaskContext
+    return TaskContext.get().partitionId()
+
+# Colunas com mínimo e máximo calculados
+def ordered_columns(schema):
+    return [field.dataType.typeName() not in UNORDERED_TYPES for field in schema.fields]
+
+# Repassa as linhas de uma partição calculando as métricas, enviadas ao acumulador quando a partição termina
+def track(rows, stats, ordered):
+    count = 0
+    columns = [[0, None, None] for _ in ordered]
+    for row in rows:
+        count += 1
+        for value, column, is_ordered in zip(row, columns, ordered):
+            if value is None:
+                column[0] += 1
+            elif is_ordered:
+                if column[1] is None or value < column[1]:
+                    column[1] = value
+                if column[2] is None or value > column[2]:
+                    column[2] = value
+        yield row
+    stats.add({partition_id(): (count, columns)})
+
+# Junta as métricas das partições
+def summarize(stats, columns):
+    partitions = list(stats.value.values())
+    summary = {'rows': sum(count for count, _ in partitions), 'columns': {}}
+    for i, name in enumerate(columns):
+        values = [partition[i] for _, partition in partitions]
+        minimums = [value[1] for value in values if value[1] is not None]
+        maximums = [value[2] for value in values if value[2] is not None]
+        summary['columns'][name] = {'nulls': sum(value[0] for value in values), 'min': min(minimums, default=None), 'max': max(maximums, default=None)}
+    return summary
+
+# Mínimo e máximo calculados no Postgresql por tipo Spark: tipos da coluna no Postgresql que preservam a ordem
+# do valor lido pelo Spark, expressão que converte o valor para texto e conversão de volta para o tipo do Spark
+# Timestamps vão sem fuso no horário da sessão, como o Spark entrega ao Python
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+ORDERED_TYPES = {
+    'short': (['smallint'], '{}::text', int),
+    'integer': (['integer'], '{}::text', int),
+    'long': (['bigint'], '{}::text', int),
+    'decimal': (['numeric'], '{}::text', Decimal),
+    'float': (['real'], '{}::text', float),
+    'double': (['double precision'], '{}::text', float),
+    'string': (['text', 'character varying', 'character'], '{}::text', str),
+    'date': (['date'], "to_char({}, 'YYYY-MM-DD')", datetime.date.fromisoformat),
+    'timestamp': (['timestamp without time zone', 'timestamp with time zone'], "to_char({}, 'YYYY-MM-DD HH24:MI:SS.US')",
+                  lambda value: datetime.datetime.strptime(value, TIMESTAMP_FORMAT)),
+}
+
+def ordered_in_postgres(type_name, pg_type):
+    return type_name in ORDERED_TYPES and pg_type in ORDERED_TYPES[type_name][0]
+
+# Consulta que calcula as métricas das linhas escritas em uma tabela, where limita às linhas desta carga
+# type_names são os tipos Spark das colunas e pg_types os tipos das colunas no Postgresql
+def summary_query(table, columns, type_names, pg_types, where = None):
+    fields = ['count(*) AS rows']
+    for i, (column, type_name, pg_type) in enumerate(zip(columns, type_names, pg_types)):
+        fields.append(f'count(*) - count("{column}") AS n{i}')
+        if ordered_in_postgres(type_name, pg_type):
+            text = ORDERED_TYPES[type_name][1]
+            name = f'"{column}"'
+            fields.append(text.format(f'min({name})') + f' AS lo{i}')
+            fields.append(text.format(f'max({name})') + f' AS hi{i}')
+    query = f'SELECT {", ".join(fields)} FROM {table}'
+    return f'{query} WHERE {where}' if where else query
+
+# Lê o resultado de summary_query com os valores nos mesmos tipos calculados pelo COPY
+def summary_from_row(row, columns, type_names):
+    summary = {'rows': int(row['rows']), 'columns': {}}
+    for i, (column, type_name) in enumerate(zip(columns, type_names)):
+        convert = ORDERED_TYPES[type_name][2] if type_name in ORDERED_TYPES else None
+        low = row.get(f'lo{i}')
+        high = row.get(f'hi{i}')
+        summary['columns'][column] = {'nulls': int(row[f'n{i}']), 'min': None if low is None else convert(low), 'max': None if high is None else convert(high)}
+    return summary
@@ -0,0 +1,287 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import time
+
+# Métricas de uma sessão de ETL: linhas lidas e escritas, bytes, vazão e tempo de cada fase por tabela,
+# conexões em uso nos pools e tasks do Spark. As métricas são lidas pela janela da sessão e exportadas
+# periodicamente em um arquivo JSON lines e, opcionalmente, em um endpoint local no formato texto do Prometheus
+
+class SessionMetrics:
+
+    def __init__(self, pools = None):
+        self.lock = threading.Lock()
+        self.started = time()
+        self.tables = {}
+        # Pools de conexões acompanhados {nome: ConnectionPool}
+        self.pools = pools or {}
+        self.spark = {'active_tasks': 0, 'completed_tasks': 0, 'failed_tasks': 0, 'task_seconds': 0.0, 'active_stages': 0}
+        # Estágio do Spark -> tabela, a partir do grupo de jobs definido na escrita de cada tabela
+        self.stage_tables = {}
+        self.listener = None
+        self.status_tracker = None
+
+    def entry(self, table):
+        if table not in self.tables:
+            self.tables[table] = {'state': 'waiting', 'phase': None, 'phase_started': None, 'phases': {},
+                                  'rows_read': 0, 'rows_written': 0, 'bytes': 0, 'row_bytes': 0, 'load_seconds': 0.0}
+        return self.tables[table]
+
+    # Tamanho médio de uma linha (estatísticas do Oracle), usado para estimar bytes quando o Spark não os informa
+    def set_row_bytes(self, table, row_bytes):
+        with self.lock:
+            self.entry(table)['row_bytes'] = row_bytes
+
+    # Mede uma fase de uma tabela (extract, load, sequence, pk, index, fk, analyze)
+    # Fases repetidas, como um índice por vez, são somadas
+    @contextmanager
+    def phase(self, table, phase):
+        with self.lock:
+            entry = self.entry(table)
+            entry['state'] = 'running'
+            entry['phase'] = phase
+            entry['phase_started'] = time()
+        start = time()
+        try:
+            yield
+        except Exception:
+            with self.lock:
+                entry['state'] = 'failed'
+            raise
+        finally:
+            with self.lock:
+                entry['phases'][phase] = entry['phases'].get(phase, 0.0) + time() - start
+                if phase == 'load':
+                    entry['load_seconds'] += time() - start
+                entry['phase'] = None
+                entry['phase_started'] = None
+                if entry['state'] == 'running':
+                    entry['state'] = 'waiting'
+
+    def table_done(self, table):
+        with self.lock:
+            entry = self.entry(table)
+            if entry['state'] != 'failed':
+                entry['state'] = 'done'
+
+    # Linhas confirmadas no Postgresql ao final da escrita de uma tabela
+    def rows_written(self, table, rows):
+        with self.lock:
+            entry = self.entry(table)
+            entry['rows_written'] += rows
+            entry['rows_read'] = max(entry['rows_read'], entry['rows_written'])
+
+    # Total de linhas escritas na sessão, usado como sinal de vazão pelo AdaptiveConcurrency
+    def total_rows_written(self):
+        with self.lock:
+            return sum(entry['rows_written'] for entry in self.tables.values())
+
+    # Chamado pelo listener do Spark ao final de cada task
+    def task_end(self, stage, successful, seconds, records, bytes_read):
+        with self.lock:
+            self.spark['active_tasks'] = max(self.spark['active_tasks'] - 1, 0)
+            self.spark['completed_tasks' if successful else 'failed_tasks'] += 1
+            self.spark['task_seconds'] += seconds
+            table = self.stage_tables.get(stage)
+            if table and successful:
+                entry = self.entry(table)
+                entry['rows_read'] += records
+                entry['bytes'] += bytes_read
+
+    def task_start(self):
+        with self.lock:
+            self.spark['active_tasks'] += 1
+
+    def job_start(self, table, stages):
+        with self.lock:
+            for stage in stages:
+                self.stage_tables[stage] = table
+
+    # Sem listener, as tasks em execução são lidas do statusTracker do Spark a cada snapshot
+    def poll_status_tracker(self):
+        tracker = self.status_tracker
+        active = completed = failed = 0
+        stages = tracker.getActiveStageIds()
+        for stage in stages:
+            info = tracker.getStageInfo(stage)
+            if info:
+                active += info.numActiveTasks
+                completed += info.numCompletedTasks
+                failed += info.numFailedTasks
+        self.spark['active_stages'] = len(stages)
+        self.spark['active_tasks'] = active
+        if active or completed or failed:
+            self.spark['completed_tasks'] = max(self.spark['completed_tasks'], completed)
+            self.spark['failed_tasks'] = max(self.spark['failed_tasks'], failed)
+
+    # Registra o listener de tasks no Spark via py4j, se o callback server não puder ser iniciado usa o statusTracker
+    def attach(self, spark_context):
+        self.status_tracker = spark_context.statusTracker()
+        try:
+            from pyspark.java_gateway import ensure_callback_server_started
+            ensure_callback_server_started(spark_context._gateway)
+            self.listener = TaskListener(self)
+            spark_context._jsc.sc().addSparkListener(self.listener)
+        except Exception:
+            self.listener = None
+
+    def detach(self, spark_context):
+        if self.listener:
+            try:
+                spark_context._jsc.sc().removeSparkListener(self.listener)
+            except Exception:
+                pass
+            self.listener = None
+
+    def snapshot(self):
+        with self.lock:
+            if self.status_tracker:
+                try:
+                    if self.listener:
+                        self.spark['active_stages'] = len(self.status_tracker.getActiveStageIds())
+                    else:
+                        self.poll_status_tracker()
+                except Exception:
+                    pass
+            now = time()
+            elapsed = max(now - self.started, 1e-3)
+            tables = {}
+            for name, entry in self.tables.items():
+                load_seconds = entry['load_seconds']
+                if entry['phase'] == 'load':
+                    load_seconds += now - entry['phase_started']
+                phases = dict(entry['phases'])
+                if entry['phase']:
+                    phases[entry['phase']] = phases.get(entry['phase'], 0.0) + now - entry['phase_started']
+                tables[name] = {'state': entry['state'], 'phase': entry['phase'], 'phases': phases,
+                                'rows_read': entry['rows_read'], 'rows_written': entry['rows_written'],
+                                'bytes': entry['bytes'] or entry['rows_read'] * entry['row_bytes'],
+                                'rows_per_second': entry['rows_read'] / load_seconds if load_seconds > 0 else 0.0}
+            rows_read = sum(table['rows_read'] for table in tables.values())
+            connections = {name: {'active': pool.active, 'size': pool.size} for name, pool in self.pools.items()}
+            return {'timestamp': now, 'elapsed': elapsed, 'rows_read': rows_read,
+                    'rows_written': sum(table['rows_written'] for table in tables.values()),
+                    'bytes': sum(table['bytes'] for table in tables.values()),
+                    'rows_per_second': rows_read / elapsed, 'connections': connections,
+                    'spark': dict(self.spark), 'tables': tables}
+
+# Listener do Spark implementado em Python (chamado pela JVM através do callback server do py4j)
+# Apenas início e fim de jobs e tasks são tratados, os demais eventos são ignorados
+class TaskListener:
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def onJobStart(self, event):
+        try:
+            properties = event.properties()
+            table = properties.getProperty('spark.jobGroup.id') if properties else None
+            if table:
+                stages = event.stageIds()
+                self.metrics.job_start(table, [stages.apply(i) for i in range(stages.size())])
+        except Exception:
+            pass
+
+    def onTaskStart(self, event):
+        self.metrics.task_start()
+
+    def onTaskEnd(self, event):
+        try:
+            info = event.taskInfo()
+            task_metrics = event.taskMetrics()
+            records = bytes_read = 0
+            if task_metrics:
+                records = task_metrics.inputMetrics().recordsRead()
+                bytes_read = task_metrics.inputMetrics().bytesRead()
+            self.metrics.task_end(event.stageId(), info.successful(), info.duration() / 1000, records, bytes_read)
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        if name.startswith('on'):
+            return lambda *args: None
+        raise AttributeError(name)
+
+    class Java:
+        implements = ['org.apache.spark.scheduler.SparkListenerInterface']
+
+# Métricas no formato texto do Prometheus
+def prometheus_text(snapshot):
+    lines = [
+        '# TYPE etl_rows_read_total counter', f"etl_rows_read_total {snapshot['rows_read']}",
+        '# TYPE etl_rows_written_total counter', f"etl_rows_written_total {snapshot['rows_written']}",
+        '# TYPE etl_bytes_total counter', f"etl_bytes_total {snapshot['bytes']}",
+        '# TYPE etl_rows_per_second gauge', f"etl_rows_per_second {snapshot['rows_per_second']:.3f}",
+        '# TYPE etl_connections_active gauge',
+    ]
+    for name, pool in snapshot['connections'].items():
+        lines.append(f'etl_connections_active{{pool="{name}"}} {pool["active"]}')
+    lines.append('# TYPE etl_spark_tasks gauge')
+    for key in ['active_tasks', 'completed_tasks', 'failed_tasks']:
+        lines.append(f'etl_spark_tasks{{state="{key.split("_")[0]}"}} {snapshot["spark"][key]}')
+    lines += ['# TYPE etl_table_rows_read counter']
+    lines += [f'etl_table_rows_read{{table="{name}"}} {table["rows_read"]}' for name, table in snapshot['tables'].items()]
+    lines += ['# TYPE etl_table_rows_per_second gauge']
+    lines += [f'etl_table_rows_per_second{{table="{name}"}} {table["rows_per_second"]:.3f}' for name, table in snapshot['tables'].items()]
+    lines += ['# TYPE etl_table_phase_seconds gauge']
+    for name, table in snapshot['tables'].items():
+        for phase, seconds in table['phases'].items():
+            lines.append(f'etl_table_phase_seconds{{table="{name}",phase="{phase}"}} {seconds:.3f}')
+    return '\n'.join(lines) + '\n'
+
+# Grava um snapshot por intervalo no arquivo JSON lines e serve /metrics em 127.0.0.1:port quando port é definido
+class MetricsExporter:
+
+    def __init__(self, metrics, path, interval = 5, port = None):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.port = port
+        self.stopped = threading.Event()
+        self.thread = None
+        self.server = None
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+        if self.port:
+            metrics = self.metrics
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path != '/metrics':
+                        self.send_error(404)
+                        return
+                    body = prometheus_text(metrics.snapshot()).encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def loop(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(self.metrics.snapshot(), default=str) + '\n')
+
+    # Para o exportador gravando um último snapshot com o estado final
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        self.write()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
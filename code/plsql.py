@@ -0,0 +1,699 @@
+import re
+from collections import namedtuple
+
+# Tradução de sources PL/SQL (procedimentos, funções, triggers e views) para PL/pgSQL
+# O texto é quebrado uma única vez por um lexer que reconhece strings, comentários e identificadores entre aspas,
+# o parser monta uma árvore leve (cabeçalho, declarações, corpo e tratadores de exceção) e a tradução é uma
+# única passada linear sobre os tokens de cada parte, sem remoções ou inserções no meio da lista
+
+# Versão do tradutor, faz parte da chave do cache de traduções (code/translation_cache.py)
+# Deve ser incrementada sempre que uma mudança aqui alterar o texto gerado
+TRANSLATOR_VERSION = 3
+
+Token = namedtuple('Token', ['kind', 'value'])
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<qstring>[nN]?[qQ]'(?:\[.*?\]|\{.*?\}|\(.*?\)|<.*?>|(?P<delim>[^\s\[{(<]).*?(?P=delim))')
+  | (?P<string>[nN]?'(?:[^']|'')*')
+  | (?P<quoted>"[^"]*")
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$#]*)
+  | (?P<symbol>:=|\|\||\.\.|=>|<=|>=|<>|!=|\*\*|.)
+""", re.VERBOSE | re.DOTALL)
+
+SIMPLE_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_$]*')
+
+# Tipos PL/SQL sem o mesmo nome no Postgresql
+TYPES = {'NUMBER': 'numeric', 'VARCHAR2': 'varchar', 'NVARCHAR2': 'varchar', 'PLS_INTEGER': 'integer',
+         'BINARY_INTEGER': 'integer', 'SIMPLE_INTEGER': 'integer',
+         'DATE': 'timestamp(0)', 'CLOB': 'text', 'NCLOB': 'text', 'LONG': 'text', 'BLOB': 'bytea', 'RAW': 'bytea',
+         'BINARY_FLOAT': 'real', 'BINARY_DOUBLE': 'double precision', 'SYS_REFCURSOR': 'refcursor'}
+
+# Funções e pseudo-colunas do Oracle com outro nome no Postgresql
+FUNCTIONS = {'NVL': 'COALESCE', 'SYSDATE': 'LOCALTIMESTAMP(0)', 'SYSTIMESTAMP': 'CURRENT_TIMESTAMP', 'SQLCODE': 'SQLSTATE'}
+
+# Exceções pré-definidas do Oracle -> condições do Postgresql (NO_DATA_FOUND, TOO_MANY_ROWS e OTHERS têm o mesmo nome)
+EXCEPTIONS = {'DUP_VAL_ON_INDEX': 'unique_violation', 'ZERO_DIVIDE': 'division_by_zero', 'INVALID_NUMBER': 'invalid_text_representation',
+              'VALUE_ERROR': 'data_exception', 'CURSOR_ALREADY_OPEN': 'duplicate_cursor', 'INVALID_CURSOR': 'invalid_cursor_state',
+              'TIMEOUT_ON_RESOURCE': 'lock_not_available'}
+
+# Predicados de trigger do Oracle
+TRIGGER_PREDICATES = {'INSERTING': "TG_OP = 'INSERT'", 'UPDATING': "TG_OP = 'UPDATE'", 'DELETING': "TG_OP = 'DELETE'"}
+
+# Cláusulas do cabeçalho de funções sem equivalente
+ROUTINE_CLAUSES = ['DETERMINISTIC', 'PIPELINED', 'PARALLEL_ENABLE', 'RESULT_CACHE', 'AUTHID', 'CURRENT_USER', 'DEFINER', 'ACCESSIBLE']
+
+# Tratador usado quando o source do Oracle não trata exceções
+DEFAULT_HANDLER = "EXCEPTION WHEN OTHERS THEN\nraise notice 'Transaction has failed and rolledback!';\nraise notice '% %', SQLERRM, SQLSTATE;\n"
+
+# Retorno de uma função de trigger, linhas apagadas só existem em OLD
+TRIGGER_RETURN = "IF TG_OP = 'DELETE' THEN RETURN OLD; END IF;\nRETURN NEW;\n"
+
+class TranslationError(Exception):
+    pass
+
+def tokenize(text):
+    tokens = []
+    append = tokens.append
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'qstring':
+            # q'[...]' vira uma string comum com as aspas internas duplicadas
+            if value[0] in 'nN':
+                value = value[1:]
+            kind = 'string'
+            value = "'" + value[3:-2].replace("'", "''") + "'"
+        elif kind == 'string' and value[0] in 'nN':
+            value = value[1:]
+        append(Token(kind, value))
+    return tokens
+
+def significant(token):
+    return token.kind not in ['space', 'comment']
+
+def upper(token):
+    return token.value.upper() if token.kind == 'word' else token.value
+
+def identifier(token):
+    if token.kind == 'quoted':
+        return token.value[1:-1]
+    return token.value
+
+# Nome de um objeto no Postgresql (sem owner, minúsculo quando possível)
+def pg_name(name):
+    name = name.strip().strip('"')
+    return name.lower() if SIMPLE_IDENTIFIER.fullmatch(name) else f'"{name}"'
+
+# Árvore leve de um source
+Param = namedtuple('Param', ['name', 'mode', 'type', 'default'])
+Block = namedtuple('Block', ['declarations', 'body', 'handlers'])
+Routine = namedtuple('Routine', ['kind', 'name', 'params', 'returns', 'block', 'factory'])
+Trigger = namedtuple('Trigger', ['name', 'timing', 'events', 'table', 'row_level', 'when', 'aliases', 'block', 'call', 'factory'])
+
+# Parser sobre a lista de tokens, pos aponta sempre para um token significativo
+class Parser:
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+        self.skip()
+
+    def skip(self):
+        while self.pos < len(self.tokens) and not significant(self.tokens[self.pos]):
+            self.pos += 1
+
+    def peek(self, offset = 0):
+        i = self.pos
+        for _ in range(offset):
+            i += 1
+            while i < len(self.tokens) and not significant(self.tokens[i]):
+                i += 1
+        return self.tokens[i] if i < len(self.tokens) else Token('eof', '')
+
+    def at(self, *words):
+        return upper(self.peek()) in words
+
+    def advance(self):
+        token = self.peek()
+        self.pos += 1
+        self.skip()
+        return token
+
+    def expect(self, *words):
+        token = self.advance()
+        if upper(token) not in words:
+            raise TranslationError(f"Esperado {' ou '.join(words)}, encontrado '{token.value}'")
+        return token
+
+    # Nome possivelmente qualificado (owner.nome), retorna apenas o nome
+    def name(self):
+        token = self.advance()
+        if token.kind not in ['word', 'quoted']:
+            raise TranslationError(f"Nome esperado, encontrado '{token.value}'")
+        while self.peek().value == '.':
+            self.advance()
+            token = self.advance()
+        return identifier(token)
+
+    # Tokens até (sem incluir) o parêntese que fecha o atual, pos deve estar logo após o '('
+    def until_close(self):
+        start = self.pos
+        depth = 1
+        while self.pos < len(self.tokens):
+            value = self.tokens[self.pos].value
+            if self.tokens[self.pos].kind == 'symbol':
+                if value == '(':
+                    depth += 1
+                elif value == ')':
+                    depth -= 1
+                    if depth == 0:
+                        inner = self.tokens[start:self.pos]
+                        self.pos += 1
+                        self.skip()
+                        return inner
+            self.pos += 1
+        raise TranslationError('Parêntese não fechado')
+
+    # Tokens significativos até uma das palavras, no mesmo nível de parênteses
+    def until(self, *words):
+        start = self.pos
+        depth = 0
+        while self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            if depth == 0 and significant(token) and upper(token) in words:
+                return self.tokens[start:self.pos]
+            if token.value == '(':
+                depth += 1
+            elif token.value == ')':
+                depth -= 1
+            self.pos += 1
+        raise TranslationError(f"Esperado {' ou '.join(words)}")
+
+    def params(self):
+        params = []
+        if self.peek().value != '(':
+            return params
+        self.advance()
+        for part in split_top_level(self.until_close(), ','):
+            sub = Parser(part)
+            name = identifier(sub.advance())
+            mode = 'IN'
+            if sub.at('IN'):
+                sub.advance()
+                if sub.at('OUT'):
+                    sub.advance()
+                    mode = 'INOUT'
+            elif sub.at('OUT'):
+                sub.advance()
+                mode = 'OUT'
+            if sub.at('NOCOPY'):
+                sub.advance()
+            param_type = sub.rest_until('DEFAULT', ':=')
+            default = None
+            if sub.at('DEFAULT', ':='):
+                sub.advance()
+                default = sub.tokens[sub.pos:]
+            params.append(Param(name, mode, param_type, default))
+        return params
+
+    def rest_until(self, *words):
+        start = self.pos
+        while self.pos < len(self.tokens) and upper(self.peek()) not in words and self.peek().kind != 'eof':
+            self.advance()
+        return self.tokens[start:self.pos]
+
+    # Posição logo após o último token significativo, inclui os espaços e comentários antes do token atual
+    def raw_start(self):
+        start = self.pos
+        while start > 0 and not significant(self.tokens[start - 1]):
+            start -= 1
+        return start
+
+    # Bloco PL/SQL: [declarações] BEGIN corpo [EXCEPTION tratadores] END
+    # Com declare = False o bloco começa direto no BEGIN (trigger sem DECLARE)
+    def block(self, declare = True):
+        declarations = []
+        if declare:
+            start = self.raw_start()
+            depth = 0
+            while not (depth == 0 and self.at('BEGIN')):
+                token = self.peek()
+                if token.kind == 'eof':
+                    raise TranslationError('BEGIN não encontrado')
+                # Funções e procedimentos locais não existem no PL/pgSQL
+                if depth == 0 and upper(token) in ['FUNCTION', 'PROCEDURE']:
+                    return None, True
+                if token.value == '(':
+                    depth += 1
+                elif token.value == ')':
+                    depth -= 1
+                elif token.value == ';' and depth == 0:
+                    # Cada declaração leva junto o espaço e os comentários que a antecedem
+                    end = self.pos + 1
+                    declarations.append(self.tokens[start:end])
+                    self.advance()
+                    start = end
+                    continue
+                self.advance()
+        self.expect('BEGIN')
+        # O corpo começa logo após o BEGIN, mantendo quebras de linha e comentários
+        start = self.raw_start()
+        body_end = None
+        depth = 1
+        # Blocos internos com DECLARE abrem o nível no DECLARE, o BEGIN seguinte não abre outro
+        declared = set()
+        previous = 'BEGIN'
+        while True:
+            token = self.peek()
+            word = upper(token)
+            if token.kind == 'eof':
+                raise TranslationError('END final não encontrado')
+            if token.kind == 'word':
+                if word == 'DECLARE':
+                    depth += 1
+                    declared.add(depth)
+                elif word == 'BEGIN':
+                    if depth in declared:
+                        declared.discard(depth)
+                    else:
+                        depth += 1
+                elif word == 'CASE':
+                    depth += 1
+                elif word == 'END':
+                    following = upper(self.peek(1))
+                    if following in ['IF', 'LOOP']:
+                        self.advance()
+                    else:
+                        if following == 'CASE':
+                            self.advance()
+                        depth -= 1
+                        if depth == 0:
+                            end = self.pos
+                            self.advance()
+                            if self.peek().kind in ['word', 'quoted'] and self.peek().value != ';':
+                                self.advance()
+                            break
+                elif word == 'EXCEPTION' and depth == 1 and previous in [';', 'BEGIN'] and upper(self.peek(1)) == 'WHEN':
+                    body_end = self.pos
+            previous = word
+            self.advance()
+        if body_end is None:
+            return Block(declarations, self.tokens[start:end], None), False
+        # Pula a palavra EXCEPTION
+        handlers_start = body_end + 1
+        return Block(declarations, self.tokens[start:body_end], self.tokens[handlers_start:end]), False
+
+def split_top_level(tokens, separator):
+    parts = [[]]
+    depth = 0
+    for token in tokens:
+        if token.value == '(':
+            depth += 1
+        elif token.value == ')':
+            depth -= 1
+        if depth == 0 and token.kind == 'symbol' and token.value == separator:
+            parts.append([])
+            continue
+        parts[-1].append(token)
+    return [part for part in parts if any(significant(token) for token in part)]
+
+def parse_routine(tokens):
+    parser = Parser(tokens)
+    while not parser.at('FUNCTION', 'PROCEDURE'):
+        if parser.peek().kind == 'eof':
+            raise TranslationError('FUNCTION ou PROCEDURE esperado')
+        parser.advance()
+    kind = upper(parser.advance())
+    name = parser.name()
+    params = parser.params()
+    returns = None
+    if kind == 'FUNCTION':
+        parser.expect('RETURN')
+        returns = parser.rest_until('IS', 'AS', *ROUTINE_CLAUSES)
+    while not parser.at('IS', 'AS'):
+        if parser.peek().kind == 'eof':
+            raise TranslationError('IS ou AS esperado')
+        parser.advance()
+    parser.advance()
+    block, factory = parser.block()
+    return Routine(kind, name, params, returns, block, factory)
+
+def parse_trigger(tokens):
+    parser = Parser(tokens)
+    while not parser.at('TRIGGER'):
+        if parser.peek().kind == 'eof':
+            raise TranslationError('TRIGGER esperado')
+        parser.advance()
+    parser.advance()
+    name = parser.name()
+    timing = upper(parser.advance())
+    if timing == 'INSTEAD':
+        parser.expect('OF')
+        timing = 'INSTEAD OF'
+    if timing not in ['BEFORE', 'AFTER', 'INSTEAD OF']:
+        raise TranslationError(f'Trigger {timing} não suportada')
+    events = parser.until('ON')
+    parser.advance()
+    table = parser.name()
+    aliases = {}
+    row_level = False
+    when = None
+    while True:
+        if parser.at('REFERENCING'):
+            parser.advance()
+            while parser.at('NEW', 'OLD', 'PARENT'):
+                target = upper(parser.advance())
+                if parser.at('AS'):
+                    parser.advance()
+                aliases[parser.name().upper()] = target
+        elif parser.at('FOR'):
+            parser.advance()
+            parser.expect('EACH')
+            parser.expect('ROW')
+            row_level = True
+        elif parser.at('WHEN'):
+            parser.advance()
+            parser.expect('(')
+            when = parser.until_close()
+        elif parser.at('FOLLOWS', 'PRECEDES'):
+            parser.advance()
+            parser.name()
+        elif parser.at('ENABLE', 'DISABLE', 'FORWARD', 'REVERSE', 'CROSSEDITION'):
+            parser.advance()
+        else:
+            break
+    if parser.at('COMPOUND'):
+        raise TranslationError('Compound trigger não suportada')
+    if parser.at('CALL'):
+        parser.advance()
+        call_name = parser.name()
+        args = []
+        if parser.peek().value == '(':
+            parser.advance()
+            args = parser.until_close()
+        return Trigger(name, timing, events, table, row_level, when, aliases, None, (call_name, args), False)
+    declare = parser.at('DECLARE')
+    if declare:
+        parser.advance()
+    block, factory = parser.block(declare)
+    return Trigger(name, timing, events, table, row_level, when, aliases, block, None, factory)
+
+# Passada linear de tradução sobre uma lista de tokens
+# Guarda o que precisa ser declarado (variáveis record dos FOR sobre consultas) e o que não tem tradução
+class Rewriter:
+
+    # trigger: aliases do REFERENCING {alias: NEW/OLD}, None fora de triggers
+    # bare_aliases: na cláusula WHEN as referências são new.coluna, sem os dois pontos
+    def __init__(self, owner = None, trigger = None, bare_aliases = False):
+        self.owner = owner.upper() if owner else None
+        self.trigger = trigger
+        self.bare_aliases = bare_aliases
+        # Exceções declaradas pelo usuário -> SQLSTATE próprio
+        self.exceptions = {}
+        self.records = []
+        self.unsupported = None
+
+    def next_index(self, tokens, i):
+        i += 1
+        while i < len(tokens) and not significant(tokens[i]):
+            i += 1
+        return i
+
+    def word_at(self, tokens, i):
+        return upper(tokens[i]) if i < len(tokens) else ''
+
+    def kind_at(self, tokens, i):
+        return tokens[i].kind if i < len(tokens) else 'eof'
+
+    def matching(self, tokens, i):
+        depth = 0
+        for j in range(i, len(tokens)):
+            if tokens[j].kind == 'symbol':
+                if tokens[j].value == '(':
+                    depth += 1
+                elif tokens[j].value == ')':
+                    depth -= 1
+                    if depth == 0:
+                        return j
+        raise TranslationError('Parêntese não fechado')
+
+    # Próximo ';' no nível atual, usado para descartar declarações inteiras
+    def statement_end(self, tokens, i):
+        while i < len(tokens) and tokens[i].value != ';':
+            i += 1
+        return i
+
+    def exception_code(self, name):
+        if name not in self.exceptions:
+            self.exceptions[name] = f'OE{len(self.exceptions) + 1:03d}'
+        return self.exceptions[name]
+
+    def rewrite(self, tokens):
+        out = []
+        dropped = set()
+        previous = ''
+        cursor = False
+        i = 0
+        n = len(tokens)
+        while i < n:
+            token = tokens[i]
+            if i in dropped:
+                i += 1
+                continue
+            if not significant(token):
+                out.append(token.value)
+                i += 1
+                continue
+            word = upper(token)
+            j = self.next_index(tokens, i)
+            following = self.word_at(tokens, j)
+            # owner.objeto -> objeto
+            if token.kind in ['word', 'quoted'] and self.owner and identifier(token).upper() == self.owner and following == '.':
+                i = j + 1
+                continue
+            if token.kind == 'quoted':
+                out.append(pg_name(token.value))
+            elif token.kind != 'word':
+                # :new / :old e aliases do REFERENCING
+                if token.value == ':' and self.kind_at(tokens, j) == 'word':
+                    target = following if following in ['NEW', 'OLD'] else (self.trigger or {}).get(following)
+                    if target:
+                        out.append(target)
+                        previous = target
+                        i = j + 1
+                        continue
+                out.append(token.value)
+            elif word in ['DBMS_OUTPUT'] and following == '.':
+                k = self.next_index(tokens, j)
+                call = self.word_at(tokens, k)
+                k = self.next_index(tokens, k)
+                if call in ['PUT_LINE', 'PUT'] and k < n and tokens[k].value == '(':
+                    close = self.matching(tokens, k)
+                    out.append(self.notice(tokens[k + 1:close]))
+                    i = close + 1
+                else:
+                    # enable, disable, new_line... não fazem nada no Postgresql
+                    out.append('NULL')
+                    i = k if k < n and tokens[k].value != '(' else self.matching(tokens, k) + 1
+                previous = ')'
+                continue
+            elif word in ['DBMS_LOCK', 'DBMS_SESSION'] and following == '.' and self.word_at(tokens, self.next_index(tokens, j)) == 'SLEEP':
+                out.append('PERFORM pg_sleep')
+                i = self.next_index(tokens, self.next_index(tokens, j))
+                previous = 'PG_SLEEP'
+                continue
+            elif word.startswith('DBMS_') or word.startswith('UTL_'):
+                self.unsupported = self.unsupported or token.value
+                out.append(token.value)
+            elif word == 'EXECUTE' and following == 'IMMEDIATE':
+                out.append('EXECUTE')
+                i = j + 1
+                previous = 'EXECUTE'
+                continue
+            elif word == 'RAISE_APPLICATION_ERROR' and j < n and tokens[j].value == '(':
+                close = self.matching(tokens, j)
+                out.append(self.application_error(tokens[j + 1:close]))
+                i = close + 1
+                previous = ')'
+                continue
+            elif word == 'RAISE' and self.kind_at(tokens, j) in ['word', 'quoted']:
+                name = identifier(tokens[j]).upper()
+                if name in self.exceptions:
+                    out.append(f"RAISE EXCEPTION '{name.lower()}' USING ERRCODE = '{self.exceptions[name]}'")
+                elif name in EXCEPTIONS:
+                    out.append(f'RAISE {EXCEPTIONS[name]}')
+                elif name in ['NO_DATA_FOUND', 'TOO_MANY_ROWS']:
+                    out.append(f'RAISE {name.lower()}')
+                else:
+                    out.append(f"RAISE EXCEPTION 'EXCEPTION_{name.lower()}'")
+                i = j + 1
+                previous = name
+                continue
+            elif previous in ['WHEN', 'OR'] and word in self.exceptions:
+                out.append(f"SQLSTATE '{self.exceptions[word]}'")
+            elif previous in ['WHEN', 'OR'] and word in EXCEPTIONS:
+                out.append(EXCEPTIONS[word])
+            elif following == 'EXCEPTION' and self.word_at(tokens, self.next_index(tokens, j)) == ';':
+                # Declaração de exceção do usuário, vira um SQLSTATE próprio
+                self.exception_code(identifier(token).upper())
+                i = self.next_index(tokens, self.next_index(tokens, j)) + 1
+                continue
+            elif word == 'PRAGMA':
+                i = self.statement_end(tokens, i) + 1
+                continue
+            elif word == 'CURSOR' and self.kind_at(tokens, j) in ['word', 'quoted']:
+                out.append(f'{pg_name(tokens[j].value)} CURSOR')
+                cursor = True
+                i = j + 1
+                previous = 'CURSOR'
+                continue
+            elif word == 'IS' and cursor:
+                out.append('FOR')
+                cursor = False
+            elif word == 'FROM' and following == 'DUAL':
+                i = j + 1
+                continue
+            elif word == 'FOR' and following not in ['UPDATE', 'EACH']:
+                # FOR r IN (SELECT ...) LOOP -> FOR r IN SELECT ... LOOP, r precisa ser declarada como record
+                k = self.next_index(tokens, j)
+                m = self.next_index(tokens, k)
+                if self.word_at(tokens, k) == 'IN' and m < n and tokens[m].value == '(' and self.word_at(tokens, self.next_index(tokens, m)) in ['SELECT', 'WITH']:
+                    dropped.add(m)
+                    dropped.add(self.matching(tokens, m))
+                    record = pg_name(tokens[j].value)
+                    if record not in self.records:
+                        self.records.append(record)
+                out.append(token.value)
+            elif following == '%' and self.word_at(tokens, self.next_index(tokens, j)) in ['NOTFOUND', 'FOUND']:
+                # cursor%NOTFOUND -> NOT FOUND (FOUND é atualizado por FETCH, SELECT INTO e DML)
+                attribute = self.word_at(tokens, self.next_index(tokens, j))
+                out.append('NOT FOUND' if attribute == 'NOTFOUND' else 'FOUND')
+                i = self.next_index(tokens, j) + 1
+                previous = 'FOUND'
+                continue
+            elif word in ['BYTE', 'CHAR'] and previous.isdigit() and following == ')':
+                i += 1
+                continue
+            elif self.bare_aliases and word in self.trigger and following == '.':
+                out.append(self.trigger[word])
+            elif self.trigger is not None and word in TRIGGER_PREDICATES:
+                if following == '(':
+                    # UPDATING('COLUNA') depende das colunas citadas no UPDATE, sem equivalente no Postgresql
+                    self.unsupported = self.unsupported or f'{token.value}(coluna)'
+                    out.append(token.value)
+                else:
+                    out.append(TRIGGER_PREDICATES[word])
+            elif word in FUNCTIONS and previous != '.':
+                out.append(FUNCTIONS[word])
+            elif word in TYPES and previous not in ['.', '%']:
+                out.append(TYPES[word])
+            else:
+                out.append(token.value)
+            previous = word
+            i += 1
+        return ''.join(out)
+
+    # dbms_output.put_line('a' || x || 'b') -> RAISE NOTICE 'a%b', x
+    def notice(self, args):
+        text = ''
+        values = []
+        for part in split_top_level(args, '||'):
+            literals = [token for token in part if significant(token)]
+            if len(literals) == 1 and literals[0].kind == 'string':
+                text += literals[0].value[1:-1].replace('%', '%%')
+            else:
+                text += '%'
+                values.append(self.rewrite(part).strip())
+        return f"RAISE NOTICE '{text}'" + ''.join(f', {value}' for value in values)
+
+    # raise_application_error(-20001, mensagem) -> RAISE EXCEPTION com o código do Oracle no DETAIL
+    def application_error(self, args):
+        parts = split_top_level(args, ',')
+        if len(parts) < 2:
+            raise TranslationError('raise_application_error sem mensagem')
+        code = self.rewrite(parts[0]).strip()
+        message = self.rewrite(parts[1]).strip()
+        detail = f", DETAIL = 'ORA{code}'" if re.fullmatch(r'-?\d+', code) else ''
+        return f"RAISE EXCEPTION '%', {message} USING ERRCODE = 'P0001'{detail}"
+
+def rewrite_params(params, rewriter):
+    parts = []
+    for param in params:
+        default = f' DEFAULT {rewriter.rewrite(param.default).strip()}' if param.default else ''
+        mode = '' if param.mode == 'IN' else f'{param.mode} '
+        parts.append(f'{mode}{pg_name(param.name)} {rewriter.rewrite(param.type).strip()}{default}')
+    return ', '.join(parts)
+
+def rewrite_declarations(block, rewriter):
+    return ''.join(rewriter.rewrite(declaration) for declaration in block.declarations)
+
+def block_body(block, rewriter, declarations):
+    body = rewriter.rewrite(block.body)
+    handlers = rewriter.rewrite(block.handlers) if block.handlers is not None else None
+    records = ''.join(f'\n{record} record;' for record in rewriter.records)
+    return declarations + records, body, handlers
+
+def result(type, name, text, statements = None, requires = None, factory = False, unsupported = None):
+    return {'type': type, 'name': name, 'source': text, 'statements': statements or [], 'requires': requires or [],
+            'factory': factory, 'unsupported': unsupported}
+
+def translate_routine(type, text, owner):
+    routine = parse_routine(tokenize(text))
+    name = pg_name(routine.name)
+    if routine.factory:
+        return result(type, name, text, factory=True)
+    rewriter = Rewriter(owner)
+    params = rewrite_params(routine.params, rewriter)
+    declarations, body, handlers = block_body(routine.block, rewriter, rewrite_declarations(routine.block, rewriter))
+    header = f'CREATE OR REPLACE {routine.kind} {name}({params})'
+    if routine.returns:
+        header += f' RETURNS {rewriter.rewrite(routine.returns).strip()}'
+    handlers = f'EXCEPTION{handlers}' if handlers is not None else DEFAULT_HANDLER
+    statement = f'{header}\nLANGUAGE PLPGSQL AS\n$$\nDECLARE\n{declarations}\nBEGIN{body}\n{handlers}\nEND;\n$$;'
+    return result(type, name, text, [statement], unsupported=rewriter.unsupported)
+
+# Função de trigger com o corpo de um bloco, tratadores de exceção ficam em um bloco interno para a função sempre retornar
+def trigger_function_statement(name, declarations, body, handlers):
+    if handlers is not None:
+        body = f'\nBEGIN{body}\nEXCEPTION{handlers}\nEND;\n'
+    return f'CREATE OR REPLACE FUNCTION {name}() RETURNS TRIGGER LANGUAGE PLPGSQL AS\n$$\nDECLARE\n{declarations}\nBEGIN{body}\n{TRIGGER_RETURN}END;\n$$;'
+
+def translate_trigger(type, text, owner):
+    trigger = parse_trigger(tokenize(text))
+    name = pg_name(trigger.name)
+    if trigger.factory:
+        return result(type, name, text, factory=True)
+    rewriter = Rewriter(owner, trigger.aliases)
+    events = rewriter.rewrite(trigger.events).strip()
+    header = f'CREATE OR REPLACE TRIGGER {name} {trigger.timing} {events} ON {pg_name(trigger.table)}'
+    header += '\nFOR EACH ROW' if trigger.row_level else ''
+    if trigger.when:
+        header += f'\nWHEN ({Rewriter(owner, trigger.aliases, True).rewrite(trigger.when).strip()})'
+    statements = []
+    requires = []
+    function = f'fn_{name}'
+    if trigger.call:
+        # CALL procedimento(args): a função de trigger chama o procedimento com os argumentos traduzidos
+        # (:new.coluna vira NEW.coluna), o Postgresql só aceitaria literais como argumentos da trigger
+        call_name, args = trigger.call
+        requires.append(call_name.upper())
+        call = f'CALL {pg_name(call_name)}({rewriter.rewrite(args).strip()});'
+        statements.append(trigger_function_statement(function, '', f'\n{call}\n', None))
+    else:
+        declarations, body, handlers = block_body(trigger.block, rewriter, rewrite_declarations(trigger.block, rewriter))
+        statements.append(trigger_function_statement(function, declarations, body, handlers))
+    statements.append(f'{header}\nEXECUTE FUNCTION {function}();')
+    return result(type, name, text, statements, requires, unsupported=rewriter.unsupported)
+
+def translate_view(type, name, text, owner):
+    rewriter = Rewriter(owner)
+    tokens = tokenize(text)
+    # WITH READ ONLY não existe em views do Postgresql
+    words = [i for i, token in enumerate(tokens) if significant(token)]
+    if len(words) >= 3 and [upper(tokens[i]) for i in words[-3:]] == ['WITH', 'READ', 'ONLY']:
+        tokens = tokens[:words[-3]]
+    name = pg_name(name)
+    return result(type, name, text, [f'CREATE OR REPLACE VIEW {name} AS {rewriter.rewrite(tokens).strip()};'], unsupported=rewriter.unsupported)
+
+# Traduz um source do Oracle (texto do all_source ou consulta da view) e retorna o dicionário da tradução
+# statements: comandos a executar no Postgresql, requires: procedimentos chamados por triggers (CALL) que precisam
+# existir antes da trigger, factory: possui funções locais, unsupported: chamada sem tradução
+# Função pura (texto entra, SQL sai), pode ser executada em outro processo
+def translate(type, name, text, owner = None):
+    try:
+        if type in ['FUNCTION', 'PROCEDURE']:
+            return translate_routine(type, text, owner)
+        if type == 'TRIGGER':
+            return translate_trigger(type, text, owner)
+        if type == 'VIEW':
+            return translate_view(type, name, text, owner)
+    except TranslationError as e:
+        return result(type, pg_name(name), text, unsupported=str(e))
+    return result(type, pg_name(name), text, unsupported=type)
+
+# translate com os argumentos em uma tupla (type, name, text, owner), para Executor.map
+def translate_args(args):
+    return translate(*args)
@@ -0,0 +1,142 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+from contextlib import contextmanager
+from time import perf_counter, time
+
+# Perfil de uma sessão de ETL: temporizadores hierárquicos por fase e por objeto (tabela ou source)
+# Cada thread mantém a sua pilha de fases, fases abertas nas threads dos workers ficam abaixo da fase
+# em que a thread principal está (ex: 'tables' -> 'load'), então o tempo dos filhos é somado entre as threads
+# e pode passar do tempo de parede do pai
+# Com capture_translation, a tradução PL/SQL -> PL/pgSQL também é medida com cProfile
+
+class Profiler:
+
+    def __init__(self, capture_translation = False):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time()
+        self.main_thread = threading.get_ident()
+        self.main_stack = []
+        # Caminho da fase -> {'seconds', 'calls'}
+        self.tree = {}
+        # Objeto -> fase -> segundos
+        self.objects = {}
+        self.capture_translation = capture_translation
+        self.stats = None
+
+    # Chamado pela thread que executa a sessão, as fases dela são a raiz das fases dos workers
+    def start(self):
+        self.started = time()
+        self.main_thread = threading.get_ident()
+
+    def stack(self):
+        if threading.get_ident() == self.main_thread:
+            return self.main_stack
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def path(self, name):
+        stack = self.stack()
+        if stack is self.main_stack:
+            return tuple(stack) + (name,)
+        return tuple(self.main_stack) + tuple(stack) + (name,)
+
+    @contextmanager
+    def span(self, name, obj = None):
+        path = self.path(name)
+        stack = self.stack()
+        stack.append(name)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - start
+            stack.pop()
+            with self.lock:
+                node = self.tree.setdefault(path, {'seconds': 0.0, 'calls': 0})
+                node['seconds'] += seconds
+                node['calls'] += 1
+                if obj:
+                    phases = self.objects.setdefault(obj, {})
+                    phases[name] = phases.get(name, 0.0) + seconds
+
+    # Captura com cProfile o código Python executado dentro do bloco, somando as capturas da sessão
+    # Apenas um perfilador fica ativo por vez, chamadas simultâneas em outras threads não são capturadas
+    @contextmanager
+    def cprofile(self):
+        if not self.capture_translation:
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self.lock:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+
+    # Árvore de fases aninhadas {'name', 'seconds', 'calls', 'children'}
+    def phase_tree(self):
+        root = {'name': 'session', 'seconds': time() - self.started, 'calls': 1, 'children': []}
+        nodes = {(): root}
+        for path in sorted(self.tree, key=len):
+            parent = nodes.get(path[:-1])
+            if parent is None:
+                parent = root
+            node = {'name': path[-1], **self.tree[path], 'children': []}
+            parent['children'].append(node)
+            nodes[path] = node
+        return root
+
+    def report(self):
+        with self.lock:
+            return {'started': self.started, 'elapsed': time() - self.started, 'phases': self.phase_tree(),
+                    'objects': {obj: dict(phases) for obj, phases in self.objects.items()}}
+
+    def summary(self, report, top = 10):
+        lines = [f"Sessão: {report['elapsed']:.1f}s (tempo das fases somado entre as threads)", '']
+
+        def walk(node, depth, parent_seconds):
+            share = f' {100 * node["seconds"] / parent_seconds:5.1f}%' if parent_seconds else ''
+            lines.append(f"{'  ' * depth}{node['name']}: {node['seconds']:.2f}s em {node['calls']} chamadas{share}")
+            for child in sorted(node['children'], key=lambda child: -child['seconds']):
+                walk(child, depth + 1, node['seconds'])
+
+        for child in sorted(report['phases']['children'], key=lambda child: -child['seconds']):
+            walk(child, 0, report['phases']['seconds'])
+        phases = sorted({phase for obj in report['objects'].values() for phase in obj})
+        for phase in phases:
+            slowest = sorted(((times[phase], name) for name, times in report['objects'].items() if phase in times), reverse=True)[:top]
+            lines += ['', f'Objetos mais lentos em {phase}:']
+            lines += [f'  {name}: {seconds:.2f}s' for seconds, name in slowest]
+        if self.stats is not None:
+            output = io.StringIO()
+            self.stats.stream = output
+            self.stats.sort_stats('cumulative').print_stats(30)
+            lines += ['', 'Tradução de sources (cProfile, 30 maiores tempos acumulados):', output.getvalue()]
+        return '\n'.join(lines) + '\n'
+
+    # Grava report.json, summary.txt e, com captura, translation.prof no diretório da execução
+    def write(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        report = self.report()
+        with open(os.path.join(directory, 'report.json'), 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        with open(os.path.join(directory, 'summary.txt'), 'w', encoding='utf-8') as file:
+            file.write(self.summary(report))
+        if self.stats is not None:
+            self.stats.dump_stats(os.path.join(directory, 'translation.prof'))
+        return directory
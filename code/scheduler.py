@@ -0,0 +1,210 @@
+import heapq
+import threading
+from time import monotonic
+from concurrent.futures import wait, FIRST_COMPLETED
+
+# Erro levantado quando o grafo de dependencias possui um ciclo
+class CycleError(Exception):
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__('Dependência cíclica detectada: ' + ' -> '.join(map(str, cycle)))
+
+# Ajusta a quantidade de nós executando simultaneamente de acordo com a vazão observada
+# A cada janela de nós concluídos compara a vazão com a janela anterior: se melhorou segue na mesma direção,
+# se piorou inverte. progress é uma função que retorna o total acumulado do trabalho feito (ex: linhas escritas
+# na sessão), a vazão é o quanto ele avançou por segundo na janela. Uma janela sem avanço (ex: apenas tabelas
+# vazias) não diz nada sobre a concorrência e mantém o valor atual
+class AdaptiveConcurrency:
+
+    def __init__(self, initial, minimum = 1, maximum = None, window = 3, progress = None):
+        self.value = initial
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.window = window
+        self.progress = progress or (lambda: 0)
+        self.done = 0
+        self.amount = self.progress()
+        self.started = monotonic()
+        self.last_rate = None
+        self.direction = 1
+
+    def record(self):
+        self.done += 1
+        if self.done < self.window:
+            return self.value
+        amount = self.progress()
+        rate = (amount - self.amount) / max(monotonic() - self.started, 1e-3)
+        if rate > 0:
+            if self.last_rate is not None and rate < self.last_rate * 0.9:
+                # A última mudança piorou a vazão, inverte a direção
+                self.direction = -self.direction
+            self.value = min(max(self.value + self.direction, self.minimum), self.maximum)
+            self.last_rate = rate
+        self.done = 0
+        self.amount = amount
+        self.started = monotonic()
+        return self.value
+
+# Agendador de tarefas baseado no grafo de dependencias (DAG)
+# Um nó só é enviado para o executor quando todos os nós dos quais depende terminaram,
+# ramos independentes executam com toda a concorrência disponível
+class DependencyScheduler:
+
+    def __init__(self, executor, concurrency, controller = None):
+        self.executor = executor
+        # Máximo de nós executando ao mesmo tempo
+        self.concurrency = concurrency
+        # Controlador opcional que ajusta a concorrência durante a execução (AdaptiveConcurrency)
+        self.controller = controller
+        self.tasks = {}
+        self.parents = {}
+        self.children = {}
+        self.weight = {}
+        self.priority = {}
+        self.futures = {}
+        self.failed = {}
+        self.skipped = set()
+        self.cancelled = threading.Event()
+
+    # Adiciona um nó ao grafo, dependências fora do grafo são ignoradas
+    # weight é o custo estimado do nó (ex: bytes da tabela), nós mais pesados são iniciados primeiro
+    def add(self, node, func, *args, depends_on = (), weight = 0):
+        self.tasks[node] = (func, args)
+        self.parents[node] = set(depends_on)
+        self.weight[node] = weight
+        self.children.setdefault(node, set())
+
+    def link(self):
+        for node, parents in self.parents.items():
+            parents.intersection_update(self.tasks.keys())
+            parents.discard(node)
+            for parent in parents:
+                self.children.setdefault(parent, set()).add(node)
+
+    # Procura um ciclo no grafo (busca em profundidade), retorna a lista de nós do ciclo ou None
+    def find_cycle(self):
+        state = {}
+        for root in self.tasks:
+            if root in state:
+                continue
+            stack = [(root, iter(self.parents[root]))]
+            path = [root]
+            state[root] = 'visiting'
+            while stack:
+                node, parents = stack[-1]
+                parent = next(parents, None)
+                if parent is None:
+                    state[node] = 'done'
+                    stack.pop()
+                    path.pop()
+                elif state.get(parent) == 'visiting':
+                    return path[path.index(parent):] + [parent]
+                elif parent not in state:
+                    state[parent] = 'visiting'
+                    stack.append((parent, iter(self.parents[parent])))
+                    path.append(parent)
+        return None
+
+    # Remove ciclos do grafo, quebrando a última aresta de cada ciclo encontrado
+    # on_cycle recebe o ciclo para reportá-lo, sem on_cycle o ciclo gera CycleError
+    def resolve_cycles(self, on_cycle = None):
+        cycle = self.find_cycle()
+        while cycle:
+            if on_cycle is None:
+                raise CycleError(cycle)
+            on_cycle(cycle)
+            self.parents[cycle[-2]].discard(cycle[-1])
+            self.children[cycle[-1]].discard(cycle[-2])
+            cycle = self.find_cycle()
+
+    # Níveis do grafo: o primeiro nível não depende de ninguém e cada nível depende apenas dos anteriores
+    # Usado quando os nós são aplicados em lotes (ex: uma transação por nível) em vez de executados pelo run
+    def levels(self, on_cycle = None):
+        self.link()
+        self.resolve_cycles(on_cycle)
+        remaining = {node: len(parents) for node, parents in self.parents.items()}
+        level = [node for node in self.tasks if remaining[node] == 0]
+        levels = []
+        while level:
+            levels.append(level)
+            following = []
+            for node in level:
+                for child in self.children[node]:
+                    remaining[child] -= 1
+                    if remaining[child] == 0:
+                        following.append(child)
+            level = following
+        return levels
+
+    # Prioridade de cada nó: seu peso mais o caminho mais pesado entre os nós que dependem dele
+    # Assim a cadeia mais longa começa primeiro e não domina o tempo total no final
+    def rank(self):
+        pending = {node: len(children) for node, children in self.children.items()}
+        ready = [node for node, count in pending.items() if count == 0]
+        while ready:
+            node = ready.pop()
+            self.priority[node] = self.weight[node] + max((self.priority[child] for child in self.children[node]), default=0)
+            for parent in self.parents[node]:
+                pending[parent] -= 1
+                if pending[parent] == 0:
+                    ready.append(parent)
+
+    def cancel(self):
+        self.cancelled.set()
+        for future in self.futures.values():
+            future.cancel()
+
+    # Marca como ignorados todos os nós que dependem de um nó que falhou
+    def skip_descendants(self, node):
+        pending = list(self.children[node])
+        while pending:
+            child = pending.pop()
+            if child not in self.skipped:
+                self.skipped.add(child)
+                pending.extend(self.children[child])
+
+    # Executa o grafo e retorna quando todos os nós terminaram (ou foram ignorados)
+    def run(self, on_cycle = None):
+        self.link()
+        self.resolve_cycles(on_cycle)
+        self.rank()
+        remaining = {node: len(parents) for node, parents in self.parents.items()}
+        ready = []
+        order = 0
+        for node in self.tasks:
+            if remaining[node] == 0:
+                heapq.heappush(ready, (-self.priority[node], order, node))
+                order += 1
+        running = {}
+        while (ready or running) and not self.cancelled.is_set():
+            while ready and len(running) < self.concurrency:
+                node = heapq.heappop(ready)[2]
+                if node in self.skipped:
+                    continue
+                func, args = self.tasks[node]
+                future = self.executor.submit(func, *args)
+                self.futures[node] = future
+                running[future] = node
+            if not running:
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                if future.cancelled():
+                    self.skip_descendants(node)
+                    continue
+                if future.exception():
+                    self.failed[node] = future.exception()
+                    self.skip_descendants(node)
+                    continue
+                if self.controller:
+                    self.concurrency = self.controller.record()
+                for child in self.children[node]:
+                    remaining[child] -= 1
+                    if remaining[child] == 0 and child not in self.skipped:
+                        heapq.heappush(ready, (-self.priority[child], order, child))
+                        order += 1
+        if self.cancelled.is_set():
+            wait(list(running))
+        return self.failed
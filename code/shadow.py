@@ -0,0 +1,141 @@
+from code.db import fetch_all, execute
+
+# Carga em schema sombra: a sessão carrega tudo em um schema temporário e, se concluir com sucesso,
+# troca o schema sombra com o schema alvo em uma única transação. Em caso de falha o schema sombra é apenas removido,
+# o schema alvo nunca é alterado durante a carga
+
+def shadow_name(schema):
+    return f'{schema}_shadow'
+
+# Comentário que identifica um schema sombra criado por uma sessão, apenas esses podem ser descartados no início
+# de outra sessão: um schema com o mesmo nome que não foi criado pela migração nunca é removido
+MARKER = 'Schema sombra da migração Oracle -> Postgresql'
+
+def comment_query(schema):
+    return f"SELECT obj_description(oid, 'pg_namespace') AS comment FROM pg_namespace WHERE nspname = '{schema}'"
+
+def created_by_session(pool, shadow):
+    return pool.fetch_value(comment_query(shadow)) == MARKER
+
+def create(pool, shadow):
+    pool.execute(f"CREATE SCHEMA {shadow}")
+    pool.execute(f"COMMENT ON SCHEMA {shadow} IS '{MARKER}'")
+
+# Objetos de um schema que podem ser movidos com SET SCHEMA
+# Sequências de colunas serial/identity, tipos de linha de tabelas e objetos de extensões acompanham seus donos e ficam de fora
+def objects_query(schema):
+    return f"""SELECT c.relname AS name, c.relkind AS kind, '' AS args FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = '{schema}' AND c.relkind IN ('r', 'p', 'v', 'm', 'f', 'S')
+AND NOT EXISTS (SELECT 1 FROM pg_depend d WHERE d.classid = 'pg_class'::regclass AND d.objid = c.oid AND d.deptype IN ('a', 'i', 'e'))
+UNION ALL
+SELECT p.proname, 'routine', pg_get_function_identity_arguments(p.oid) FROM pg_proc p JOIN pg_namespace n ON n.oid = p.pronamespace
+WHERE n.nspname = '{schema}' AND NOT EXISTS (SELECT 1 FROM pg_depend d WHERE d.classid = 'pg_proc'::regclass AND d.objid = p.oid AND d.deptype = 'e')
+UNION ALL
+SELECT t.typname, CASE WHEN t.typtype = 'd' THEN 'domain' ELSE 'type' END, '' FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace
+WHERE n.nspname = '{schema}' AND t.typtype IN ('c', 'd', 'e', 'r')
+AND (t.typrelid = 0 OR (SELECT c.relkind FROM pg_class c WHERE c.oid = t.typrelid) = 'c')
+AND NOT EXISTS (SELECT 1 FROM pg_depend d WHERE d.classid = 'pg_type'::regclass AND d.objid = t.oid AND d.deptype IN ('i', 'e'))"""
+
+# Nomes já ocupados no schema sombra (relações e tipos dividem o mesmo espaço de nomes)
+def names_query(schema):
+    return f"""SELECT c.relname AS name, 'relation' AS kind, '' AS args FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = '{schema}'
+UNION SELECT t.typname, 'relation', '' FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace WHERE n.nspname = '{schema}'
+UNION SELECT p.proname, 'routine', pg_get_function_identity_arguments(p.oid) FROM pg_proc p JOIN pg_namespace n ON n.oid = p.pronamespace WHERE n.nspname = '{schema}'"""
+
+COMMANDS = {'r': 'TABLE', 'p': 'TABLE', 'f': 'FOREIGN TABLE', 'v': 'VIEW', 'm': 'MATERIALIZED VIEW', 'S': 'SEQUENCE', 'routine': 'ROUTINE', 'type': 'TYPE', 'domain': 'DOMAIN'}
+
+def move_statement(schema, target, obj):
+    name = f'{schema}."{obj["name"]}"'
+    if obj['kind'] == 'routine':
+        name += f'({obj["args"]})'
+    return f"ALTER {COMMANDS[obj['kind']]} {name} SET SCHEMA {target}"
+
+# Objetos fora das relações substituídas que dependem delas: views (direta ou indiretamente, de qualquer schema)
+# e chaves estrangeiras de outras tabelas. Na troca eles seriam removidos pelo DROP SCHEMA ... CASCADE do schema antigo
+def dependents_query(schema, relations):
+    names = ', '.join(f"'{name}'" for name in relations)
+    return f'''WITH RECURSIVE replaced(oid) AS (
+    SELECT c.oid FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = '{schema}' AND c.relname IN ({names})),
+views(oid) AS (
+    SELECT r.ev_class FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+    WHERE d.classid = 'pg_rewrite'::regclass AND d.deptype = 'n' AND d.refobjid IN (SELECT oid FROM replaced)
+    UNION SELECT r.ev_class FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid JOIN views v ON v.oid = d.refobjid
+    WHERE d.classid = 'pg_rewrite'::regclass AND d.deptype = 'n')
+SELECT 'view' AS kind, n.nspname || '.' || c.relname AS name FROM views JOIN pg_class c ON c.oid = views.oid JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE views.oid NOT IN (SELECT oid FROM replaced)
+UNION SELECT 'chave estrangeira', n.nspname || '.' || c.relname || '.' || con.conname FROM pg_constraint con
+JOIN pg_class c ON c.oid = con.conrelid JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE con.contype = 'f' AND con.confrelid IN (SELECT oid FROM replaced) AND con.conrelid NOT IN (SELECT oid FROM replaced)'''
+
+def dependents(conn, schema, relations):
+    if not relations:
+        return []
+    return [f"{row['kind']} {row['name']}" for row in fetch_all(conn, dependents_query(schema, relations))]
+
+# Tipos de objeto das permissões padrão (pg_default_acl.defaclobjtype)
+DEFAULT_PRIVILEGE_TYPES = {'r': 'TABLES', 'S': 'SEQUENCES', 'f': 'FUNCTIONS', 'T': 'TYPES'}
+
+GRANTEE = "CASE WHEN a.grantee = 0 THEN 'PUBLIC' ELSE a.grantee::regrole::text END AS grantee, a.privilege_type, a.is_grantable"
+
+# Permissões do schema alvo (GRANT no schema e permissões padrão) repetidas no schema sombra
+# Aplicadas quando o schema sombra é criado, então as tabelas e views criadas nele já recebem as permissões padrão
+def privileges_statements(conn, schema, shadow):
+    statements = []
+    query = f"SELECT {GRANTEE} FROM pg_namespace n, aclexplode(n.nspacl) a WHERE n.nspname = '{schema}'"
+    for grant in fetch_all(conn, query):
+        option = ' WITH GRANT OPTION' if grant['is_grantable'] else ''
+        statements.append(f"GRANT {grant['privilege_type']} ON SCHEMA {shadow} TO {grant['grantee']}{option}")
+    query = f'''SELECT d.defaclrole::regrole::text AS role, d.defaclobjtype AS type, {GRANTEE}
+FROM pg_default_acl d JOIN pg_namespace n ON n.oid = d.defaclnamespace, aclexplode(d.defaclacl) a WHERE n.nspname = '{schema}' '''
+    for grant in fetch_all(conn, query):
+        if grant['type'] in DEFAULT_PRIVILEGE_TYPES:
+            option = ' WITH GRANT OPTION' if grant['is_grantable'] else ''
+            statements.append(f"ALTER DEFAULT PRIVILEGES FOR ROLE {grant['role']} IN SCHEMA {shadow} GRANT {grant['privilege_type']} ON {DEFAULT_PRIVILEGE_TYPES[grant['type']]} TO {grant['grantee']}{option}")
+    return statements
+
+def copy_privileges(pool, schema, shadow):
+    with pool.connection() as conn:
+        for statement in privileges_statements(conn, schema, shadow):
+            execute(conn, statement)
+
+# Troca o schema alvo pelo schema sombra em uma transação
+# Objetos do schema alvo que não foram substituídos pela sessão (tabelas não selecionadas, funções, tipos...)
+# são movidos para o schema sombra antes da troca, os substituídos são removidos junto com o schema antigo
+# Se algum objeto preservado depender de uma relação substituída a troca é cancelada (o CASCADE o removeria)
+# Retorna a quantidade de objetos preservados
+def swap(pool, schema, shadow, exists):
+    old = f'{schema}_old'
+    kept = []
+    relations = []
+    with pool.connection() as conn:
+        conn.jconn.setAutoCommit(False)
+        if exists:
+            taken = {(row['kind'], row['name'], row['args']) for row in fetch_all(conn, names_query(shadow))}
+            for obj in fetch_all(conn, objects_query(schema)):
+                if obj['kind'] == 'routine':
+                    replaced = ('routine', obj['name'], obj['args']) in taken
+                else:
+                    replaced = ('relation', obj['name'], '') in taken
+                if not replaced:
+                    kept.append(obj)
+                elif obj['kind'] != 'routine':
+                    relations.append(obj['name'])
+            blocking = dependents(conn, schema, relations)
+            if blocking:
+                raise Exception(f"Troca cancelada, {', '.join(blocking)} depende de relações substituídas e seria removido")
+            for obj in kept:
+                execute(conn, move_statement(schema, shadow, obj))
+            # O schema renomeado no lugar do alvo fica com o dono do alvo (GRANTs e permissões padrão foram copiados na criação)
+            owner = fetch_all(conn, f"SELECT nspowner::regrole::text AS owner FROM pg_namespace WHERE nspname = '{schema}'")[0]['owner']
+            execute(conn, f"ALTER SCHEMA {shadow} OWNER TO {owner}")
+            # O comentário do schema alvo substitui a marca de schema sombra
+            comment = fetch_all(conn, comment_query(schema))[0]['comment']
+            execute(conn, f"COMMENT ON SCHEMA {shadow} IS " + ("'" + comment.replace("'", "''") + "'" if comment else 'NULL'))
+            execute(conn, f"ALTER SCHEMA {schema} RENAME TO {old}")
+        if not exists:
+            execute(conn, f"COMMENT ON SCHEMA {shadow} IS NULL")
+        execute(conn, f"ALTER SCHEMA {shadow} RENAME TO {schema}")
+        if exists:
+            execute(conn, f"DROP SCHEMA {old} CASCADE")
+        conn.commit()
+    return len(kept)
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+from pyspark import SparkConf
+
+# Perfil de recursos do Spark e da sessão de ETL
+# Valores None são detectados automaticamente a partir da máquina
+DEFAULT_PROFILE = {
+    'app_name': 'ETLTest',
+    # Núcleos usados pelo Spark (local[N]), None usa todos os núcleos
+    'cores': None,
+    # Memória do driver (ex: '8g'), None usa memory_fraction da RAM total
+    'driver_memory': None,
+    'memory_fraction': 0.5,
+    # Partições de shuffle, None usa 2x o número de núcleos
+    'shuffle_partitions': None,
+    # Linhas por round-trip na leitura do Oracle e por lote na escrita JDBC do Postgresql
+    'fetch_size': 10000,
+    'batch_size': 10000,
+    # FIFO ou FAIR, FAIR divide os núcleos entre as tabelas carregadas ao mesmo tempo (um pool por tabela, veja write_chunks)
+    'scheduler_mode': 'FAIR',
+    # Modo de carga no Postgresql: jdbc, copy ou copy_binary
+    'loader': 'jdbc',
+    'ora_connection_budget': 16,
+    'pg_connection_budget': 16,
+    # Tipos Postgresql forçados por coluna, substituem o mapeamento automático {tabela: {coluna: tipo}}
+    'type_overrides': {},
+    # full recarrega todas as tabelas, incremental aplica apenas as linhas alteradas desde a última execução
+    'sync_mode': 'full',
+    # Coluna de data/número crescente usada como marca d'água por tabela {tabela: coluna}, as demais usam o SCN
+    'watermark_columns': {},
+    # Remove no Postgresql as linhas apagadas no Oracle (modo incremental)
+    'detect_deletes': False,
+    # Arquivo das marcas d'água, None usa watermarks.json na pasta do aplicativo
+    'watermark_file': None,
+    # Retoma a última sessão que falhou a partir do checkpoint (pula fases e chunks já concluídos)
+    'resume': False,
+    # Configuração de sessão do Postgresql ao criar chaves primárias e índices depois da carga
+    'maintenance_work_mem': '1GB',
+    'max_parallel_maintenance_workers': 2,
+    # Carga rápida: tabelas UNLOGGED sem autovacuum durante a carga e ANALYZE em paralelo no final
+    'fast_load': False,
+    # Carrega em um schema sombra e troca com o schema alvo no final, dispensa o backup com pg_dump
+    'shadow_schema': False,
+    # Processos paralelos do pg_dump/pg_restore no backup das tabelas substituídas
+    'backup_jobs': 4,
+    # Intervalo em segundos entre os snapshots gravados em metrics/<owner>_<schema>.jsonl
+    'metrics_interval': 5,
+    # Porta local do endpoint /metrics no formato do Prometheus, desativado quando vazio
+    'metrics_port': None,
+    # Captura com cProfile a tradução dos sources no relatório de perfil da sessão (runs/)
+    'profile_translation': False,
+    # Cache das traduções dos sources (translation_cache.sqlite), sources inalterados não são traduzidos nem recriados
+    'translation_cache': True,
+    # Processos que traduzem os sources, None usa todos os núcleos
+    'translation_workers': None,
+    # Analisa as colunas DATE antes da carga para criar date quando nenhum valor tem hora, senão usa timestamp(0)
+    # (uma leitura completa a mais de cada tabela com colunas DATE)
+    'probe_dates': False,
+}
+
+# Memória física total da máquina em bytes
+def total_memory():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return 4 * 1024 ** 3
+
+# Monta o perfil a partir dos padrões, do arquivo de configuração (JSON) e das opções da linha de comando
+def load_profile(path = None, overrides = None):
+    profile = dict(DEFAULT_PROFILE)
+    if path:
+        with open(path) as file:
+            profile.update(json.load(file))
+    for key, value in (overrides or {}).items():
+        if value is not None:
+            profile[key] = value
+    if not profile['cores']:
+        profile['cores'] = os.cpu_count() or 1
+    if not profile['driver_memory']:
+        memory = int(total_memory() * profile['memory_fraction'] / 1024 ** 2)
+        profile['driver_memory'] = f"{max(memory, 1024)}m"
+    if not profile['shuffle_partitions']:
+        profile['shuffle_partitions'] = profile['cores'] * 2
+    return profile
+
+# Converte o perfil em configuração do Spark
+def build_conf(profile, app_home):
+    conf = SparkConf().setAppName(profile['app_name']).setMaster(f"local[{profile['cores']}]")
+    conf.set('spark.driver.extraClassPath', os.path.join(app_home, 'jdbc/*'))
+    conf.set('spark.driver.memory', profile['driver_memory'])
+    conf.set('spark.sql.shuffle.partitions', str(profile['shuffle_partitions']))
+    conf.set('spark.scheduler.mode', profile['scheduler_mode'])
+    return conf
+
+# Argumentos da sessão de ETL que vêm do perfil
+def session_options(profile):
+    keys = ['loader', 'ora_connection_budget', 'pg_connection_budget', 'fetch_size', 'batch_size', 'type_overrides', 'sync_mode', 'watermark_columns', 'detect_deletes', 'watermark_file', 'resume', 'maintenance_work_mem', 'max_parallel_maintenance_workers', 'fast_load', 'shadow_schema', 'backup_jobs', 'metrics_interval', 'metrics_port', 'profile_translation', 'translation_cache', 'translation_workers', 'probe_dates']
+    return {key: profile[key] for key in keys}
+
+# Opções de linha de comando que sobrescrevem o perfil
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', help='Arquivo JSON com o perfil de recursos')
+    parser.add_argument('--cores', type=int)
+    parser.add_argument('--driver-memory', dest='driver_memory')
+    parser.add_argument('--shuffle-partitions', dest='shuffle_partitions', type=int)
+    parser.add_argument('--fetch-size', dest='fetch_size', type=int)
+    parser.add_argument('--batch-size', dest='batch_size', type=int)
+    parser.add_argument('--scheduler-mode', dest='scheduler_mode', choices=['FIFO', 'FAIR'])
+    parser.add_argument('--loader', choices=['jdbc', 'copy', 'copy_binary'])
+    parser.add_argument('--sync-mode', dest='sync_mode', choices=['full', 'incremental'])
+    parser.add_argument('--detect-deletes', dest='detect_deletes', action='store_const', const=True)
+    parser.add_argument('--watermark-file', dest='watermark_file')
+    parser.add_argument('--resume', action='store_const', const=True)
+    parser.add_argument('--maintenance-work-mem', dest='maintenance_work_mem')
+    parser.add_argument('--max-parallel-maintenance-workers', dest='max_parallel_maintenance_workers', type=int)
+    parser.add_argument('--fast-load', dest='fast_load', action='store_const', const=True)
+    parser.add_argument('--shadow-schema', dest='shadow_schema', action='store_const', const=True)
+    parser.add_argument('--backup-jobs', dest='backup_jobs', type=int)
+    parser.add_argument('--metrics-port', dest='metrics_port', type=int)
+    parser.add_argument('--profile-translation', dest='profile_translation', action='store_const', const=True)
+    parser.add_argument('--no-translation-cache', dest='translation_cache', action='store_const', const=False)
+    parser.add_argument('--translation-workers', dest='translation_workers', type=int)
+    parser.add_argument('--probe-dates', dest='probe_dates', action='store_const', const=True)
+    return parser
+
+def profile_from_args(args):
+    overrides = {key: getattr(args, key, None) for key in DEFAULT_PROFILE}
+    return load_profile(args.profile, overrides)
+
+def parse_profile_args(argv = None):
+    parser = add_profile_arguments(argparse.ArgumentParser())
+    args, _ = parser.parse_known_args(argv)
+    return profile_from_args(args)
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from time import time
+from code.plsql import TRANSLATOR_VERSION
+
+# Cache persistente das traduções PL/SQL -> PL/pgSQL, endereçado pelo conteúdo
+# A chave é o hash do texto do source no Oracle junto com o tipo, owner, nome e a versão do tradutor,
+# então qualquer mudança no source ou no tradutor gera uma chave nova e a tradução antiga deixa de ser usada
+# Para cada destino (host/base/schema) fica registrado o hash dos comandos implantados, um source cuja
+# tradução não mudou e que ainda existe no destino não precisa ser recriado
+#
+# translations: chave -> tradução (dicionário de plsql.translate, em JSON)
+# deployments: (destino, tipo, nome) -> hash dos comandos implantados
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, type TEXT, name TEXT, translation TEXT, created REAL)''',
+    '''CREATE TABLE IF NOT EXISTS deployments (target TEXT, type TEXT, name TEXT, digest TEXT, deployed REAL, PRIMARY KEY (target, type, name))''',
+]
+
+def digest(*parts):
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+# Identificação do destino de uma implantação
+def target_name(pg_conf, schema):
+    return f"{pg_conf['host']}:{pg_conf['port']}/{pg_conf['database']}/{schema}"
+
+class TranslationCache:
+
+    # path None mantém o cache apenas em memória (cache desativado entre execuções)
+    def __init__(self, path = None):
+        self.lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path or ':memory:', check_same_thread=False, isolation_level=None)
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.stats = {'hits': 0, 'misses': 0, 'deployed': 0, 'skipped': 0}
+
+    def key(self, type, name, text, owner = None):
+        return digest(TRANSLATOR_VERSION, type, owner, name, text)
+
+    # Tradução guardada para a chave, ou None
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute('SELECT translation FROM translations WHERE key = ?', (key,)).fetchone()
+            self.stats['hits' if row else 'misses'] += 1
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, translation):
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)',
+                                    (key, translation['type'], translation['name'], json.dumps(translation), time()))
+
+    # Hash dos comandos de uma tradução, é o que fica registrado por destino
+    def statements_digest(self, translation):
+        return digest(*translation['statements'])
+
+    # A mesma tradução já foi implantada no destino
+    def deployed(self, target, translation):
+        with self.lock:
+            row = self.connection.execute('SELECT digest FROM deployments WHERE target = ? AND type = ? AND name = ?',
+                                          (target, translation['type'], translation['name'])).fetchone()
+        return bool(row) and row[0] == self.statements_digest(translation)
+
+    def mark_deployed(self, target, translation):
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO deployments VALUES (?, ?, ?, ?, ?)',
+                                    (target, translation['type'], translation['name'], self.statements_digest(translation), time()))
+            self.stats['deployed'] += 1
+
+    def skipped(self):
+        with self.lock:
+            self.stats['skipped'] += 1
+
+    def summary(self):
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
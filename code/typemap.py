@@ -0,0 +1,151 @@
+# Mapeamento de tipos Oracle -> Postgresql a partir das informações do all_tab_columns
+# (data_type, data_precision, data_scale, char_length), escolhendo o tipo mais justo possível
+
+from decimal import Decimal
+
+# Maior valor absoluto suportado por cada tipo inteiro do Postgresql
+INTEGER_TYPES = [(32767, 'smallint'), (2147483647, 'integer'), (9223372036854775807, 'bigint')]
+# Maior precisão (em dígitos) garantida por cada tipo inteiro
+INTEGER_PRECISION = [(4, 'smallint'), (9, 'integer'), (18, 'bigint')]
+
+# Tipos do Postgresql que precisam ser lidos com um tipo específico no Spark (customSchema)
+SPARK_TYPES = {'smallint': 'SMALLINT', 'integer': 'INT', 'bigint': 'BIGINT', 'real': 'FLOAT', 'double precision': 'DOUBLE', 'date': 'DATE'}
+
+# Nomes alternativos do Postgresql aceitos nos overrides, convertidos para os nomes devolvidos por map_type
+TYPE_ALIASES = {'int2': 'smallint', 'int4': 'integer', 'int': 'integer', 'int8': 'bigint', 'float4': 'real', 'float8': 'double precision',
+                'decimal': 'numeric', 'bool': 'boolean', 'character varying': 'varchar', 'character': 'char'}
+
+def number(value):
+    return None if value is None else int(value)
+
+# Colunas cujo tipo depende dos dados: NUMBER sem precisão e, com dates, DATE (pode não ter hora)
+# A sondagem lê a tabela inteira (uma amostra poderia perder o maior valor ou uma hora e truncar dados),
+# por isso DATE só é sondado quando pedido, senão vira timestamp(0)
+def needs_probe(column, dates = False):
+    if column['DATA_TYPE'] == 'DATE':
+        return dates
+    return column['DATA_TYPE'] == 'NUMBER' and column['DATA_PRECISION'] is None and column['DATA_SCALE'] is None
+
+def integer_type(max_abs):
+    for limit, pg_type in INTEGER_TYPES:
+        if max_abs <= limit:
+            return pg_type
+    return 'numeric'
+
+# Monta uma única consulta que analisa todas as colunas que precisam de sondagem
+# Retorna a consulta e a lista de (coluna, alias) usada para ler o resultado
+def probe_query(owner, table, columns):
+    fields = []
+    aliases = []
+    for i, column in enumerate(columns):
+        name = f'"{column["COLUMN_NAME"]}"'
+        if column['DATA_TYPE'] == 'DATE':
+            fields.append(f"MAX(CASE WHEN {name} <> TRUNC({name}) THEN 1 ELSE 0 END) AS P{i}_FRAC")
+        else:
+            fields.append(f"TO_CHAR(MAX(ABS({name}))) AS P{i}_MAX")
+            fields.append(f"MAX(CASE WHEN {name} <> TRUNC({name}) THEN 1 ELSE 0 END) AS P{i}_FRAC")
+        aliases.append((column['COLUMN_NAME'], f'P{i}'))
+    if not fields:
+        return None, []
+    return f'SELECT {", ".join(fields)} FROM {owner}."{table}"', aliases
+
+# Lê o resultado da sondagem em {coluna: {'max': maior valor absoluto, 'fraction': possui parte fracionária/hora}}
+def probe_results(row, aliases):
+    results = {}
+    for column, alias in aliases:
+        max_abs = row.get(f'{alias}_MAX')
+        results[column] = {'max': None if max_abs is None else abs(Decimal(max_abs)), 'fraction': bool(row.get(f'{alias}_FRAC'))}
+    return results
+
+# Tipo Postgresql de uma coluna Oracle
+def map_type(column, probe = None):
+    data_type = column['DATA_TYPE']
+    precision = number(column['DATA_PRECISION'])
+    scale = number(column['DATA_SCALE'])
+    length = number(column['CHAR_LENGTH'])
+    if data_type in ['NUMBER', 'INTEGER']:
+        if precision is None and scale is None:
+            # NUMBER sem precisão, decide pelos dados
+            if probe and not probe['fraction'] and probe['max'] is not None:
+                return integer_type(probe['max'])
+            return 'numeric'
+        if not scale:
+            if precision is None:
+                # INTEGER do Oracle (NUMBER(*,0))
+                if probe and probe['max'] is not None:
+                    return integer_type(probe['max'])
+                return 'numeric(38)'
+            for digits, pg_type in INTEGER_PRECISION:
+                if precision <= digits:
+                    return pg_type
+            return f'numeric({precision})'
+        if precision is None:
+            return 'numeric'
+        if scale > precision or scale < 0:
+            return 'numeric'
+        return f'numeric({precision},{scale})'
+    if data_type == 'FLOAT':
+        # Precisão do FLOAT do Oracle é em bits
+        return 'real' if precision is not None and precision <= 24 else 'double precision'
+    if data_type == 'BINARY_FLOAT':
+        return 'real'
+    if data_type == 'BINARY_DOUBLE':
+        return 'double precision'
+    if data_type in ['VARCHAR2', 'NVARCHAR2', 'VARCHAR']:
+        return f'varchar({length})' if length else 'text'
+    if data_type in ['CHAR', 'NCHAR']:
+        return f'char({length})' if length else 'char(1)'
+    if data_type in ['CLOB', 'NCLOB', 'LONG']:
+        return 'text'
+    if data_type in ['BLOB', 'RAW', 'LONG RAW', 'BFILE']:
+        return 'bytea'
+    if data_type == 'DATE':
+        # DATE do Oracle guarda hora, vira date apenas se nenhum valor tiver hora
+        if probe and not probe['fraction']:
+            return 'date'
+        return 'timestamp(0)'
+    if data_type.startswith('TIMESTAMP'):
+        fraction = data_type[data_type.index('(') + 1:data_type.index(')')] if '(' in data_type else '6'
+        if 'TIME ZONE' in data_type:
+            return f'timestamp({fraction}) with time zone'
+        return f'timestamp({fraction})'
+    if data_type.startswith('INTERVAL'):
+        return 'interval'
+    if data_type == 'XMLTYPE':
+        return 'xml'
+    return 'text'
+
+# Tipo de um override no formato de map_type: minúsculas, espaços simples e nome canônico (int4 -> integer)
+def canonical_type(pg_type):
+    pg_type = ' '.join(pg_type.lower().split())
+    base, paren, modifier = pg_type.partition('(')
+    base = base.strip()
+    return TYPE_ALIASES.get(base, base) + paren + modifier
+
+# Mapeia todas as colunas de uma tabela, overrides = {coluna: tipo} definidos pelo usuário
+def map_table(columns, probes = None, overrides = None):
+    probes = probes or {}
+    overrides = {name.upper(): canonical_type(pg_type) for name, pg_type in (overrides or {}).items()}
+    mapped = []
+    for column in columns:
+        name = column['COLUMN_NAME']
+        pg_type = overrides.get(name) or map_type(column, probes.get(name))
+        mapped.append({'name': name, 'type': pg_type, 'nullable': column['NULLABLE'] != 'N'})
+    return mapped
+
+# fast_load cria a tabela UNLOGGED (sem WAL) e sem autovacuum durante a carga
+def create_table_ddl(table, mapped, fast_load = False):
+    columns = []
+    for column in mapped:
+        definition = f'"{column["name"].lower()}" {column["type"]}'
+        if not column['nullable']:
+            definition += ' NOT NULL'
+        columns.append(definition)
+    if fast_load:
+        return f'CREATE UNLOGGED TABLE {table} ({", ".join(columns)}) WITH (autovacuum_enabled = false)'
+    return f'CREATE TABLE {table} ({", ".join(columns)})'
+
+# Tipos de leitura no Spark para que os dados cheguem no mesmo tipo da coluna criada
+def spark_schema(mapped):
+    fields = [f'`{column["name"]}` {SPARK_TYPES[column["type"]]}' for column in mapped if column['type'] in SPARK_TYPES]
+    return ', '.join(fields)
@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import sys
+from pyspark import SparkContext
+from pyspark.sql import SparkSession
+from code.engine import ETL_engine, write2log
+from code.spark_profile import add_profile_arguments, profile_from_args, build_conf, session_options
+from code import backup
+
+# Execução do ETL sem interface gráfica a partir de um plano de migração (JSON ou YAML)
+#
+# Exemplo de plano:
+# {
+#     "oracle": {"host": "localhost", "port": 1521, "user": "system", "password_env": "ORA_PASSWORD", "service": "XEPDB1"},
+#     "postgres": {"host": "localhost", "port": 5432, "user": "postgres", "password_env": "PG_PASSWORD", "database": "postgres"},
+#     "owner": "HR",
+#     "schema": "hr",
+#     "tables": "all",
+#     "sources": "related",
+#     "backup": true,
+#     "type_overrides": {"EMPLOYEES": {"SALARY": "numeric(12,2)"}},
+#     "sync_mode": "incremental",
+#     "watermark_columns": {"ORDERS": "UPDATED_AT"},
+#     "detect_deletes": false
+# }
+# tables: lista de tabelas ou "all"
+# sources: lista de [nome, tipo], "all", "related" (procedimentos que dependem das tabelas) ou vazio
+# type_overrides: tipos Postgresql forçados por tabela e coluna, somados aos do perfil
+# sync_mode, watermark_columns, detect_deletes e watermark_file: sincronização incremental, substituem os valores do perfil
+# resume: retoma a última execução que falhou, nesse caso o backup não é restaurado em caso de falha
+# backup: backup com pg_dump em paralelo das tabelas, views e funções substituídas, restaurado em caso de falha
+# shadow_schema: carrega em um schema sombra trocado com o schema alvo no final, dispensa backup e restauração
+
+if getattr(sys, 'frozen', False):
+    APP_HOME = os.path.dirname(sys.executable)
+else:
+    APP_HOME = os.path.dirname(os.path.abspath(__file__))
+
+EXIT_SUCCESS = 0
+EXIT_FAILED = 1
+EXIT_INVALID_PLAN = 2
+
+def load_plan(path):
+    with open(path) as file:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError('Instale o pacote pyyaml para usar planos em YAML')
+            return yaml.safe_load(file)
+        return json.load(file)
+
+# Senhas podem vir direto do plano ou de uma variável de ambiente (password_env)
+# database é o service name no Oracle e a base de dados no Postgresql
+def connection_conf(conf, database):
+    conf = dict(conf)
+    if 'password_env' in conf:
+        env = conf.pop('password_env')
+        if env not in os.environ:
+            raise ValueError(f'Variável de ambiente {env} com a senha não definida')
+        conf['password'] = os.environ[env]
+    for key in ['host', 'port', 'user', 'password', database]:
+        if key not in conf:
+            raise ValueError(f'Parâmetro de conexão {key} não definido no plano')
+    conf['port'] = str(conf['port'])
+    return conf
+
+def resolve_tables(engine, owner, tables):
+    if tables == 'all':
+        rows = engine.ora_pool.fetch_all(f"SELECT table_name FROM all_tables WHERE owner = '{owner}'")
+        return [row['TABLE_NAME'] for row in rows]
+    return list(tables or [])
+
+def resolve_sources(engine, owner, sources, tables):
+    if sources == 'all':
+        query = f"SELECT name, type FROM all_source where owner = '{owner}' AND line = 1 UNION SELECT view_name, 'VIEW' FROM all_views where owner = '{owner}'"
+        return [[row['NAME'], row['TYPE']] for row in engine.ora_pool.fetch_all(query)]
+    if sources == 'related':
+        related = []
+        for table in tables:
+            query = f"SELECT DISTINCT name, type FROM all_dependencies WHERE referenced_name = '{table}' AND owner = '{owner}'"
+            for row in engine.ora_pool.fetch_all(query):
+                if [row['NAME'], row['TYPE']] not in related:
+                    related.append([row['NAME'], row['TYPE']])
+        return related
+    return [list(source) for source in sources or []]
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description='Migração Oracle -> Postgresql sem interface gráfica')
+    parser.add_argument('plan', help='Arquivo do plano de migração (.json, .yaml ou .yml)')
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        plan = load_plan(args.plan)
+        ora_conf = connection_conf(plan['oracle'], 'service')
+        pg_conf = connection_conf(plan['postgres'], 'database')
+        owner = plan['owner'].upper()
+        schema = plan.get('schema') or 'public'
+    except (OSError, ValueError, KeyError) as e:
+        print(f'Plano inválido: {e}', file=sys.stderr)
+        return EXIT_INVALID_PLAN
+    if 'JAVA_HOME' not in os.environ:
+        print('Defina a variável de ambiente JAVA_HOME apontando para o JDK', file=sys.stderr)
+        return EXIT_INVALID_PLAN
+    os.environ['CLASSPATH'] = os.path.join(APP_HOME, "jdbc/*")
+    ora_jar = os.path.join(APP_HOME, "jdbc/ojdbc11.jar")
+    pg_jar = os.path.join(APP_HOME, "jdbc/postgresql-42.7.3.jar")
+
+    profile = profile_from_args(args)
+    profile['type_overrides'] = {**profile['type_overrides'], **plan.get('type_overrides', {})}
+    for key in ['sync_mode', 'watermark_columns', 'detect_deletes', 'watermark_file', 'resume', 'shadow_schema']:
+        if key in plan:
+            profile[key] = plan[key]
+    if profile['shadow_schema'] and (profile['sync_mode'] == 'incremental' or profile['resume']):
+        print('Plano inválido: shadow_schema não pode ser combinado com sincronização incremental ou resume', file=sys.stderr)
+        return EXIT_INVALID_PLAN
+    etl = SparkSession(SparkContext(conf=build_conf(profile, APP_HOME)))
+    engine = None
+    try:
+        # Falhas ao conectar nas bases (credenciais, rede, driver JDBC ausente) ou ao listar os objetos do plano
+        try:
+            engine = ETL_engine(pg_conf, ora_conf, owner, [], [], etl, pg_jar, ora_jar, schema, backup=bool(plan.get('backup')), **session_options(profile))
+            engine.tables = resolve_tables(engine, owner, plan.get('tables'))
+            engine.sources = resolve_sources(engine, owner, plan.get('sources'), engine.tables)
+        except Exception as e:
+            write2log(f'Migração não iniciada! {e}')
+            print(f'Migração não iniciada: {e}', file=sys.stderr)
+            return EXIT_FAILED
+        write2log(f"migrando tabelas {engine.tables} e sources {engine.sources} do Oracle schema '{owner}' para Postgres database {pg_conf['database']} schema '{schema}'!")
+        state = engine.run()
+        if state == 'success':
+            write2log('Migração concluída com sucesso!')
+            return EXIT_SUCCESS
+        write2log(f'Migração falhou! {engine.error_message}')
+        if profile['resume']:
+            write2log('Progresso mantido no checkpoint, execute novamente com resume para continuar')
+        elif profile['shadow_schema']:
+            write2log(f'Schema {schema} não foi alterado, a carga foi feita no schema sombra')
+        elif plan.get('backup'):
+            write2log('Retornando base de dados para estado anterior...')
+            if backup.restore_from_backup(pg_conf, schema, profile['backup_jobs'], engine.session_id):
+                write2log('Base de dados retornada ao último estado estável')
+            else:
+                write2log('Backup não concluído, nenhuma tabela foi substituída')
+        return EXIT_FAILED
+    finally:
+        if engine:
+            engine.stop()
+        etl.stop()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+from code import indexes
+
+def index(name, columns, uniqueness = 'NONUNIQUE', type = 'NORMAL'):
+    return {'INDEX_NAME': name, 'UNIQUENESS': uniqueness, 'INDEX_TYPE': type,
+            'COLUMN_LIST': [{'name': column, 'expression': None, 'descend': 'ASC'} for column in columns]}
+
+def test_index_statement():
+    statement = indexes.index_statement('scott', 'EMP', index('EMP_NOME_UK', ['NOME', 'DEPTO'], 'UNIQUE'))
+    assert statement == 'CREATE UNIQUE INDEX emp_nome_uk ON scott.emp ("nome", "depto")'
+
+def test_expression_columns():
+    ix = index('EMP_UPPER', [])
+    ix['COLUMN_LIST'] = [{'name': 'SYS_NC1$', 'expression': 'NVL("NOME",\'-\')', 'descend': 'ASC'},
+                         {'name': 'SYS_NC2$', 'expression': '"SAL"', 'descend': 'DESC'}]
+    assert indexes.index_statement('scott', 'EMP', ix) == 'CREATE INDEX emp_upper ON scott.emp ((COALESCE("nome",\'-\')), "sal" DESC)'
+
+# Índices dividem o espaço de nomes com as tabelas no Postgresql
+def test_index_named_like_a_table():
+    existing = {'emp': None, 'depto': None}
+    assert indexes.index_name(index('EMP', ['NOME']), 'EMP', existing) == ('emp_idx', False)
+    assert existing['emp_idx'] == 'emp'
+    # Já criado na tabela (sessão retomada)
+    assert indexes.index_name(index('EMP', ['NOME']), 'EMP', existing) == ('emp_idx', True)
+    existing['depto_idx'] = 'outra'
+    assert indexes.index_name(index('DEPTO', ['ID']), 'DEPTO', existing) == (None, False)
+
+def test_unsupported_types():
+    assert not indexes.supported(index('TXT', ['NOME'], type='DOMAIN'))
+    assert not indexes.supported(index('TXT', ['NOME'], type='FUNCTION-BASED DOMAIN'))
+    assert indexes.supported(index('BMP', ['NOME'], type='BITMAP'))
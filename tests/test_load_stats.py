@@ -0,0 +1,58 @@
+import datetime
+from decimal import Decimal
+from code import load_stats
+
+# Métricas sem Spark nem banco: o cálculo por partição do COPY e a agregação no Postgresql da escrita JDBC
+
+class Accumulator:
+
+    def __init__(self):
+        self.value = {}
+
+    def add(self, value):
+        self.value.update(value)
+
+def test_track_and_summarize(monkeypatch):
+    stats = Accumulator()
+    partitions = [[(3, 'b'), (None, 'a')], [(7, None)], []]
+    for i, rows in enumerate(partitions):
+        monkeypatch.setattr(load_stats, 'partition_id', lambda: i)
+        assert list(load_stats.track(iter(rows), stats, [True, True])) == rows
+    assert load_stats.summarize(stats, ['id', 'nome']) == {'rows': 3, 'columns': {
+        'id': {'nulls': 1, 'min': 3, 'max': 7},
+        'nome': {'nulls': 1, 'min': 'a', 'max': 'b'}}}
+
+# Uma partição recalculada substitui o resultado anterior em vez de somar em dobro
+def test_recomputed_partition_counted_once(monkeypatch):
+    stats = Accumulator()
+    monkeypatch.setattr(load_stats, 'partition_id', lambda: 0)
+    for _ in range(2):
+        list(load_stats.track(iter([(1,), (2,)]), stats, [True]))
+    assert load_stats.summarize(stats, ['id'])['rows'] == 2
+
+def test_unordered_columns_only_count_nulls(monkeypatch):
+    stats = Accumulator()
+    monkeypatch.setattr(load_stats, 'partition_id', lambda: 0)
+    list(load_stats.track(iter([(b'\x01',), (None,)]), stats, [False]))
+    assert load_stats.summarize(stats, ['foto']) == {'rows': 2, 'columns': {'foto': {'nulls': 1, 'min': None, 'max': None}}}
+
+def test_summary_query():
+    query = load_stats.summary_query('s.emp', ['id', 'foto', 'nome', 'admissao'], ['long', 'binary', 'decimal', 'timestamp'],
+                                     ['bigint', 'bytea', 'text', 'timestamp with time zone'], '"id" >= 10')
+    assert query.startswith('SELECT count(*) AS rows, count(*) - count("id") AS n0, min("id")::text AS lo0, max("id")::text AS hi0, ')
+    # Sem mínimo e máximo para binários e para colunas cujo tipo no Postgresql não preserva a ordem do Spark
+    assert 'lo1' not in query and 'lo2' not in query
+    assert "to_char(max(\"admissao\"), 'YYYY-MM-DD HH24:MI:SS.US') AS hi3" in query
+    assert query.endswith(' FROM s.emp WHERE "id" >= 10')
+
+def test_summary_from_row():
+    row = {'rows': 4, 'n0': 0, 'lo0': '1', 'hi0': '12345678901234567890', 'n1': 1, 'lo1': '0.10', 'hi1': '2.50',
+           'n2': 2, 'lo2': '2024-01-01', 'hi2': '2024-03-01', 'n3': 0, 'lo3': '2024-01-01 08:00:00.000000', 'hi3': '2024-01-01 18:30:00.250000',
+           'n4': 4}
+    summary = load_stats.summary_from_row(row, ['id', 'valor', 'dia', 'hora', 'foto'], ['long', 'decimal', 'date', 'timestamp', 'binary'])
+    assert summary['rows'] == 4
+    assert summary['columns']['id'] == {'nulls': 0, 'min': 1, 'max': 12345678901234567890}
+    assert summary['columns']['valor'] == {'nulls': 1, 'min': Decimal('0.10'), 'max': Decimal('2.50')}
+    assert summary['columns']['dia']['max'] == datetime.date(2024, 3, 1)
+    assert summary['columns']['hora']['max'] == datetime.datetime(2024, 1, 1, 18, 30, 0, 250000)
+    assert summary['columns']['foto'] == {'nulls': 4, 'min': None, 'max': None}
@@ -0,0 +1,69 @@
+import collections
+import datetime
+import pytest
+
+pytest.importorskip('pyspark')
+pytest.importorskip('jaydebeapi')
+
+from pyspark.sql import SparkSession
+from code import load_stats
+from code.checkpoint import Checkpoint
+from code.engine import ETL_engine
+from code.metrics import SessionMetrics
+from code.profiler import Profiler
+
+# Carga de ponta a ponta em um Spark local com o caminho do COPY: as linhas passam pelo load_stats.track dentro
+# do foreachPartition, como no copy_partition, e as métricas chegam pelo acumulador
+
+@pytest.fixture(scope='module')
+def spark():
+    session = SparkSession.builder.master('local[2]').appName('test_load_stats').getOrCreate()
+    yield session
+    session.stop()
+
+def engine(spark, tmp_path, loader):
+    etl = ETL_engine.__new__(ETL_engine)
+    etl.etl = spark
+    etl.loader = loader
+    etl.user = 'SCOTT'
+    etl.tables = ['EMP']
+    etl.table_stats = {}
+    etl.metrics = SessionMetrics()
+    etl.profiler = Profiler()
+    etl.checkpoint = Checkpoint(str(tmp_path / 'checkpoint.json'), 'SCOTT', 'scott')
+    written = []
+
+    def write_data(data, table, chunk_rows = None, stats = None):
+        ordered = load_stats.ordered_columns(data.schema)
+        data.foreachPartition(lambda rows: collections.deque(load_stats.track(rows, stats, ordered), 0))
+        written.append(table)
+
+    etl.write_data = write_data
+    return etl, written
+
+def test_write_chunks_collects_stats(spark, tmp_path):
+    rows = [(i, f'nome {i}' if i % 3 else None, datetime.date(2024, 1, 1) + datetime.timedelta(days=i)) for i in range(1, 101)]
+    data = spark.createDataFrame(rows, 'id long, nome string, admissao date').repartition(4)
+    etl, written = engine(spark, tmp_path, 'copy')
+    stats = etl.write_chunks(data, 'EMP', 'scott.emp', [0, 1, 2, 3])
+    assert written == ['scott.emp']
+    assert stats['rows'] == 100
+    assert stats['columns']['id'] == {'nulls': 0, 'min': 1, 'max': 100}
+    assert stats['columns']['nome']['nulls'] == 33
+    assert stats['columns']['admissao']['max'] == datetime.date(2024, 4, 10)
+    assert etl.table_stats['emp'] is stats
+    assert etl.metrics.snapshot()['tables']['EMP']['rows_written'] == 100
+
+def test_empty_table(spark, tmp_path):
+    data = spark.createDataFrame([], 'id long')
+    etl, _ = engine(spark, tmp_path, 'copy')
+    stats = etl.write_chunks(data, 'EMP', 'scott.emp', [0])
+    assert stats == {'rows': 0, 'columns': {'id': {'nulls': 0, 'min': None, 'max': None}}}
+
+# Uma partição recalculada substitui o resultado anterior em vez de somar em dobro
+def test_recomputed_partition_counted_once(spark):
+    stats = load_stats.accumulator(spark.sparkContext)
+    rdd = spark.sparkContext.parallelize([(1,), (2,), (None,)], 1).mapPartitions(lambda rows: load_stats.track(rows, stats, [True]))
+    rdd.count()
+    rdd.count()
+    assert load_stats.summarize(stats, ['id']) == {'rows': 3, 'columns': {'id': {'nulls': 1, 'min': 1, 'max': 2}}}
@@ -0,0 +1,124 @@
+from code import plsql
+
+# Tradução PL/SQL -> PL/pgSQL, texto entra e SQL sai, sem Spark nem banco
+
+def values(tokens):
+    return [(token.kind, token.value) for token in tokens if plsql.significant(token)]
+
+def test_strings_and_comments():
+    tokens = plsql.tokenize("x := 'a--b' -- fim\n|| q'[it's]' || Q'{x}' /* BEGIN END */ || n'y';")
+    assert values(tokens) == [('word', 'x'), ('symbol', ':='), ('string', "'a--b'"), ('symbol', '||'), ('string', "'it''s'"),
+                              ('symbol', '||'), ('string', "'x'"), ('symbol', '||'), ('string', "'y'"), ('symbol', ';')]
+    comments = [token.value for token in tokens if token.kind == 'comment']
+    assert comments == ['-- fim', '/* BEGIN END */']
+
+def test_words_inside_literals_are_kept():
+    text = "PROCEDURE p IS BEGIN v := 'NVL(a, b) END; SYSDATE'; -- NVL SYSDATE\nv := NVL(v, 'x'); END;"
+    statement = plsql.translate('PROCEDURE', 'P', text)['statements'][0]
+    assert "v := 'NVL(a, b) END; SYSDATE';" in statement
+    assert '-- NVL SYSDATE' in statement
+    assert "v := COALESCE(v, 'x');" in statement
+
+PROCEDURE = """CREATE OR REPLACE PROCEDURE scott.ajusta(p_id IN NUMBER, p_nome OUT VARCHAR2) IS
+  v_sal emp.sal%TYPE;
+  v_emp emp%ROWTYPE;
+  CURSOR c_emp IS SELECT * FROM emp WHERE nome = 'x';
+  e_neg EXCEPTION;
+BEGIN
+  v_sal := CASE WHEN p_id > 0 THEN 1 ELSE 0 END;
+  <<externo>>
+  FOR r IN (SELECT id FROM scott.emp) LOOP
+    IF r.id = 1 THEN
+      BEGIN
+        NULL;
+      EXCEPTION WHEN NO_DATA_FOUND THEN NULL;
+      END;
+    END IF;
+  END LOOP externo;
+  IF v_sal < 0 THEN RAISE e_neg; END IF;
+EXCEPTION
+  WHEN e_neg THEN raise_application_error(-20001, 'negativo');
+  WHEN DUP_VAL_ON_INDEX THEN NULL;
+END ajusta;"""
+
+def test_routine_blocks():
+    translation = plsql.translate('PROCEDURE', 'AJUSTA', PROCEDURE, 'SCOTT')
+    assert translation['unsupported'] is None and not translation['factory']
+    statement = translation['statements'][0]
+    assert statement.startswith('CREATE OR REPLACE PROCEDURE ajusta(p_id numeric, OUT p_nome varchar)\nLANGUAGE PLPGSQL AS\n$$\nDECLARE\n')
+    # CASE ... END, END IF, END LOOP com rótulo e o bloco interno ficam no corpo, o END final fecha a rotina
+    assert 'v_sal := CASE WHEN p_id > 0 THEN 1 ELSE 0 END;' in statement
+    assert 'END LOOP externo;' in statement
+    assert 'EXCEPTION WHEN NO_DATA_FOUND THEN NULL;\n      END;\n    END IF;' in statement
+    assert statement.endswith('\nEND;\n$$;')
+    assert statement.count('$$') == 2
+
+def test_declarations():
+    statement = plsql.translate('PROCEDURE', 'AJUSTA', PROCEDURE, 'SCOTT')['statements'][0]
+    assert 'v_sal emp.sal%TYPE;' in statement
+    assert 'v_emp emp%ROWTYPE;' in statement
+    assert "c_emp CURSOR FOR SELECT * FROM emp WHERE nome = 'x';" in statement
+    # FOR sobre consulta: parênteses removidos e a variável declarada como record, owner removido
+    assert 'FOR r IN SELECT id FROM emp LOOP' in statement
+    assert '\nr record;' in statement
+    assert 'e_neg EXCEPTION' not in statement
+
+def test_exception_handlers():
+    statement = plsql.translate('PROCEDURE', 'AJUSTA', PROCEDURE, 'SCOTT')['statements'][0]
+    assert "RAISE EXCEPTION 'e_neg' USING ERRCODE = 'OE001';" in statement
+    assert "WHEN SQLSTATE 'OE001' THEN RAISE EXCEPTION '%', 'negativo' USING ERRCODE = 'P0001', DETAIL = 'ORA-20001';" in statement
+    assert 'WHEN unique_violation THEN NULL;' in statement
+
+def test_default_handler():
+    statement = plsql.translate('FUNCTION', 'F', 'FUNCTION f(a NUMBER) RETURN NUMBER IS BEGIN RETURN a; END;')['statements'][0]
+    assert statement.startswith('CREATE OR REPLACE FUNCTION f(a numeric) RETURNS numeric\n')
+    assert 'EXCEPTION WHEN OTHERS THEN' in statement
+
+TRIGGER = """CREATE OR REPLACE TRIGGER scott.trg_emp
+BEFORE INSERT OR UPDATE OR DELETE ON scott.emp
+REFERENCING NEW AS nv OLD AS ov
+FOR EACH ROW
+WHEN (nv.sal > 0)
+BEGIN
+  IF INSERTING THEN
+    :nv.criado := SYSDATE;
+  ELSIF UPDATING THEN
+    :nv.alterado := :ov.sal;
+  ELSIF DELETING THEN
+    :old.id := :new.id;
+  END IF;
+END;"""
+
+def test_trigger():
+    translation = plsql.translate('TRIGGER', 'TRG_EMP', TRIGGER, 'SCOTT')
+    assert translation['unsupported'] is None
+    function, trigger = translation['statements']
+    assert function.startswith('CREATE OR REPLACE FUNCTION fn_trg_emp() RETURNS TRIGGER LANGUAGE PLPGSQL AS')
+    assert "IF TG_OP = 'INSERT' THEN\n    NEW.criado := LOCALTIMESTAMP(0);" in function
+    assert "ELSIF TG_OP = 'UPDATE' THEN\n    NEW.alterado := OLD.sal;" in function
+    assert "ELSIF TG_OP = 'DELETE' THEN\n    OLD.id := NEW.id;" in function
+    assert function.endswith("IF TG_OP = 'DELETE' THEN RETURN OLD; END IF;\nRETURN NEW;\nEND;\n$$;")
+    assert trigger == 'CREATE OR REPLACE TRIGGER trg_emp BEFORE INSERT OR UPDATE OR DELETE ON emp\nFOR EACH ROW\nWHEN (NEW.sal > 0)\nEXECUTE FUNCTION fn_trg_emp();'
+
+def test_call_trigger():
+    translation = plsql.translate('TRIGGER', 'TRG', "TRIGGER trg AFTER INSERT ON emp FOR EACH ROW CALL log_proc(:new.id, 'x')")
+    function, trigger = translation['statements']
+    assert translation['requires'] == ['LOG_PROC']
+    assert "\nCALL log_proc(NEW.id, 'x');\n" in function
+    assert trigger.endswith('EXECUTE FUNCTION fn_trg();')
+
+def test_updating_column_is_unsupported():
+    translation = plsql.translate('TRIGGER', 'T', "TRIGGER t BEFORE UPDATE ON emp FOR EACH ROW BEGIN IF UPDATING('SAL') THEN NULL; END IF; END;")
+    assert translation['unsupported'] == 'UPDATING(coluna)'
+
+# Tudo que não tem tradução chega ao engine em unsupported ou factory e vai para manual_migrations
+def test_unsupported():
+    assert plsql.translate('PACKAGE', 'PK', 'PACKAGE pk IS END;')['unsupported'] == 'PACKAGE'
+    assert plsql.translate('PROCEDURE', 'P', 'PROCEDURE p IS BEGIN dbms_sql.parse(1); END;')['unsupported'] == 'dbms_sql'
+    assert plsql.translate('PROCEDURE', 'P', 'PROCEDURE p IS BEGIN NULL;')['unsupported'] == 'END final não encontrado'
+    translation = plsql.translate('FUNCTION', 'F', 'FUNCTION f RETURN NUMBER IS FUNCTION g RETURN NUMBER IS BEGIN RETURN 1; END; BEGIN RETURN g; END;')
+    assert translation['factory'] and translation['statements'] == []
+
+def test_view():
+    translation = plsql.translate('VIEW', 'V_EMP', 'SELECT NVL(nome, \'-\') AS nome FROM scott.emp WITH READ ONLY', 'SCOTT')
+    assert translation['statements'] == ["CREATE OR REPLACE VIEW v_emp AS SELECT COALESCE(nome, '-') AS nome FROM emp;"]
@@ -0,0 +1,19 @@
+from code import typemap
+
+def column(data_type, precision = None, scale = None):
+    return {'COLUMN_NAME': 'C', 'DATA_TYPE': data_type, 'DATA_PRECISION': precision, 'DATA_SCALE': scale, 'CHAR_LENGTH': None}
+
+# Apenas NUMBER sem precisão é sondado por padrão, DATE somente com probe_dates
+def test_needs_probe():
+    assert typemap.needs_probe(column('NUMBER'))
+    assert not typemap.needs_probe(column('NUMBER', 10, 2))
+    assert not typemap.needs_probe(column('DATE'))
+    assert typemap.needs_probe(column('DATE'), dates = True)
+
+def test_date_without_probe():
+    assert typemap.map_type(column('DATE')) == 'timestamp(0)'
+    assert typemap.map_type(column('DATE'), {'max': None, 'fraction': False}) == 'date'
+
+def test_canonical_type():
+    assert typemap.canonical_type('INT8') == 'bigint'
+    assert typemap.canonical_type('Decimal(12, 2)') == 'numeric(12, 2)'